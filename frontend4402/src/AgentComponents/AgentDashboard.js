@@ -1,7 +1,16 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import AgentPropertyContainer from "./AgentPropertyContainer";
 
+// Replace rows that changed (matched on key) and append new ones
+const mergeRows = (rows, changed, key) => {
+  if (!changed || changed.length === 0) return rows;
+  const changedByKey = new Map(changed.map((row) => [row[key], row]));
+  const merged = rows.map((row) => changedByKey.get(row[key]) || row);
+  const known = new Set(rows.map((row) => row[key]));
+  return merged.concat(changed.filter((row) => !known.has(row[key])));
+};
+
 const AgentDashboard = (agent) => {
   const [appointments, setAppointments] = useState([]);
   const [clients, setClients] = useState([]);
@@ -10,38 +19,47 @@ const AgentDashboard = (agent) => {
 
 
   const API_BASE_URL = "https://5pq8iah053.execute-api.us-east-1.amazonaws.com/dev/api";
+  // DashboardSocketEndpoint output of the stack; without it the dashboard polls
+  const SOCKET_URL = process.env.REACT_APP_DASHBOARD_SOCKET_URL;
   const { FIRST_NAME, LAST_NAME, EMAIL, PHONE, LICENSE_NUMBER, AGENT_ID } =
     agent.agent;
 
+  // Watermark from the last successful read; polls after the first one
+  // only ask for rows changed since then
+  const watermark = useRef(null);
+
+  // One round trip for every dashboard section; the Lambda reads them in parallel
   const refreshData = async () => {
     try {
       if (!AGENT_ID) return;
-      const [
-        appointmentsResponse,
-        transactionsResponse,
-        clientsResponse,
-        officesResponse,
-      ] = await Promise.all([
-        axios.post(`${API_BASE_URL}/getAppointments`, {
-          agentId: AGENT_ID
-        }),
-        axios.post(`${API_BASE_URL}/getTransactions`, {
-          agentId: AGENT_ID
-        }),
-        axios.post(`${API_BASE_URL}/getClients`, {
-          agentId: AGENT_ID
-        }),
-        axios.post(`${API_BASE_URL}/getOffice`, {
-          agentId: AGENT_ID
-        }),
-      ]);
+      const since = watermark.current;
+      const response = await axios.post(`${API_BASE_URL}/getAgentDashboard`, {
+        agentId: AGENT_ID,
+        ...(since ? { since } : {})
+      });
+      const dashboard = response.data || {};
+      if (dashboard.errors) {
+        console.error("Dashboard sections failed:", dashboard.errors);
+        // Ask for a full read next time rather than miss the failed rows
+        watermark.current = null;
+      } else {
+        watermark.current = dashboard.watermark || null;
+      }
+
+      if (since) {
+        setAppointments((rows) => mergeRows(rows, dashboard.appointments, "APPOINTMENT_ID"));
+        setTransactions((rows) => mergeRows(rows, dashboard.transactions, "TRANSACTION_ID"));
+        setClients((rows) => mergeRows(rows, dashboard.clients, "CLIENT_ID"));
+        return;
+      }
 
-      setAppointments(appointmentsResponse.data);
-      setTransactions(transactionsResponse.data);
-      setClients(clientsResponse.data);
-      setOffices(officesResponse.data);
+      setAppointments(dashboard.appointments || []);
+      setTransactions(dashboard.transactions || []);
+      setClients(dashboard.clients || []);
+      setOffices(dashboard.office || []);
     } catch (error) {
       console.error("Error refreshing data:", error);
+      watermark.current = null;
       setAppointments([]);
       setTransactions([]);
       setClients([]);
@@ -49,25 +67,6 @@ const AgentDashboard = (agent) => {
     }
   };
 
-  const fetchData = async (apiEndpoint, setDataFunction) => {
-    try {
-      if (!AGENT_ID) {
-        console.error("No agent ID available");
-        return;
-      }
-
-      console.log(`Fetching data for agent ${AGENT_ID} from ${apiEndpoint}`);
-      const response = await axios.post(apiEndpoint, {
-        agentId: AGENT_ID
-      });
-      console.log(`Response from ${apiEndpoint}:`, response.data);
-      setDataFunction(response.data || []);
-    } catch (error) {
-      console.error(`Error fetching data from ${apiEndpoint}:`, error);
-      setDataFunction([]);
-    }
-  };
-
   useEffect(() => {
     if (!AGENT_ID) {
       console.log("No agent ID available, skipping data fetch");
@@ -75,35 +74,56 @@ const AgentDashboard = (agent) => {
     }
 
     console.log("Initializing data fetch for agent:", AGENT_ID);
-    
+    watermark.current = null;
+
     // Initial data fetch
-    const endpoints = [
-      { url: `${API_BASE_URL}/getOffice`, setter: setOffices },
-      { url: `${API_BASE_URL}/getAppointments`, setter: setAppointments },
-      { url: `${API_BASE_URL}/getClients`, setter: setClients },
-      { url: `${API_BASE_URL}/getTransactions`, setter: setTransactions }
-    ];
+    refreshData();
 
-    // Fetch initial data
-    const fetchInitialData = async () => {
-      try {
-        await Promise.all(endpoints.map(endpoint => 
-          fetchData(endpoint.url, endpoint.setter)
-        ));
-      } catch (error) {
-        console.error("Error fetching initial data:", error);
-      }
-    };
+    let intervalId = null;
+    let refreshTimer = null;
+    let socket = null;
+    let closed = false;
 
-    fetchInitialData();
+    // Polling is only the fallback for when the push channel is unavailable
+    const startPolling = () => {
+      if (intervalId) return;
+      intervalId = setInterval(() => {
+        refreshData();
+      }, 5000);
+    };
 
-    // Set up polling
-    const intervalId = setInterval(() => {
-      fetchInitialData();
-    }, 5000);
+    if (SOCKET_URL) {
+      socket = new WebSocket(`${SOCKET_URL}?agentId=${encodeURIComponent(AGENT_ID)}`);
+      socket.onopen = () => {
+        if (intervalId) {
+          clearInterval(intervalId);
+          intervalId = null;
+        }
+        // Catch up on anything written before the subscription existed
+        refreshData();
+      };
+      socket.onmessage = (message) => {
+        // One booking sends several events; fetch their delta once
+        if (refreshTimer) return;
+        refreshTimer = setTimeout(() => {
+          refreshTimer = null;
+          refreshData();
+        }, 250);
+      };
+      socket.onclose = () => {
+        if (!closed) startPolling();
+      };
+    } else {
+      startPolling();
+    }
 
-    return () => clearInterval(intervalId);
-  }, [AGENT_ID, API_BASE_URL]);
+    return () => {
+      closed = true;
+      if (intervalId) clearInterval(intervalId);
+      if (refreshTimer) clearTimeout(refreshTimer);
+      if (socket) socket.close();
+    };
+  }, [AGENT_ID, API_BASE_URL, SOCKET_URL]);
 
   return (
     <div style={styles.container}>
@@ -1,69 +1,97 @@
 # agent_lambda_handler.py
 import json
-import traceback
-from typing import Any, Dict
 from decimal import Decimal
 
 from agent_service import AgentService
+from dynamo_metrics import flush_dynamo_metrics, set_metrics_endpoint
+from dynamo_utils import parse_page_request, parse_since, sync_watermark
+from property_search import PropertySearch, SearchUnavailable
+from responses import create_response, read_body, set_response_endpoint, start_response
+from structured_logging import get_logger, start_request, request_id_from
 
-class DecimalEncoder(json.JSONEncoder):
-    """Custom JSON encoder to handle Decimal types"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        return super(DecimalEncoder, self).default(obj)
-
-def create_response(status_code: int, body: Any) -> Dict[str, Any]:
-    """Create a response with CORS headers"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(body, cls=DecimalEncoder) if not isinstance(body, str) else body
-    }
+logger = get_logger('agent_handler')
 
+# Reused across warm invocations; built on the first request
+_agent_service = None
+
+def get_agent_service() -> AgentService:
+    global _agent_service
+    if _agent_service is None:
+        _agent_service = AgentService()
+    return _agent_service
+
+def reset_agent_service() -> None:
+    """Forget the cached service (for tests)"""
+    global _agent_service
+    _agent_service = None
+
+@flush_dynamo_metrics
 def handler(event, context):
-    print("Lambda invoked with event:", json.dumps(event))
+    start_request(request_id_from(context))
+    start_response(event)
+    # The full event (headers, body) is only written for sampled/DEBUG requests
+    logger.debug('Lambda invoked', extra={'fields': {'event': event}})
 
     # Handle OPTIONS requests for CORS preflight
     if event.get('httpMethod') == 'OPTIONS':
-        print("Handling OPTIONS request")
+        logger.debug('Handling OPTIONS request')
         return create_response(200, {
             'message': 'CORS preflight handled successfully'
         })
 
     try:
-        print(f"Received event: {json.dumps(event)}")
-        
         # Parse path to determine action
         path = event.get('path', '').rstrip('/').split('/')[-1]
-        print(f"Processing path: {path}")
+        set_metrics_endpoint(path)
+        set_response_endpoint(path)
+        logger.info('Processing path: %s', path)
 
         # Parse request body
         body = {}
-        if event.get('body'):
+        raw_body = read_body(event)
+        if raw_body:
             try:
-                body = json.loads(event.get('body'))
+                body = json.loads(raw_body)
             except json.JSONDecodeError:
                 return create_response(400, {'message': 'Invalid JSON in request body'})
 
-        agent_service = AgentService()
+        agent_service = get_agent_service()
 
         # Handle getProperties separately without requiring agentId
         if path == 'getProperties':
-            result = agent_service.get_properties()
+            try:
+                page_request = parse_page_request(body)
+                if page_request is None:
+                    # Serialized and hashed only when the catalog changes
+                    properties, etag = agent_service.get_properties_body()
+                    return create_response(200, properties, etag=etag)
+                result = agent_service.get_properties_page(*page_request)
+            except ValueError as ve:
+                return create_response(400, {'message': str(ve)})
+            return create_response(200, result)
+
+        if path == 'searchProperties':
+            try:
+                result = agent_service.search_properties(PropertySearch.from_request(body))
+            except ValueError as ve:
+                return create_response(400, {'message': str(ve)})
+            except SearchUnavailable as su:
+                return create_response(503, {'message': str(su)})
             return create_response(200, result)
 
         # Only check for root-level agentId for endpoints that need it
-        if path in ['getAgent', 'getAppointments', 'getClients', 'getTransactions', 'getOffice']:
+        if path in ['getAgent', 'getAppointments', 'getClients', 'getTransactions', 'getOffice', 'getAgentDashboard']:
             agent_id = body.get('agentId')
             if not agent_id:
                 return create_response(400, {'message': 'agentId is required'})
 
+            try:
+                since = parse_since(body)
+            except ValueError as ve:
+                return create_response(400, {'message': str(ve)})
+            # Taken before the reads so nothing written during them is skipped
+            watermark = sync_watermark()
+
             # Route to appropriate handler based on path
             if path == 'getAgent':
                 result = agent_service.get_agent(agent_id)
@@ -72,15 +100,21 @@ def handler(event, context):
                 return create_response(200, result)
 
             elif path == 'getAppointments':
-                result = agent_service.get_appointments(agent_id)
+                result = agent_service.get_appointments(agent_id, since)
+                if since is not None:
+                    return create_response(200, {'items': result, 'watermark': watermark})
                 return create_response(200, result)
 
             elif path == 'getClients':
-                result = agent_service.get_clients(agent_id)
+                result = agent_service.get_clients(agent_id, since)
+                if since is not None:
+                    return create_response(200, {'items': result, 'watermark': watermark})
                 return create_response(200, result)
 
             elif path == 'getTransactions':
-                result = agent_service.get_transactions(agent_id)
+                result = agent_service.get_transactions(agent_id, since)
+                if since is not None:
+                    return create_response(200, {'items': result, 'watermark': watermark})
                 return create_response(200, result)
 
             elif path == 'getOffice':
@@ -89,13 +123,18 @@ def handler(event, context):
                     return create_response(404, {'message': 'Office not found'})
                 return create_response(200, result)
 
+            elif path == 'getAgentDashboard':
+                result = agent_service.get_dashboard(agent_id, since)
+                result['watermark'] = watermark
+                return create_response(200, result)
+
         elif path == 'addProperty':
             if not body.get('property'):
-                print("No property object in request body")
+                logger.warning('No property object in request body')
                 return create_response(400, {'message': 'Property data is required'})
             
             property_data = body['property']
-            print(f"Processing property data: {json.dumps(property_data)}")
+            logger.debug('Processing property data', extra={'fields': {'property': property_data}})
 
             required_fields = [
                 'agentId', 'propertyType', 'street', 'city', 'state', 'zipcode',
@@ -105,7 +144,7 @@ def handler(event, context):
             
             missing_fields = [field for field in required_fields if not property_data.get(field)]
             if missing_fields:
-                print(f"Missing required fields: {missing_fields}")
+                logger.warning('Missing required fields: %s', missing_fields)
                 return create_response(400, {
                     'message': 'Missing required fields',
                     'fields': missing_fields,
@@ -119,7 +158,7 @@ def handler(event, context):
                 property_data['numBathrooms'] = int(property_data['numBathrooms'])
                 property_data['squareFootage'] = int(property_data['squareFootage'])
             except (ValueError, TypeError) as e:
-                print(f"Type conversion error: {str(e)}")
+                logger.warning('Type conversion error: %s', e)
                 return create_response(400, {
                     'message': 'Invalid numeric value',
                     'error': str(e)
@@ -129,16 +168,16 @@ def handler(event, context):
                 property_id = agent_service.add_property(property_data)
                 return create_response(200, {'propertyId': property_id})
             except ValueError as ve:
-                print(f"Validation error: {str(ve)}")
+                logger.warning('Validation error: %s', ve)
                 return create_response(400, {'message': str(ve)})
 
         elif path == 'addTransaction':
-            print(f"Processing addTransaction with data: {json.dumps(body)}")
+            logger.debug('Processing addTransaction', extra={'fields': {'transaction': body}})
             required_fields = ['agentId', 'clientId', 'propertyId', 'amount', 'transactionType', 'dateSent']
             
             missing_fields = [field for field in required_fields if not body.get(field)]
             if missing_fields:
-                print(f"Missing required fields: {missing_fields}")
+                logger.warning('Missing required fields: %s', missing_fields)
                 return create_response(400, {
                     'message': 'Missing required fields',
                     'fields': missing_fields,
@@ -158,7 +197,7 @@ def handler(event, context):
                 transaction_id = agent_service.add_transaction(body)
                 return create_response(200, {'transactionId': transaction_id})
             except ValueError as ve:
-                print(f"Validation error: {str(ve)}")
+                logger.warning('Validation error: %s', ve)
                 return create_response(400, {'message': str(ve)})
 
         else:
@@ -167,8 +206,7 @@ def handler(event, context):
     except json.JSONDecodeError:
         return create_response(400, {'message': 'Invalid JSON in request body'})
     except Exception as e:
-        print(f"Error: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception('Error: %s', e)
         return create_response(500, {
             'message': 'Internal server error',
             'error': str(e),
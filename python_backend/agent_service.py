@@ -1,28 +1,117 @@
 # agent_service.py
-import boto3
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator, Tuple
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from botocore.exceptions import ClientError
 from decimal import Decimal
 
+from aws_resources import get_dynamodb_resource
+from dynamo_metrics import instrument
+from change_events import get_change_publisher
+from entity_cache import EntityCache
+from dynamo_utils import (fetch_page, parallel_scan, batch_get_items, iter_items,
+                          utc_timestamp, SCAN_SEGMENTS)
+from property_catalog import PropertyCatalog, catalog_shard
+from property_search import PropertySearch, SearchUnavailable, search_properties
+from structured_logging import bind_request_context, get_logger
+
+logger = get_logger('agent_service')
+
+# Sections returned by get_dashboard, mapped to the AgentService method that builds each one
+DASHBOARD_SECTIONS = {
+    'appointments': 'get_appointments',
+    'transactions': 'get_transactions',
+    'clients': 'get_clients',
+    'office': 'get_office',
+}
+
+# Sections that can be read as a delta through their agent-updated-index;
+# the rest are only sent on a full read
+DELTA_SECTIONS = ('appointments', 'transactions', 'clients')
+
 class AgentService:
-    def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
+    def __init__(self, dynamodb_resource=None, change_publisher=None, entity_cache=None):
+        self.dynamodb = instrument(dynamodb_resource or get_dynamodb_resource())
+        self.change_publisher = change_publisher or get_change_publisher()
+        # Agent and Office point lookups, kept across warm invocations
+        self.entity_cache = entity_cache or EntityCache()
         self.table_prefix = 'dev-'
+        self._tables = {}
+        self._catalog = None
 
     def _get_table(self, table_name: str):
         """Helper method to get table with proper prefix"""
-        return self.dynamodb.Table(f"{self.table_prefix}{table_name}")
+        name = f"{self.table_prefix}{table_name}"
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = self.dynamodb.Table(name)
+        return table
+
+    @property
+    def catalog(self) -> PropertyCatalog:
+        """Property replica kept for the life of the container"""
+        if self._catalog is None:
+            self._catalog = PropertyCatalog(self._get_table('Property'))
+        return self._catalog
+
+    def _publish_change(self, agent_id: str, entity: str, action: str,
+                        entity_id: str, updated_at: str) -> None:
+        """Tell subscribed dashboards about a write; never fails the write itself"""
+        try:
+            self.change_publisher.publish(agent_id, entity, action, entity_id, updated_at)
+        except Exception as e:
+            logger.error('Error publishing %s change: %s', entity, e)
+
+    def iter_properties(self, segments: Optional[int] = None,
+                        max_workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream every property, one scan page at a time (segments > 1 scans in parallel)"""
+        table = self._get_table('Property')
+        return parallel_scan(table.scan, segments or SCAN_SEGMENTS, max_workers)
+
+    def iter_segment(self, table_name: str, segment: int = 0,
+                     total_segments: int = 1) -> Iterator[Dict[str, Any]]:
+        """Stream one scan segment of a table, one page in memory at a time"""
+        table = self._get_table(table_name)
+        if total_segments == 1:
+            return iter_items(table.scan)
+        return iter_items(table.scan, Segment=segment, TotalSegments=total_segments)
 
     def get_properties(self) -> List[Dict[str, Any]]:
-        """Get all properties"""
+        """Get all properties (from the container's catalog replica)"""
+        try:
+            return self.catalog.items()
+        except Exception as e:
+            logger.error('Error getting properties: %s', e)
+            raise
+
+    def get_properties_body(self) -> Tuple[str, str]:
+        """get_properties() as an already serialized JSON body, and its ETag"""
+        try:
+            return self.catalog.body()
+        except Exception as e:
+            logger.error('Error getting properties: %s', e)
+            raise
+
+    def get_properties_page(self, limit: int, next_token: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of properties plus the cursor for the next page"""
         try:
             table = self._get_table('Property')
-            response = table.scan()
-            return response.get('Items', [])
+            items, next_token = fetch_page(table.scan, limit, next_token)
+            return {'items': items, 'nextToken': next_token}
+        except Exception as e:
+            logger.error('Error getting properties page: %s', e)
+            raise
+
+    def search_properties(self, search: PropertySearch) -> Dict[str, Any]:
+        """One page of properties matching a search, read through a price GSI where possible"""
+        try:
+            return search_properties(self._get_table('Property'), search)
+        except (ValueError, SearchUnavailable):
+            # A bad cursor or an index still being deployed; the handler answers 400/503
+            raise
         except Exception as e:
-            print(f"Error getting properties: {str(e)}")
+            logger.error('Error searching properties: %s', e)
             raise
 
     def get_agent(self, agent_id: str) -> Optional[Dict[str, Any]]:
@@ -32,13 +121,29 @@ class AgentService:
                 raise ValueError("Agent ID cannot be null or empty")
 
             table = self._get_table('Agent')
-            response = table.get_item(Key={'agentId': agent_id})
-            return response.get('Item')
+            return self.entity_cache.get(
+                'Agent', agent_id, lambda: table.get_item(Key={'agentId': agent_id}).get('Item'))
 
         except Exception as e:
-            print(f"Error getting agent: {str(e)}")
+            logger.error('Error getting agent: %s', e)
             raise
 
+    def _query_agent(self, table, index_name: str, agent_id: str,
+                     since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rows for an agent, or only those updated after `since` via agent-updated-index"""
+        if since is None:
+            return table.query(
+                IndexName=index_name,
+                KeyConditionExpression='agentId = :agentId',
+                ExpressionAttributeValues={':agentId': agent_id}
+            ).get('Items', [])
+        return list(iter_items(
+            table.query,
+            IndexName='agent-updated-index',
+            KeyConditionExpression='agentId = :agentId AND updatedAt > :since',
+            ExpressionAttributeValues={':agentId': agent_id, ':since': since}
+        ))
+
     def get_agent_properties(self, agent_id: str) -> List[Dict[str, Any]]:
         """Get properties by agent ID"""
         try:
@@ -50,22 +155,19 @@ class AgentService:
             )
             return response.get('Items', [])
         except Exception as e:
-            print(f"Error getting properties: {str(e)}")
+            logger.error('Error getting properties: %s', e)
             raise
 
-    def get_appointments(self, agent_id: str) -> List[Dict[str, Any]]:
-        """Get appointments by agent ID"""
+    def get_appointments(self, agent_id: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get appointments by agent ID (only those changed after `since` if given)"""
         try:
             table = self._get_table('Appointment')
-            response = table.query(
-                IndexName='agent-date-index',
-                KeyConditionExpression='agentId = :agentId',
-                ExpressionAttributeValues={':agentId': agent_id}
-            )
+            items = self._query_agent(table, 'agent-date-index', agent_id, since)
             # Convert response to match frontend expectations
             appointments = []
-            for item in response.get('Items', []):
+            for item in items:
                 appointments.append({
+                    'APPOINTMENT_ID': item.get('appointmentId'),
                     'APPT_TIME': item.get('appointmentTime'),
                     'APPT_DATE': item.get('appointmentDate'),
                     'PURPOSE': item.get('purpose'),
@@ -74,32 +176,31 @@ class AgentService:
                 })
             return appointments
         except Exception as e:
-            print(f"Error getting appointments: {str(e)}")
+            logger.error('Error getting appointments: %s', e)
             raise
 
-    def get_clients(self, agent_id: str) -> List[Dict[str, Any]]:
-        """Get clients by agent ID"""
+    def get_clients(self, agent_id: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get clients by agent ID (only newly linked ones if `since` is given)"""
         try:
             # Get client-agent relationships
             ca_table = self._get_table('ClientAgent')
-            client_agents = ca_table.query(
-                IndexName='agent-index',
-                KeyConditionExpression='agentId = :agentId',
-                ExpressionAttributeValues={':agentId': agent_id}
-            ).get('Items', [])
+            client_agents = self._query_agent(ca_table, 'agent-index', agent_id, since)
 
-            # Get client details
-            client_table = self._get_table('Client')
+            # Get client details in bulk, then put them back in relationship order
+            found = batch_get_items(
+                self.dynamodb,
+                f"{self.table_prefix}Client",
+                [{'clientId': ca['clientId']} for ca in client_agents]
+            )
+            clients_by_id = {client['clientId']: client for client in found}
             clients = []
-            
+
             for ca in client_agents:
-                response = client_table.get_item(
-                    Key={'clientId': ca['clientId']}
-                )
-                if 'Item' in response:
-                    client = response['Item']
+                client = clients_by_id.get(ca['clientId'])
+                if client:
                     # Convert to frontend expected format
                     clients.append({
+                        'CLIENT_ID': client.get('clientId'),
                         'CLIENT_FIRST_NAME': client.get('firstName'),
                         'CLIENT_LAST_NAME': client.get('lastName'),
                         'CLIENT_EMAIL': client.get('email'),
@@ -110,22 +211,18 @@ class AgentService:
                     })
             return clients
         except Exception as e:
-            print(f"Error getting clients: {str(e)}")
+            logger.error('Error getting clients: %s', e)
             raise
 
-    def get_transactions(self, agent_id: str) -> List[Dict[str, Any]]:
-        """Get transactions by agent ID"""
+    def get_transactions(self, agent_id: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get transactions by agent ID (only those changed after `since` if given)"""
         try:
             table = self._get_table('Transaction')
             try:
-                response = table.query(
-                    IndexName='agent-index',
-                    KeyConditionExpression='agentId = :agentId',
-                    ExpressionAttributeValues={':agentId': agent_id}
-                )
+                items = self._query_agent(table, 'agent-index', agent_id, since)
                 # Convert to frontend expected format
                 transactions = []
-                for item in response.get('Items', []):
+                for item in items:
                     transactions.append({
                         'TRANSACTION_ID': item.get('transactionId'),
                         'CLIENT_ID': item.get('clientId'),
@@ -135,10 +232,15 @@ class AgentService:
                     })
                 return transactions
             except self.dynamodb.meta.client.exceptions.ResourceNotFoundException:
-                print(f"Transaction table or index not found for agent {agent_id}")
+                logger.warning('Transaction table or index not found for agent %s', agent_id)
+                if since is not None:
+                    raise
                 return []
         except Exception as e:
-            print(f"Error getting transactions: {str(e)}")
+            logger.error('Error getting transactions: %s', e)
+            # An empty delta would read as "nothing changed", so let it surface
+            if since is not None:
+                raise
             # Return empty list instead of raising to prevent UI disruption
             return []
 
@@ -148,7 +250,7 @@ class AgentService:
             # First get the agent to get the officeId
             agent = self.get_agent(agent_id)
             if not agent or 'officeId' not in agent:
-                print(f"No office ID found for agent {agent_id}")
+                logger.warning('No office ID found for agent %s', agent_id)
                 return [{
                     'STREET': 'No office assigned',
                     'CITY': '',
@@ -159,8 +261,9 @@ class AgentService:
             try:
                 # Then get the office details
                 table = self._get_table('Office')
-                response = table.get_item(Key={'officeId': agent['officeId']})
-                office = response.get('Item')
+                office_id = agent['officeId']
+                office = self.entity_cache.get(
+                    'Office', office_id, lambda: table.get_item(Key={'officeId': office_id}).get('Item'))
                 
                 if office:
                     # Convert to frontend expected format
@@ -180,7 +283,7 @@ class AgentService:
                 }]
 
             except Exception as e:
-                print(f"Error accessing Office table: {str(e)}")
+                logger.error('Error accessing Office table: %s', e)
                 # Return placeholder if table doesn't exist
                 return [{
                     'STREET': 'Office system unavailable',
@@ -190,9 +293,41 @@ class AgentService:
                 }]
 
         except Exception as e:
-            print(f"Error getting office: {str(e)}")
+            logger.error('Error getting office: %s', e)
             raise
 
+    def get_dashboard(self, agent_id: str, since: Optional[str] = None) -> Dict[str, Any]:
+        """Run every dashboard read concurrently and return them as one payload.
+
+        With `since`, only the DELTA_SECTIONS are read and each holds just the
+        rows changed after that timestamp.
+        """
+        if since is None:
+            calls = {section: (method, ()) for section, method in DASHBOARD_SECTIONS.items()}
+        else:
+            calls = {section: (DASHBOARD_SECTIONS[section], (since,)) for section in DELTA_SECTIONS}
+
+        dashboard: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=len(calls),
+                                thread_name_prefix='dashboard') as executor:
+            futures = {
+                section: executor.submit(bind_request_context(getattr(self, method)), agent_id, *args)
+                for section, (method, args) in calls.items()
+            }
+            for section, future in futures.items():
+                try:
+                    dashboard[section] = future.result()
+                except Exception as e:
+                    # One failing section should not blank the whole dashboard
+                    logger.error('Error getting dashboard section %s: %s', section, e)
+                    dashboard[section] = []
+                    errors[section] = str(e)
+
+        if errors:
+            dashboard['errors'] = errors
+        return dashboard
+
     def add_property(self, property_data: Dict[str, Any]) -> str:
         """Add a new property with validation"""
         try:
@@ -222,14 +357,21 @@ class AgentService:
             if 'propertyId' not in property_data:
                 property_data['propertyId'] = str(uuid.uuid4())
 
+            property_data['updatedAt'] = utc_timestamp()
+            # Puts the row on catalog-updated-index for other containers' replicas
+            property_data['catalog'] = catalog_shard(property_data['propertyId'])
+
             # Add to database
             table = self._get_table('Property')
             table.put_item(Item=property_data)
-            
+            self.catalog.invalidate(property_data)
+            self._publish_change(property_data['agentId'], 'property', 'created',
+                                 property_data['propertyId'], property_data['updatedAt'])
+
             return property_data['propertyId']
 
         except Exception as e:
-            print(f"Error adding property: {str(e)}")
+            logger.error('Error adding property: %s', e)
             raise ValueError(f"Failed to add property: {str(e)}")
 
     def add_transaction(self, transaction_data: Dict[str, Any]) -> str:
@@ -254,13 +396,16 @@ class AgentService:
             # Add timestamp if not provided
             if 'timestamp' not in transaction_data:
                 transaction_data['timestamp'] = datetime.now().isoformat()
+            transaction_data['updatedAt'] = utc_timestamp()
 
             # Add to database
             table = self._get_table('Transaction')
             table.put_item(Item=transaction_data)
-            
+            self._publish_change(transaction_data['agentId'], 'transaction', 'created',
+                                 transaction_data['transactionId'], transaction_data['updatedAt'])
+
             return transaction_data['transactionId']
 
         except Exception as e:
-            print(f"Error adding transaction: {str(e)}")
+            logger.error('Error adding transaction: %s', e)
             raise ValueError(f"Failed to add transaction: {str(e)}")
\ No newline at end of file
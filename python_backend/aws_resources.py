@@ -0,0 +1,41 @@
+# aws_resources.py
+import os
+import threading
+
+import boto3
+
+from dynamodb_config import build_dynamodb_config
+
+# 'resource' uses boto3's resource layer; 'client' uses the low-level client
+# with the item_codec converters (see fast_dynamodb); 'memory' is the
+# in-process stand-in for local runs and load tests (see memory_dynamodb),
+# kept in MEMORY_DYNAMODB_PATH when that is set
+DYNAMODB_BACKEND = os.environ.get('DYNAMODB_BACKEND', 'resource')
+
+# Created once per Lambda container and reused by every warm invocation.
+_dynamodb = None
+_lock = threading.Lock()
+
+
+def get_dynamodb_resource():
+    """Return the shared DynamoDB resource, creating it on first use"""
+    global _dynamodb
+    if _dynamodb is None:
+        with _lock:
+            if _dynamodb is None:
+                if DYNAMODB_BACKEND == 'client':
+                    from fast_dynamodb import FastDynamoResource
+                    _dynamodb = FastDynamoResource()
+                elif DYNAMODB_BACKEND == 'memory':
+                    from memory_dynamodb import MemoryDynamoResource
+                    _dynamodb = MemoryDynamoResource(path=os.environ.get('MEMORY_DYNAMODB_PATH') or None)
+                else:
+                    _dynamodb = boto3.resource('dynamodb', config=build_dynamodb_config())
+    return _dynamodb
+
+
+def reset_dynamodb_resource() -> None:
+    """Drop the shared resource so the next call builds a fresh one (tests)"""
+    global _dynamodb
+    with _lock:
+        _dynamodb = None
@@ -0,0 +1,154 @@
+# benchmarks/compression_bench.py
+# Response compression on real payloads: the getProperties catalog body and
+# the busiest agent's appointment history, built from benchmarks.dataset.
+# For each payload it reports compressed and base64 sizes and compress /
+# decompress times per gzip level and brotli quality (brotli only when the
+# package is installed), then invokes the handlers end to end with and
+# without Accept-Encoding to show the response bytes and latency the Lambda
+# actually returns.
+#
+#   cd python_backend && python -m benchmarks.compression_bench [--agents N] [--repeat R]
+import argparse
+import base64
+import gzip
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import responses
+from benchmarks import dataset
+from benchmarks.handler_bench import git_commit, install, invoke, peak_rss_mb, percentiles, proxy_event, quiet
+from memory_dynamodb import MemoryDynamoResource
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 5, 11)
+
+
+def _codecs() -> Dict[str, tuple]:
+    """name -> (compress, decompress)"""
+    codecs: Dict[str, tuple] = {}
+    for level in GZIP_LEVELS:
+        codecs[f"gzip-{level}"] = (lambda data, level=level: gzip.compress(data, compresslevel=level),
+                                   gzip.decompress)
+    if responses.brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            codecs[f"br-{quality}"] = (lambda data, quality=quality: responses.brotli.compress(data, quality=quality),
+                                       responses.brotli.decompress)
+    return codecs
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_payload(body: str, repeat: int) -> Dict[str, Any]:
+    data = body.encode('utf-8')
+    report: Dict[str, Any] = {'bytes': len(data), 'codecs': {}}
+    for name, (compress, decompress) in _codecs().items():
+        compressed = compress(data)
+        report['codecs'][name] = {
+            'bytes': len(compressed),
+            'base64_bytes': len(base64.b64encode(compressed)),
+            'ratio': round(len(data) / len(compressed), 2),
+            'compress': percentiles(_timed(lambda: compress(data), repeat)),
+            'decompress': percentiles(_timed(lambda: decompress(compressed), repeat)),
+        }
+    return report
+
+
+def _event(path: str, body: Dict[str, Any], accept_encoding: str) -> Dict[str, Any]:
+    event = proxy_event(path, body)
+    if accept_encoding:
+        event['headers']['Accept-Encoding'] = accept_encoding
+    else:
+        del event['headers']['Accept-Encoding']
+    return event
+
+
+def bench_handler(handler_name: str, path: str, body: Dict[str, Any], accept_encoding: str,
+                  repeat: int) -> Dict[str, Any]:
+    def call():
+        return invoke(handler_name, _event(path, body, accept_encoding))
+
+    # The first call compresses; later ones reuse the body cached by ETag when there is one
+    first, first_seconds = call()
+    samples = [call()[1] for _ in range(repeat)]
+    return {
+        'status': first['statusCode'],
+        'content_encoding': first['headers'].get('Content-Encoding'),
+        'response_bytes': len(first['body']),
+        'first_ms': round(first_seconds * 1000, 3),
+        'latency': percentiles(samples),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    dynamodb = MemoryDynamoResource()
+    spec = dataset.DatasetSpec(agents=args.agents, seed=args.seed)
+    counts = dataset.populate(dynamodb, spec)
+    install(dynamodb)
+
+    # Agent 0 has the most clients under the default skew
+    busiest = dataset.agent_id(0)
+    endpoints = {
+        'getProperties': ('agent', '/api/getProperties', {}),
+        'getAppointments': ('agent', '/api/getAppointments', {'agentId': busiest}),
+        'getAgentDashboard': ('agent', '/api/getAgentDashboard', {'agentId': busiest}),
+    }
+    encodings = ['', 'gzip'] + (['br'] if responses.brotli is not None else [])
+
+    report: Dict[str, Any] = {
+        'benchmark': 'compression_bench',
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'brotli': responses.brotli is not None,
+        'config': {name: value for name, value in vars(args).items() if name != 'output'},
+        'settings': {
+            'min_bytes': responses.RESPONSE_COMPRESSION_MIN_BYTES,
+            'encodings': responses.RESPONSE_ENCODINGS,
+            'gzip_level': responses.RESPONSE_GZIP_LEVEL,
+            'brotli_quality': responses.RESPONSE_BROTLI_QUALITY,
+        },
+        'dataset': counts,
+        'payloads': {},
+        'handlers': {},
+    }
+    with quiet():
+        for name, (handler_name, path, body) in endpoints.items():
+            response, _ = invoke(handler_name, _event(path, body, ''))
+            report['payloads'][name] = bench_payload(response['body'], args.repeat)
+            report['handlers'][name] = {
+                encoding or 'identity': bench_handler(handler_name, path, body, encoding, args.repeat)
+                for encoding in encodings
+            }
+    report['peak_rss_mb'] = peak_rss_mb()
+    dynamodb.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response compression size/latency benchmark')
+    parser.add_argument('--agents', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+# benchmarks/dataset.py
+# Synthetic real-estate dataset for scale tests: offices, agents and their
+# properties, clients linked to agents, appointments and transactions, all
+# keyed as in template.yaml. Ids are derived from positions (agent-000042,
+# client-000017) so benchmark events can name rows without reading them back.
+#
+# Skew is configurable: agents are picked with a Zipf law (a few hot agents
+# hold most clients and listings), cities likewise, and the number of
+# appointments and transactions per client is long-tailed. Work is split into
+# fixed ranges of agents and clients, each with its own seed, so the output
+# is the same for any number of workers and memory stays bounded by the task
+# size.
+#
+#   cd python_backend && python -m benchmarks.dataset --agents 10000 --clients 1000000 --ndjson /tmp/dataset [--gzip]
+#   cd python_backend && python -m benchmarks.dataset --agents 10000 --clients 1000000 --db /tmp/dataset.db
+import argparse
+import bisect
+import gzip
+import itertools
+import json
+import math
+import os
+import random
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from client_models import ClientAgent
+from dynamo_utils import utc_timestamp
+from property_catalog import catalog_shard
+from responses import to_json
+
+CITIES = [
+    'New Orleans', 'Baton Rouge', 'Shreveport', 'Lafayette', 'Lake Charles', 'Kenner', 'Bossier City',
+    'Monroe', 'Alexandria', 'Houma', 'Metairie', 'Marrero', 'New Iberia', 'Laplace', 'Slidell',
+    'Central', 'Ruston', 'Sulphur', 'Hammond', 'Natchitoches', 'Gretna', 'Opelousas', 'Zachary',
+    'Thibodaux', 'Pineville', 'Crowley', 'Baker', 'Minden', 'Covington', 'Mandeville',
+]
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+               'William', 'Elizabeth', 'David', 'Barbara', 'Joseph', 'Susan', 'Charles', 'Jessica']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Thibodeaux', 'Broussard', 'Landry']
+PROPERTY_TYPES = ['HOUSE', 'CONDO', 'TOWNHOUSE']
+PROPERTY_STATUSES = ['AVAILABLE', 'PENDING', 'SOLD']
+TRANSACTION_TYPES = ['SALE', 'PURCHASE', 'RENTAL']
+PURPOSES = ['Viewing', 'Open house', 'Inspection', 'Closing', 'Consultation']
+
+TABLES = ('Office', 'Agent', 'Property', 'Client', 'ClientAgent', 'Appointment', 'Transaction')
+
+# Rows are stamped over the 30 days before this moment
+EPOCH = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+_WINDOW_SECONDS = 30 * 24 * 3600
+
+# Agents or clients per task, and items handed to bulk_load at a time
+TASK_SIZE = 2000
+_LOAD_CHUNK = 5000
+
+
+@dataclass
+class DatasetSpec:
+    """Sizes and skew of a dataset; the same spec and seed always give the same rows"""
+    agents: int = 100
+    clients: Optional[int] = None  # agents * 10 when not given
+    offices: Optional[int] = None  # one per 20 agents when not given
+    properties_per_agent: float = 20
+    appointments_per_client: float = 2
+    transactions_per_client: float = 1
+    # Zipf exponents: 0 is uniform, 1 is a classic Zipf law
+    agent_skew: float = 0.8
+    city_skew: float = 1.0
+    # Per-client appointment/transaction counts: one plus a geometric tail
+    # around the mean instead of exactly the mean
+    long_tail: bool = True
+    # Share of clients who also work with a second agent
+    second_agent_rate: float = 0.1
+    seed: int = 7
+
+    def __post_init__(self):
+        if self.clients is None:
+            self.clients = self.agents * 10
+        if self.offices is None:
+            self.offices = max(1, self.agents // 20)
+
+
+def agent_id(index: int) -> str:
+    return f"agent-{index:06d}"
+
+
+def client_id(index: int) -> str:
+    return f"client-{index:06d}"
+
+
+def office_id(index: int) -> str:
+    return f"office-{index:04d}"
+
+
+def property_id(agent: int, index: int) -> str:
+    return f"property-{agent:06d}-{index:04d}"
+
+
+def appointment_id(client: int, index: int) -> str:
+    return f"appointment-{client:06d}-{index:03d}"
+
+
+def transaction_id(client: int, index: int) -> str:
+    return f"transaction-{client:06d}-{index:03d}"
+
+
+@lru_cache(maxsize=8)
+def _zipf_cdf(count: int, skew: float) -> array:
+    """Cumulative Zipf weights of ranks 1..count; rank 0 (agent-000000) is the hottest"""
+    cdf = array('d')
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += rank ** -skew
+        cdf.append(total)
+    return cdf
+
+
+def _zipf(rng: random.Random, count: int, skew: float) -> int:
+    if skew <= 0:
+        return rng.randrange(count)
+    cdf = _zipf_cdf(count, skew)
+    return min(count - 1, bisect.bisect_right(cdf, rng.random() * cdf[-1]))
+
+
+@lru_cache(maxsize=8)
+def _listing_counts(agents: int, per_agent: float, skew: float) -> array:
+    """Properties per agent: the total is agents * per_agent, shared out by Zipf weight, at least one each"""
+    counts = array('l')
+    if skew <= 0:
+        counts.extend(max(1, round(per_agent)) for _ in range(agents))
+        return counts
+    cdf = _zipf_cdf(agents, skew)
+    total = agents * per_agent
+    previous = 0.0
+    for cumulative in cdf:
+        counts.append(max(1, round(total * (cumulative - previous) / cdf[-1])))
+        previous = cumulative
+    return counts
+
+
+def _count(rng: random.Random, mean: float, long_tail: bool) -> int:
+    if mean <= 0:
+        return 0
+    if not long_tail:
+        return round(mean)
+    if mean < 1:
+        return 1 if rng.random() < mean else 0
+    if mean == 1:
+        return 1
+    # 1 + geometric with mean (mean - 1), capped so one client cannot swamp a table
+    extra = int(math.log(1 - rng.random()) / math.log(1 - 1 / mean))
+    return 1 + min(extra, int(mean * 50))
+
+
+def _stamp(rng: random.Random) -> str:
+    return utc_timestamp(EPOCH - timedelta(seconds=rng.randrange(_WINDOW_SECONDS)))
+
+
+def _phone(rng: random.Random, area: str) -> str:
+    return f"{area}-555-{rng.randrange(10000):04d}"
+
+
+def _city(rng: random.Random, spec: DatasetSpec) -> str:
+    return CITIES[_zipf(rng, len(CITIES), spec.city_skew)]
+
+
+def _rng(spec: DatasetSpec, kind: str, start: int) -> random.Random:
+    # String seeds are hashed with SHA-512, so they are stable across processes
+    return random.Random(f"{spec.seed}:{kind}:{start}")
+
+
+def _offices(spec: DatasetSpec, start: int, end: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    rng = _rng(spec, 'office', start)
+    for index in range(start, end):
+        yield 'Office', {
+            'officeId': office_id(index),
+            'officeName': f"Office {index}",
+            'street': f"{rng.randrange(1, 9999)} Government St",
+            'city': _city(rng, spec),
+            'state': 'LA',
+            'zipcode': f"70{rng.randrange(100, 999)}",
+            'phone': _phone(rng, '225'),
+        }
+
+
+def _agents(spec: DatasetSpec, start: int, end: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    rng = _rng(spec, 'agent', start)
+    listings = _listing_counts(spec.agents, spec.properties_per_agent, spec.agent_skew)
+    for agent in range(start, end):
+        yield 'Agent', {
+            'agentId': agent_id(agent),
+            'officeId': office_id(agent % spec.offices),
+            'firstName': rng.choice(FIRST_NAMES),
+            'lastName': rng.choice(LAST_NAMES),
+            'email': f"agent{agent}@example.com",
+            'phone': _phone(rng, '225'),
+            'licenseNumber': f"LA-{rng.randrange(10 ** 6):06d}",
+            'dateHired': f"{rng.randrange(2005, 2024)}-{rng.randrange(1, 13):02d}-15",
+        }
+        for index in range(listings[agent]):
+            yield 'Property', {
+                'propertyId': property_id(agent, index),
+                'agentId': agent_id(agent),
+                'propertyType': rng.choice(PROPERTY_TYPES),
+                'street': f"{rng.randrange(1, 9999)} Main St",
+                'city': _city(rng, spec),
+                'state': 'LA',
+                'zipcode': f"70{rng.randrange(100, 999)}",
+                'listPrice': Decimal(f"{rng.randrange(80000, 2000000)}.{rng.randrange(100):02d}"),
+                'numBedrooms': rng.randrange(1, 7),
+                'numBathrooms': rng.randrange(1, 5),
+                'squareFootage': rng.randrange(600, 6000),
+                'description': 'Charming home close to schools and shopping. ' * 3,
+                'listingDate': f"2024-{rng.randrange(1, 5):02d}-{rng.randrange(1, 29):02d}",
+                'status': rng.choice(PROPERTY_STATUSES),
+                'imageUrl': 'https://example.com/images/listing.jpg',
+                'catalog': catalog_shard(property_id(agent, index)),
+                'updatedAt': _stamp(rng),
+            }
+
+
+def _clients(spec: DatasetSpec, start: int, end: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    rng = _rng(spec, 'client', start)
+    listings = _listing_counts(spec.agents, spec.properties_per_agent, spec.agent_skew)
+    for client in range(start, end):
+        cid = client_id(client)
+        yield 'Client', {
+            'clientId': cid,
+            'firstName': rng.choice(FIRST_NAMES),
+            'lastName': rng.choice(LAST_NAMES),
+            'email': f"client{client}@example.com",
+            'phone': _phone(rng, '504'),
+            'street': f"{rng.randrange(1, 9999)} Oak Ave",
+            'city': _city(rng, spec),
+            'state': 'LA',
+            'zipcode': f"70{rng.randrange(100, 999)}",
+        }
+        agents = [_zipf(rng, spec.agents, spec.agent_skew)]
+        if rng.random() < spec.second_agent_rate:
+            second = _zipf(rng, spec.agents, spec.agent_skew)
+            if second != agents[0]:
+                agents.append(second)
+        for agent in agents:
+            yield 'ClientAgent', {
+                'id': ClientAgent.generate_id(cid, agent_id(agent)),
+                'clientId': cid,
+                'agentId': agent_id(agent),
+                'relationshipDate': f"2024-{rng.randrange(1, 4):02d}-{rng.randrange(1, 29):02d}T09:00:00",
+                'status': 'ACTIVE',
+                'updatedAt': _stamp(rng),
+            }
+        for index in range(_count(rng, spec.appointments_per_client, spec.long_tail)):
+            agent = rng.choice(agents)
+            yield 'Appointment', {
+                'appointmentId': appointment_id(client, index),
+                'clientId': cid,
+                'agentId': agent_id(agent),
+                'propertyId': property_id(agent, rng.randrange(listings[agent])),
+                'appointmentDate': f"2024-05-{rng.randrange(1, 29):02d}",
+                'appointmentTime': f"{rng.randrange(9, 18):02d}:00",
+                'purpose': rng.choice(PURPOSES),
+                'updatedAt': _stamp(rng),
+            }
+        for index in range(_count(rng, spec.transactions_per_client, spec.long_tail)):
+            agent = rng.choice(agents)
+            yield 'Transaction', {
+                'transactionId': transaction_id(client, index),
+                'propertyId': property_id(agent, rng.randrange(listings[agent])),
+                'agentId': agent_id(agent),
+                'clientId': cid,
+                'amount': Decimal(f"{rng.randrange(1000, 500000)}.00"),
+                'transactionType': rng.choice(TRANSACTION_TYPES),
+                'timestamp': f"2024-04-{rng.randrange(1, 29):02d}T10:00:00",
+                'updatedAt': _stamp(rng),
+            }
+
+
+_GENERATORS = {'office': _offices, 'agent': _agents, 'client': _clients}
+
+
+def tasks(spec: DatasetSpec, task_size: int = TASK_SIZE) -> List[Tuple[str, int, int]]:
+    """(kind, start, end) ranges covering the whole dataset"""
+    ranges = []
+    for kind, total in (('office', spec.offices), ('agent', spec.agents), ('client', spec.clients)):
+        ranges.extend((kind, start, min(total, start + task_size)) for start in range(0, total, task_size))
+    return ranges
+
+
+def generate(spec: DatasetSpec, kind: str, start: int, end: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(table, item) pairs of one task"""
+    return _GENERATORS[kind](spec, start, end)
+
+
+def _task_items(spec: DatasetSpec, task: Tuple[str, int, int]) -> Dict[str, List[Dict[str, Any]]]:
+    items: Dict[str, List[Dict[str, Any]]] = {}
+    for table, item in generate(spec, *task):
+        items.setdefault(table, []).append(item)
+    return items
+
+
+def _chunks(items: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(items), _LOAD_CHUNK):
+        yield items[start:start + _LOAD_CHUNK]
+
+
+def populate(dynamodb, spec: Optional[DatasetSpec] = None, workers: int = 1, task_size: int = TASK_SIZE,
+             table_prefix: str = 'dev-') -> Dict[str, int]:
+    """Load a dataset into a MemoryDynamoResource; returns the item count per table.
+
+    With workers > 1 the rows are generated in that many processes and loaded
+    here; at most two tasks per worker are in flight.
+    """
+    spec = spec or DatasetSpec()
+    counts = dict.fromkeys(TABLES, 0)
+
+    def load(items: Dict[str, List[Dict[str, Any]]]) -> None:
+        for table, rows in items.items():
+            for chunk in _chunks(rows):
+                counts[table] += dynamodb.bulk_load(f"{table_prefix}{table}", chunk)
+
+    pending_tasks = iter(tasks(spec, task_size))
+    if workers <= 1:
+        for task in pending_tasks:
+            load(_task_items(spec, task))
+        return counts
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = {executor.submit(_task_items, spec, task)
+                     for task in itertools.islice(pending_tasks, workers * 2)}
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                load(future.result())
+                task = next(pending_tasks, None)
+                if task is not None:
+                    in_flight.add(executor.submit(_task_items, spec, task))
+    return counts
+
+
+def ndjson_line(item: Dict[str, Any]) -> str:
+    """One item as a JSON line; Decimals are written as JSON numbers"""
+    return to_json(item, 'number') + '\n'
+
+
+def read_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    """Items of an NDJSON file (gzip if the name ends in .gz), numbers as int/Decimal"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line, parse_float=Decimal)
+
+
+def _write_part(spec: DatasetSpec, directory: str, part: int, parts: int, task_size: int,
+                compress: bool) -> Dict[str, int]:
+    """Write every `parts`-th task, starting at `part`, to <directory>/<Table>/part-<part>.ndjson[.gz]"""
+    files = {}
+    counts = dict.fromkeys(TABLES, 0)
+    suffix = '.ndjson.gz' if compress else '.ndjson'
+    try:
+        for task in tasks(spec, task_size)[part::parts]:
+            for table, item in generate(spec, *task):
+                f = files.get(table)
+                if f is None:
+                    path = os.path.join(directory, table, f"part-{part:04d}{suffix}")
+                    f = files[table] = (gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) if compress
+                                        else open(path, 'w', encoding='utf-8'))
+                f.write(ndjson_line(item))
+                counts[table] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def write_ndjson(spec: DatasetSpec, directory: str, workers: int = 1, task_size: int = TASK_SIZE,
+                 compress: bool = False) -> Dict[str, int]:
+    """Write a dataset as NDJSON, one directory per table and one part file per worker"""
+    for table in TABLES:
+        os.makedirs(os.path.join(directory, table), exist_ok=True)
+    workers = max(1, workers)
+    if workers == 1:
+        return _write_part(spec, directory, 0, 1, task_size, compress)
+    counts = dict.fromkeys(TABLES, 0)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_write_part, spec, directory, part, workers, task_size, compress)
+                   for part in range(workers)]
+        for future in futures:
+            for table, count in future.result().items():
+                counts[table] += count
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic real-estate dataset generator')
+    defaults = DatasetSpec()
+    parser.add_argument('--agents', type=int, default=defaults.agents)
+    parser.add_argument('--clients', type=int, help='defaults to 10 per agent')
+    parser.add_argument('--offices', type=int, help='defaults to one per 20 agents')
+    parser.add_argument('--properties-per-agent', type=float, default=defaults.properties_per_agent)
+    parser.add_argument('--appointments-per-client', type=float, default=defaults.appointments_per_client)
+    parser.add_argument('--transactions-per-client', type=float, default=defaults.transactions_per_client)
+    parser.add_argument('--agent-skew', type=float, default=defaults.agent_skew, help='Zipf exponent; 0 = uniform')
+    parser.add_argument('--city-skew', type=float, default=defaults.city_skew, help='Zipf exponent; 0 = uniform')
+    parser.add_argument('--no-long-tail', action='store_true', help='exactly the mean rows per client')
+    parser.add_argument('--second-agent-rate', type=float, default=defaults.second_agent_rate)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--task-size', type=int, default=TASK_SIZE)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--ndjson', metavar='DIR', help='write NDJSON files under DIR')
+    target.add_argument('--db', metavar='FILE', help='load into a SQLite-backed MemoryDynamoResource')
+    parser.add_argument('--gzip', action='store_true', help='gzip the NDJSON files')
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        agents=args.agents, clients=args.clients, offices=args.offices,
+        properties_per_agent=args.properties_per_agent, appointments_per_client=args.appointments_per_client,
+        transactions_per_client=args.transactions_per_client, agent_skew=args.agent_skew,
+        city_skew=args.city_skew, long_tail=not args.no_long_tail,
+        second_agent_rate=args.second_agent_rate, seed=args.seed,
+    )
+    start = time.perf_counter()
+    if args.ndjson:
+        counts = write_ndjson(spec, args.ndjson, args.workers, args.task_size, args.gzip)
+    else:
+        from memory_dynamodb import MemoryDynamoResource
+        dynamodb = MemoryDynamoResource(path=args.db)
+        try:
+            counts = populate(dynamodb, spec, args.workers, args.task_size)
+        finally:
+            dynamodb.close()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'spec': asdict(spec),
+        'counts': counts,
+        'items': sum(counts.values()),
+        'seconds': round(elapsed, 3),
+        'items_per_s': round(sum(counts.values()) / elapsed) if elapsed else None,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,454 @@
+# benchmarks/handler_bench.py
+# Invokes agent_lambda_handler.handler and client_lambda_handler.handler with
+# API Gateway proxy events for every path and action, against a
+# MemoryDynamoResource filled by benchmarks.dataset. Per endpoint it reports
+# p50/p95/p99 latency, response bytes and per-call allocation peaks, plus the
+# process's peak RSS. `--mode dashboard` replays AgentDashboard.js instead:
+# each agent loads its dashboard in full, then polls for deltas while
+# appointments are being booked.
+#
+#   cd python_backend && python -m benchmarks.handler_bench [--agents N] [--repeat R] [--only 'agent.*']
+#   cd python_backend && python -m benchmarks.handler_bench --mode dashboard [--dashboards N] [--polls P]
+import argparse
+import base64
+import contextlib
+import fnmatch
+import gzip
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import agent_lambda_handler
+import client_lambda_handler
+import responses
+from agent_service import AgentService
+from benchmarks import dataset
+from client_lambda_handler import ClientLambdaHandler
+from dynamo_utils import sync_watermark
+from memory_dynamodb import MemoryDynamoResource
+
+HANDLERS = {
+    'agent': agent_lambda_handler.handler,
+    'client': client_lambda_handler.handler,
+}
+
+
+def _agent(rng, size) -> str:
+    return dataset.agent_id(rng.randrange(size['agents']))
+
+
+def _client(rng, size) -> str:
+    return dataset.client_id(rng.randrange(size['clients']))
+
+
+def _new_property(rng, size) -> Dict[str, Any]:
+    return {'property': {
+        'agentId': _agent(rng, size), 'propertyType': 'HOUSE', 'street': '12 Main St',
+        'city': 'Baton Rouge', 'state': 'LA', 'zipcode': '70801', 'listPrice': '250000.00',
+        'numBedrooms': 3, 'numBathrooms': 2, 'squareFootage': 1800,
+        'description': 'Benchmark listing', 'status': 'AVAILABLE',
+        'imageUrl': 'https://example.com/images/listing.jpg', 'listingDate': '2024-05-01',
+    }}
+
+
+def _new_transaction(rng, size) -> Dict[str, Any]:
+    agent = rng.randrange(size['agents'])
+    return {
+        'agentId': dataset.agent_id(agent), 'clientId': dataset.client_id(agent),
+        'propertyId': dataset.property_id(agent, 0), 'amount': '1500.00',
+        'transactionType': 'RENTAL', 'dateSent': '2024-05-01',
+    }
+
+
+def _new_appointment(rng, size) -> Dict[str, Any]:
+    client = rng.randrange(size['clients'])
+    agent = client % size['agents']
+    return {'action': 'add_appointment', 'clientId': dataset.client_id(client), 'appointment': {
+        'clientId': dataset.client_id(client), 'agentId': dataset.agent_id(agent),
+        'propertyId': dataset.property_id(agent, 0), 'appointmentDate': '2024-06-01',
+        'appointmentTime': '10:00', 'purpose': 'Viewing',
+    }}
+
+
+def _pay_transaction(rng, size) -> Dict[str, Any]:
+    client = rng.randrange(size['clients'])
+    return {'action': 'pay_transaction', 'clientId': dataset.client_id(client),
+            'transactionId': dataset.transaction_id(client, 0)}
+
+
+# name -> (handler, API path, body builder); the builder gets an RNG and the dataset size
+ENDPOINTS: Dict[str, tuple] = {
+    'agent.OPTIONS': ('agent', '/api/getAgent', None),
+    'agent.getProperties': ('agent', '/api/getProperties', lambda rng, size: {}),
+    'agent.getProperties.page': ('agent', '/api/getProperties', lambda rng, size: {'limit': 50}),
+    'agent.searchProperties': ('agent', '/api/searchProperties', lambda rng, size: {
+        'city': rng.choice(dataset.CITIES), 'minBedrooms': 3, 'sort': 'price_asc', 'limit': 50}),
+    'agent.getAgent': ('agent', '/api/getAgent', lambda rng, size: {'agentId': _agent(rng, size)}),
+    'agent.getAppointments': ('agent', '/api/getAppointments', lambda rng, size: {'agentId': _agent(rng, size)}),
+    'agent.getClients': ('agent', '/api/getClients', lambda rng, size: {'agentId': _agent(rng, size)}),
+    'agent.getTransactions': ('agent', '/api/getTransactions', lambda rng, size: {'agentId': _agent(rng, size)}),
+    'agent.getOffice': ('agent', '/api/getOffice', lambda rng, size: {'agentId': _agent(rng, size)}),
+    'agent.getAgentDashboard': ('agent', '/api/getAgentDashboard',
+                                lambda rng, size: {'agentId': _agent(rng, size)}),
+    'agent.getAgentDashboard.delta': ('agent', '/api/getAgentDashboard',
+                                      lambda rng, size: {'agentId': _agent(rng, size), 'since': sync_watermark()}),
+    'agent.addProperty': ('agent', '/api/addProperty', _new_property),
+    'agent.addTransaction': ('agent', '/api/addTransaction', _new_transaction),
+    'client.get_properties': ('client', '/api/getProperties', lambda rng, size: {'action': 'get_properties'}),
+    'client.get_properties.page': ('client', '/api/getProperties',
+                                   lambda rng, size: {'action': 'get_properties', 'limit': 50}),
+    'client.search_properties': ('client', '/api/searchProperties', lambda rng, size: {
+        'action': 'search_properties', 'status': rng.choice(dataset.PROPERTY_STATUSES),
+        'maxPrice': 400000, 'limit': 50}),
+    'client.get_client': ('client', '/api/getClient',
+                          lambda rng, size: {'action': 'get_client', 'clientId': _client(rng, size)}),
+    'client.get_property_agent': ('client', '/api/getAgent', lambda rng, size: {
+        'action': 'get_property_agent', 'clientId': _client(rng, size), 'agentId': _agent(rng, size)}),
+    'client.get_appointments': ('client', '/api/getClientAppointments',
+                                lambda rng, size: {'action': 'get_appointments', 'clientId': _client(rng, size)}),
+    'client.get_agents': ('client', '/api/getClientAgents',
+                          lambda rng, size: {'action': 'get_agents', 'clientId': _client(rng, size)}),
+    'client.get_transactions': ('client', '/api/getClientTransactions',
+                                lambda rng, size: {'action': 'get_transactions', 'clientId': _client(rng, size)}),
+    'client.add_appointment': ('client', '/api/addAppointment', _new_appointment),
+    'client.pay_transaction': ('client', '/api/payTransaction', _pay_transaction),
+}
+
+
+def proxy_event(path: str, body: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """An API Gateway REST proxy event as the browser's POST (or preflight, when body is None) produces it"""
+    method = 'OPTIONS' if body is None else 'POST'
+    return {
+        'resource': path,
+        'path': path,
+        'httpMethod': method,
+        'headers': {
+            'Accept': 'application/json, text/plain, */*',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Content-Type': 'application/json',
+            'Host': 'localhost',
+            'Origin': 'http://localhost:3000',
+            'User-Agent': 'Mozilla/5.0 (handler_bench)',
+        },
+        'queryStringParameters': None,
+        'pathParameters': None,
+        'stageVariables': None,
+        'requestContext': {
+            'resourcePath': path,
+            'httpMethod': method,
+            'stage': 'dev',
+            'requestId': str(uuid.uuid4()),
+            'identity': {'sourceIp': '127.0.0.1'},
+        },
+        'body': None if body is None else json.dumps(body),
+        'isBase64Encoded': False,
+    }
+
+
+def invoke(handler_name: str, event: Dict[str, Any]) -> tuple:
+    """Call a handler the way the Lambda runtime would; returns (response, seconds)"""
+    context = SimpleNamespace(aws_request_id=str(uuid.uuid4()), function_name=f"{handler_name}-bench")
+    start = time.perf_counter()
+    response = HANDLERS[handler_name](event, context)
+    return response, time.perf_counter() - start
+
+
+def install(dynamodb) -> None:
+    """Point both handlers' cached services at `dynamodb`"""
+    agent_lambda_handler._agent_service = AgentService(dynamodb)
+    client_lambda_handler._client_handler = ClientLambdaHandler(dynamodb)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 (nearest rank), mean, min and max of latencies in seconds, as ms"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        'p50_ms': round(rank(50) * 1000, 3),
+        'p95_ms': round(rank(95) * 1000, 3),
+        'p99_ms': round(rank(99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+@contextlib.contextmanager
+def quiet():
+    """Send handler logs and EMF lines to /dev/null, so stdout carries only the report"""
+    handlers = [handler for handler in logging.getLogger('realestate').handlers
+                if isinstance(handler, logging.StreamHandler)]
+    with open(os.devnull, 'w') as sink:
+        previous = [handler.setStream(sink) for handler in handlers]
+        try:
+            with contextlib.redirect_stdout(sink):
+                yield
+        finally:
+            for handler, stream in zip(handlers, previous):
+                handler.setStream(stream)
+
+
+def _body_bytes(response: Dict[str, Any]) -> int:
+    body = response.get('body') or ''
+    return len(body) if isinstance(body, bytes) else len(body.encode('utf-8'))
+
+
+def response_json(response: Dict[str, Any]) -> Any:
+    """The JSON body of a handler response, undoing base64 and gzip/br compression"""
+    body = response.get('body') or ''
+    if not response.get('isBase64Encoded'):
+        return json.loads(body)
+    data = base64.b64decode(body)
+    encoding = (response.get('headers') or {}).get('Content-Encoding')
+    if encoding == 'gzip':
+        data = gzip.decompress(data)
+    elif encoding == 'br':
+        data = responses.brotli.decompress(data)
+    return json.loads(data)
+
+
+def bench_endpoint(name: str, size: Dict[str, int], repeat: int, warmup: int,
+                   alloc_samples: int, rng: random.Random) -> Dict[str, Any]:
+    handler_name, path, build = ENDPOINTS[name]
+
+    def event():
+        return proxy_event(path, None if build is None else build(rng, size))
+
+    for _ in range(warmup):
+        invoke(handler_name, event())
+
+    samples, sizes, statuses = [], [], {}
+    for _ in range(repeat):
+        response, seconds = invoke(handler_name, event())
+        samples.append(seconds)
+        sizes.append(_body_bytes(response))
+        status = str(response['statusCode'])
+        statuses[status] = statuses.get(status, 0) + 1
+
+    # A separate pass, since tracing allocations slows every call down
+    peaks, retained = [], []
+    if alloc_samples:
+        tracemalloc.start()
+        try:
+            for _ in range(alloc_samples):
+                request = event()
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                invoke(handler_name, request)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'handler': handler_name,
+        'path': path,
+        'calls': repeat,
+        'status': statuses,
+        'latency': percentiles(samples),
+        'response_bytes': {
+            'mean': round(statistics.fmean(sizes)) if sizes else 0,
+            'max': max(sizes, default=0),
+            'total': sum(sizes),
+        },
+        'alloc_peak_kb': round(statistics.fmean(peaks) / 1024, 1) if peaks else None,
+        'alloc_retained_kb': round(statistics.fmean(retained) / 1024, 1) if retained else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def replay_dashboards(size: Dict[str, int], dashboards: int, polls: int, interval: float,
+                      write_interval: float, seed: int) -> Dict[str, Any]:
+    """AgentDashboard.js for `dashboards` agents at once: one full read, then `polls` delta reads each"""
+    lock = threading.Lock()
+    samples: Dict[str, List[float]] = {'full': [], 'delta': []}
+    sizes: Dict[str, List[int]] = {'full': [], 'delta': []}
+    totals = {'delta_rows': 0, 'errors': 0, 'writes': 0}
+    stop = threading.Event()
+    agent_numbers = random.Random(seed).sample(range(size['agents']), min(dashboards, size['agents']))
+
+    def dashboard(agent: int, phase: float) -> None:
+        agent_id = dataset.agent_id(agent)
+        watermark = None
+        time.sleep(phase)
+        for poll in range(polls + 1):
+            if poll:
+                time.sleep(interval)
+            body = {'agentId': agent_id}
+            if watermark:
+                body['since'] = watermark
+            kind = 'delta' if watermark else 'full'
+            try:
+                response, seconds = invoke('agent', proxy_event('/api/getAgentDashboard', body))
+                payload = response_json(response) if response['statusCode'] == 200 else {}
+            except Exception:
+                # Counted rather than ending the thread, which would drop its later polls silently
+                with lock:
+                    totals['errors'] += 1
+                watermark = None
+                continue
+            with lock:
+                samples[kind].append(seconds)
+                sizes[kind].append(_body_bytes(response))
+                if kind == 'delta':
+                    totals['delta_rows'] += sum(len(payload.get(section) or [])
+                                                for section in ('appointments', 'transactions', 'clients'))
+                if response['statusCode'] != 200 or payload.get('errors'):
+                    totals['errors'] += 1
+            # Like the page: a failed read makes the next one a full read
+            watermark = None if response['statusCode'] != 200 or payload.get('errors') \
+                else payload.get('watermark')
+
+    def writer() -> None:
+        # Bookings for the watched agents, so the deltas carry rows
+        rng = random.Random(seed + 1)
+        while not stop.wait(write_interval):
+            body = _new_appointment(rng, size)
+            body['appointment']['agentId'] = dataset.agent_id(rng.choice(agent_numbers))
+            try:
+                response, _ = invoke('client', proxy_event('/api/addAppointment', body))
+            except Exception:
+                response = {'statusCode': 0}
+            with lock:
+                if response['statusCode'] == 200:
+                    totals['writes'] += 1
+                else:
+                    totals['errors'] += 1
+
+    phases = random.Random(seed + 2)
+    threads = [threading.Thread(target=dashboard, args=(agent, phases.uniform(0, interval)), daemon=True)
+               for agent in agent_numbers]
+    writer_thread = threading.Thread(target=writer, daemon=True) if write_interval > 0 else None
+    start = time.perf_counter()
+    if writer_thread:
+        writer_thread.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if writer_thread:
+        writer_thread.join()
+
+    requests = len(samples['full']) + len(samples['delta'])
+    return {
+        'dashboards': len(agent_numbers),
+        'polls': polls,
+        'interval_s': interval,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(requests / elapsed, 1) if elapsed else None,
+        'full': dict(percentiles(samples['full']), calls=len(samples['full']),
+                     mean_bytes=round(statistics.fmean(sizes['full'])) if sizes['full'] else 0),
+        'delta': dict(percentiles(samples['delta']), calls=len(samples['delta']),
+                      mean_bytes=round(statistics.fmean(sizes['delta'])) if sizes['delta'] else 0),
+        'delta_rows': totals['delta_rows'],
+        'writes': totals['writes'],
+        'errors': totals['errors'],
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    dynamodb = MemoryDynamoResource(path=args.db, latency=args.latency_ms / 1000)
+    started = time.perf_counter()
+    spec = dataset.DatasetSpec(
+        agents=args.agents, clients=args.agents * args.clients_per_agent,
+        properties_per_agent=args.properties_per_agent, appointments_per_client=args.appointments_per_client,
+        transactions_per_client=args.transactions_per_client, agent_skew=args.agent_skew, seed=args.seed)
+    counts = dataset.populate(dynamodb, spec, workers=args.load_workers)
+    load_seconds = time.perf_counter() - started
+    size = {'agents': spec.agents, 'clients': spec.clients}
+    install(dynamodb)
+
+    report: Dict[str, Any] = {
+        'benchmark': 'handler_bench',
+        'mode': args.mode,
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'config': {name: value for name, value in vars(args).items() if name != 'output'},
+        'dataset': dict(counts, load_s=round(load_seconds, 3)),
+    }
+    with quiet():
+        if args.mode == 'dashboard':
+            report['dashboard'] = replay_dashboards(size, args.dashboards, args.polls, args.interval,
+                                                    args.write_interval, args.seed)
+        else:
+            patterns = [pattern.strip() for pattern in args.only.split(',')] if args.only else ['*']
+            names = [name for name in ENDPOINTS if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+            rng = random.Random(args.seed)
+            report['endpoints'] = {
+                name: bench_endpoint(name, size, args.repeat, args.warmup, args.alloc_samples, rng)
+                for name in names
+            }
+    report['peak_rss_mb'] = peak_rss_mb()
+    dynamodb.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end Lambda handler benchmark')
+    parser.add_argument('--mode', choices=('endpoints', 'dashboard'), default='endpoints')
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--properties-per-agent', type=int, default=20)
+    parser.add_argument('--clients-per-agent', type=int, default=10)
+    parser.add_argument('--appointments-per-client', type=int, default=2)
+    parser.add_argument('--transactions-per-client', type=int, default=1)
+    parser.add_argument('--agent-skew', type=float, default=dataset.DatasetSpec.agent_skew,
+                        help='Zipf exponent for clients and listings per agent; 0 = uniform')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--load-workers', type=int, default=1, help='processes generating the dataset')
+    parser.add_argument('--db', help='keep the dataset in this SQLite file instead of memory')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added to every DynamoDB call')
+    parser.add_argument('--only', help="comma-separated endpoint patterns, e.g. 'agent.get*,client.get_agents'")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--alloc-samples', type=int, default=5)
+    parser.add_argument('--dashboards', type=int, default=20, help='agents polling at once (dashboard mode)')
+    parser.add_argument('--polls', type=int, default=10, help='delta polls per dashboard after the full read')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between polls (the page uses 5)')
+    parser.add_argument('--write-interval', type=float, default=0.05, help='seconds between bookings; 0 disables')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/item_codec_bench.py
+# Compares a 10k-item Property page read through the boto3 resource layer with
+# the low-level client + item_codec path. Both run the full response pipeline
+# behind botocore's Stubber, so no network or credentials are involved.
+#
+#   cd python_backend && python -m benchmarks.item_codec_bench [--items N] [--repeat R]
+import argparse
+import copy
+import json
+import random
+import statistics
+import time
+import uuid
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.stub import Stubber
+
+from fast_dynamodb import FastDynamoResource
+from item_codec import decoder_for
+
+TABLE_NAME = 'dev-Property'
+
+
+def make_wire_items(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    cities = ['Baton Rouge', 'New Orleans', 'Lafayette', 'Shreveport', 'Lake Charles']
+    items = []
+    for _ in range(count):
+        items.append({
+            'propertyId': {'S': str(uuid.UUID(int=rng.getrandbits(128)))},
+            'agentId': {'S': f"agent-{rng.randrange(500)}"},
+            'propertyType': {'S': rng.choice(['HOUSE', 'CONDO', 'TOWNHOUSE'])},
+            'street': {'S': f"{rng.randrange(1, 9999)} Main St"},
+            'city': {'S': rng.choice(cities)},
+            'state': {'S': 'LA'},
+            'zipcode': {'S': f"70{rng.randrange(100, 999)}"},
+            'listPrice': {'N': f"{rng.randrange(80000, 2000000)}.{rng.randrange(100):02d}"},
+            'numBedrooms': {'N': str(rng.randrange(1, 7))},
+            'numBathrooms': {'N': str(rng.randrange(1, 5))},
+            'squareFootage': {'N': str(rng.randrange(600, 6000))},
+            'description': {'S': 'Charming home close to schools and shopping. ' * 3},
+            'listingDate': {'S': '2024-05-01'},
+            'status': {'S': rng.choice(['AVAILABLE', 'PENDING', 'SOLD'])},
+            'imageUrl': {'S': 'https://example.com/images/listing.jpg'},
+            'updatedAt': {'S': '2024-05-01T12:00:00.000000Z'},
+        })
+    return items
+
+
+def _timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _stubbed_scans(client, response, repeat: int) -> Stubber:
+    stubber = Stubber(client)
+    for _ in range(repeat):
+        # Both paths convert the response in place, so each call gets its own
+        stubber.add_response('scan', copy.deepcopy(response), {'TableName': TABLE_NAME})
+    stubber.activate()
+    return stubber
+
+
+def run(item_count: int, repeat: int):
+    wire_items = make_wire_items(item_count)
+    response = {'Items': wire_items, 'Count': len(wire_items), 'ScannedCount': len(wire_items)}
+    session_args = {'region_name': 'us-east-1', 'aws_access_key_id': 'bench',
+                    'aws_secret_access_key': 'bench'}
+
+    resource = boto3.resource('dynamodb', **session_args)
+    _stubbed_scans(resource.meta.client, response, repeat)
+    resource_table = resource.Table(TABLE_NAME)
+
+    fast = FastDynamoResource(boto3.client('dynamodb', **session_args))
+    _stubbed_scans(fast.client, response, repeat)
+    fast_table = fast.Table(TABLE_NAME)
+
+    deserializer = TypeDeserializer()
+    decode = decoder_for(TABLE_NAME)
+
+    results = {
+        # Conversion alone, on already-parsed wire items
+        'convert_type_deserializer': _timed(
+            lambda: [{k: deserializer.deserialize(v) for k, v in item.items()} for item in wire_items], repeat),
+        'convert_item_codec': _timed(lambda: [decode(item) for item in wire_items], repeat),
+        # Whole Table.scan call, including botocore's response handling
+        'scan_resource': _timed(lambda: resource_table.scan(), repeat),
+        'scan_fast_client': _timed(lambda: fast_table.scan(), repeat),
+    }
+    report = {
+        'items': item_count,
+        'repeat': repeat,
+        'results': {
+            name: {
+                'median_ms': round(statistics.median(samples) * 1000, 2),
+                'min_ms': round(min(samples) * 1000, 2),
+            }
+            for name, samples in results.items()
+        },
+    }
+    report['speedup'] = {
+        'convert': round(report['results']['convert_type_deserializer']['median_ms']
+                         / report['results']['convert_item_codec']['median_ms'], 2),
+        'scan': round(report['results']['scan_resource']['median_ms']
+                      / report['results']['scan_fast_client']['median_ms'], 2),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resource vs low-level client item conversion')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/json_encoder_bench.py
+# Serializes a getProperties-sized payload (about 5 MB of Property items as
+# the resource layer returns them, numbers as Decimal) with the old
+# per-handler DecimalEncoder and with responses.to_json in both modes.
+#
+#   cd python_backend && python -m benchmarks.json_encoder_bench [--mb 5] [--repeat R]
+import argparse
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from responses import to_json
+
+
+class LegacyDecimalEncoder(json.JSONEncoder):
+    """The encoder both handlers used before responses.py"""
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super(LegacyDecimalEncoder, self).default(obj)
+
+
+def make_properties(target_mb: float, seed: int = 11):
+    rng = random.Random(seed)
+    cities = ['Baton Rouge', 'New Orleans', 'Lafayette', 'Shreveport', 'Lake Charles']
+    items = []
+    size = 0
+    while size < target_mb * 1024 * 1024:
+        item = {
+            'propertyId': '%032x' % rng.getrandbits(128),
+            'agentId': f"agent-{rng.randrange(500)}",
+            'propertyType': rng.choice(['HOUSE', 'CONDO', 'TOWNHOUSE']),
+            'street': f"{rng.randrange(1, 9999)} Main St",
+            'city': rng.choice(cities),
+            'state': 'LA',
+            'zipcode': f"70{rng.randrange(100, 999)}",
+            'listPrice': Decimal(f"{rng.randrange(80000, 2000000)}.{rng.randrange(100):02d}"),
+            'numBedrooms': Decimal(rng.randrange(1, 7)),
+            'numBathrooms': Decimal(rng.randrange(1, 5)),
+            'squareFootage': Decimal(rng.randrange(600, 6000)),
+            'description': 'Charming home close to schools and shopping. ' * 3,
+            'listingDate': '2024-05-01',
+            'status': rng.choice(['AVAILABLE', 'PENDING', 'SOLD']),
+            'imageUrl': 'https://example.com/images/listing.jpg',
+        }
+        items.append(item)
+        # Rough per-item size; close enough to stop near the target
+        size += 520
+    return items
+
+
+def _timed(fn, repeat: int):
+    samples = []
+    body = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - start)
+    return samples, body
+
+
+def run(target_mb: float, repeat: int):
+    items = make_properties(target_mb)
+    cases = {
+        'legacy_decimal_encoder': lambda: json.dumps(items, cls=LegacyDecimalEncoder),
+        'to_json_string': lambda: to_json(items, 'string'),
+        'to_json_number': lambda: to_json(items, 'number'),
+    }
+    report = {'items': len(items), 'repeat': repeat, 'results': {}}
+    for name, fn in cases.items():
+        samples, body = _timed(fn, repeat)
+        report['results'][name] = {
+            'median_ms': round(statistics.median(samples) * 1000, 2),
+            'min_ms': round(min(samples) * 1000, 2),
+            'bytes': len(body.encode('utf-8')),
+        }
+    legacy = report['results']['legacy_decimal_encoder']['median_ms']
+    report['speedup'] = {
+        name: round(legacy / result['median_ms'], 2)
+        for name, result in report['results'].items() if name != 'legacy_decimal_encoder'
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response JSON encoder benchmark')
+    parser.add_argument('--mb', type=float, default=5)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args.mb, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# change_events.py
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set
+
+import boto3
+from botocore.config import Config
+
+from aws_resources import get_dynamodb_resource
+from dynamo_utils import iter_items, utc_timestamp
+from structured_logging import bind_request_context, get_logger
+
+logger = get_logger('change_events')
+
+# Set on the Lambdas by template.yaml; without it events stay in-process
+WEBSOCKET_ENDPOINT = os.environ.get('WEBSOCKET_ENDPOINT')
+CONNECTIONS_TABLE = os.environ.get('CONNECTIONS_TABLE', 'dev-DashboardConnection')
+
+# Stale rows are cleaned up by DynamoDB TTL if $disconnect never arrives
+CONNECTION_TTL_SECONDS = int(os.environ.get('CONNECTION_TTL_SECONDS', str(2 * 60 * 60)))
+
+# Pushes run inside the write path, so a slow or failing gateway should cost
+# a second at most; a missed event is caught up by the dashboard's next poll.
+GATEWAY_CONNECT_TIMEOUT = float(os.environ.get('GATEWAY_CONNECT_TIMEOUT', '0.5'))
+GATEWAY_READ_TIMEOUT = float(os.environ.get('GATEWAY_READ_TIMEOUT', '1.0'))
+GATEWAY_MAX_ATTEMPTS = int(os.environ.get('GATEWAY_MAX_ATTEMPTS', '2'))
+GATEWAY_MAX_POOL_CONNECTIONS = int(os.environ.get('GATEWAY_MAX_POOL_CONNECTIONS', '10'))
+# Posts to an agent's dashboards go out side by side on this many threads, and
+# a write waits at most PUBLISH_TIMEOUT_SECONDS for them. A Lambda container is
+# frozen between invocations, so the posts cannot be left to a background
+# thread once the handler has returned.
+PUBLISH_MAX_WORKERS = int(os.environ.get('PUBLISH_MAX_WORKERS', '8'))
+PUBLISH_TIMEOUT_SECONDS = float(os.environ.get('PUBLISH_TIMEOUT_SECONDS', '1.5'))
+
+
+def build_gateway_config() -> Config:
+    """botocore Config for the API Gateway Management API client"""
+    return Config(
+        max_pool_connections=GATEWAY_MAX_POOL_CONNECTIONS,
+        connect_timeout=GATEWAY_CONNECT_TIMEOUT,
+        read_timeout=GATEWAY_READ_TIMEOUT,
+        tcp_keepalive=True,
+        retries={'mode': 'standard', 'max_attempts': GATEWAY_MAX_ATTEMPTS},
+    )
+
+
+class ConnectionGone(Exception):
+    """The gateway no longer knows this connection"""
+
+
+class InMemoryConnectionRegistry:
+    """Connection table stand-in for local runs and tests"""
+
+    def __init__(self):
+        self._agents: Dict[str, Optional[str]] = {}
+        self._by_agent: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def connect(self, connection_id: str, agent_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._drop(connection_id)
+            self._agents[connection_id] = agent_id
+            if agent_id:
+                self._by_agent[agent_id].add(connection_id)
+
+    def subscribe(self, connection_id: str, agent_id: str) -> None:
+        self.connect(connection_id, agent_id)
+
+    def disconnect(self, connection_id: str) -> None:
+        with self._lock:
+            self._drop(connection_id)
+
+    def connections_for(self, agent_id: str) -> List[str]:
+        with self._lock:
+            return sorted(self._by_agent.get(agent_id, ()))
+
+    def _drop(self, connection_id: str) -> None:
+        agent_id = self._agents.pop(connection_id, None)
+        if agent_id:
+            self._by_agent[agent_id].discard(connection_id)
+            if not self._by_agent[agent_id]:
+                del self._by_agent[agent_id]
+
+
+class DynamoConnectionRegistry:
+    """Connections kept in the DashboardConnection table, looked up by agent-index"""
+
+    def __init__(self, dynamodb_resource=None, table_name: str = CONNECTIONS_TABLE):
+        self.dynamodb = dynamodb_resource or get_dynamodb_resource()
+        self.table = self.dynamodb.Table(table_name)
+
+    def connect(self, connection_id: str, agent_id: Optional[str] = None) -> None:
+        item = {
+            'connectionId': connection_id,
+            'connectedAt': utc_timestamp(),
+            'ttl': int(time.time()) + CONNECTION_TTL_SECONDS,
+        }
+        # Left out rather than empty so the row stays out of agent-index
+        if agent_id:
+            item['agentId'] = agent_id
+        self.table.put_item(Item=item)
+
+    def subscribe(self, connection_id: str, agent_id: str) -> None:
+        self.connect(connection_id, agent_id)
+
+    def disconnect(self, connection_id: str) -> None:
+        self.table.delete_item(Key={'connectionId': connection_id})
+
+    def connections_for(self, agent_id: str) -> List[str]:
+        return [item['connectionId'] for item in iter_items(
+            self.table.query,
+            IndexName='agent-index',
+            KeyConditionExpression='agentId = :agentId',
+            ExpressionAttributeValues={':agentId': agent_id},
+            ProjectionExpression='connectionId'
+        )]
+
+
+class LocalGateway:
+    """WebSocket gateway stand-in: keeps every message sent to each connection"""
+
+    def __init__(self):
+        self.sent: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.gone: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def send(self, connection_id: str, message: Dict[str, Any]) -> None:
+        with self._lock:
+            if connection_id in self.gone:
+                raise ConnectionGone(connection_id)
+            self.sent[connection_id].append(message)
+
+
+class ApiGatewayManagementGateway:
+    """Posts to live connections through the API Gateway Management API"""
+
+    def __init__(self, endpoint_url: str):
+        self.client = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url,
+                                   config=build_gateway_config())
+
+    def send(self, connection_id: str, message: Dict[str, Any]) -> None:
+        try:
+            self.client.post_to_connection(
+                ConnectionId=connection_id,
+                Data=json.dumps(message, default=str).encode('utf-8')
+            )
+        except self.client.exceptions.GoneException:
+            raise ConnectionGone(connection_id)
+
+
+class ChangePublisher:
+    """Fans change events out to the dashboards subscribed to an agent"""
+
+    def __init__(self, registry, gateway, max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.registry = registry
+        self.gateway = gateway
+        self.max_workers = PUBLISH_MAX_WORKERS if max_workers is None else max_workers
+        self.timeout = PUBLISH_TIMEOUT_SECONDS if timeout is None else timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _send(self, connection_id: str, message: Dict[str, Any]) -> bool:
+        try:
+            self.gateway.send(connection_id, message)
+            return True
+        except ConnectionGone:
+            # The client went away without a $disconnect
+            self.registry.disconnect(connection_id)
+        except Exception as e:
+            logger.error('Error pushing change to %s: %s', connection_id, e)
+        return False
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='publish')
+        return self._executor
+
+    def publish(self, agent_id: str, entity: str, action: str,
+                entity_id: Optional[str] = None, updated_at: Optional[str] = None) -> int:
+        """Send one event to every subscriber of `agent_id`; returns how many got it"""
+        message = {
+            'type': 'change',
+            'agentId': agent_id,
+            'entity': entity,
+            'action': action,
+            'id': entity_id,
+            'updatedAt': updated_at or utc_timestamp(),
+        }
+        connection_ids = self.registry.connections_for(agent_id)
+        if len(connection_ids) <= 1 or self.max_workers <= 1:
+            return sum(self._send(connection_id, message) for connection_id in connection_ids)
+
+        send = bind_request_context(self._send)
+        futures = [self._pool().submit(send, connection_id, message) for connection_id in connection_ids]
+        done, pending = wait(futures, timeout=self.timeout)
+        if pending:
+            # Left to finish on the pool; the dashboards catch up on their next poll
+            logger.warning('Change pushes still pending after %ss', self.timeout,
+                           extra={'fields': {'agentId': agent_id, 'pending': len(pending)}})
+        return sum(future.result() for future in done)
+
+
+# Created once per Lambda container, like the DynamoDB resource
+_publisher = None
+_lock = threading.Lock()
+
+
+def get_change_publisher() -> ChangePublisher:
+    """Return the shared publisher: API Gateway when WEBSOCKET_ENDPOINT is set, in-process otherwise"""
+    global _publisher
+    if _publisher is None:
+        with _lock:
+            if _publisher is None:
+                if WEBSOCKET_ENDPOINT:
+                    _publisher = ChangePublisher(DynamoConnectionRegistry(),
+                                                 ApiGatewayManagementGateway(WEBSOCKET_ENDPOINT))
+                else:
+                    _publisher = ChangePublisher(InMemoryConnectionRegistry(), LocalGateway())
+    return _publisher
+
+
+def reset_change_publisher() -> None:
+    """Drop the shared publisher so the next call builds a fresh one (tests)"""
+    global _publisher
+    with _lock:
+        _publisher = None
@@ -1,53 +1,47 @@
 # client_lambda_handler.py
 import json
-import boto3
 import traceback
 import uuid
 from typing import Dict, Any
-from decimal import Decimal
+from aws_resources import get_dynamodb_resource
 from client_service import ClientService
+from dynamo_metrics import flush_dynamo_metrics, set_metrics_endpoint
+from dynamo_utils import parse_page_request
+from property_search import PropertySearch, SearchUnavailable
+from responses import create_response, read_body, set_response_endpoint, start_response
+from structured_logging import get_logger, start_request, request_id_from
 
-class DecimalEncoder(json.JSONEncoder):
-    """Custom JSON encoder to handle Decimal types"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        return super(DecimalEncoder, self).default(obj)
-
-def create_response(status_code: int, body: Any) -> Dict[str, Any]:
-    print(f"Creating response with status code: {status_code} and body: {body}")
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(body, cls=DecimalEncoder) if not isinstance(body, str) else body
-    }
+logger = get_logger('client_handler')
 
 class ClientLambdaHandler:
-    def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
+    def __init__(self, dynamodb_resource=None):
+        self.dynamodb = dynamodb_resource or get_dynamodb_resource()
         self.client_service = ClientService(self.dynamodb)
 
     def handle_client_request(self, event_body: dict) -> Dict[str, Any]:
-        print(f"[REQUEST START] Processing client request with body: {json.dumps(event_body)}")
         request_id = str(uuid.uuid4())
-        
+
         action = event_body.get('action')
+        set_metrics_endpoint(action)
+        set_response_endpoint(action)
+        logger.info('Processing client request: %s', action)
         if not action:
-            print(f"[{request_id}] No action provided in request")
+            logger.warning('No action provided in request')
             return create_response(400, {'message': 'Action is required'})
 
         # Special case for get_properties which doesn't require clientId
         if action == 'get_properties':
-            print(f"[{request_id}] Fetching all properties")
+            logger.debug('Fetching all properties')
             try:
-                properties = self.client_service.get_properties()
-                print(f"[{request_id}] Retrieved {len(properties)} properties")
-                return create_response(200, properties)
+                page_request = parse_page_request(event_body)
+                if page_request is not None:
+                    page = self.client_service.get_properties_page(*page_request)
+                    logger.debug('Retrieved page of %s properties', len(page['items']))
+                    return create_response(200, page)
+                properties, etag = self.client_service.get_properties_body()
+                return create_response(200, properties, etag=etag)
+            except ValueError as ve:
+                return create_response(400, {'message': str(ve)})
             except Exception as e:
                 error_details = {
                     'requestId': request_id,
@@ -56,17 +50,37 @@ class ClientLambdaHandler:
                     'type': e.__class__.__name__,
                     'action': action
                 }
-                print(f"[{request_id}] Error details: {json.dumps(error_details)}")
+                logger.exception('Error retrieving properties', extra={'fields': error_details})
+                return create_response(500, error_details)
+
+        if action == 'search_properties':
+            try:
+                page = self.client_service.search_properties(PropertySearch.from_request(event_body))
+                logger.debug('Search returned %s properties', len(page['items']))
+                return create_response(200, page)
+            except ValueError as ve:
+                return create_response(400, {'message': str(ve)})
+            except SearchUnavailable as su:
+                return create_response(503, {'message': str(su)})
+            except Exception as e:
+                error_details = {
+                    'requestId': request_id,
+                    'message': 'Error searching properties',
+                    'error': str(e),
+                    'type': e.__class__.__name__,
+                    'action': action
+                }
+                logger.exception('Error searching properties', extra={'fields': error_details})
                 return create_response(500, error_details)
 
         # For all other actions, require clientId
         client_id = event_body.get('clientId')
         if not client_id and action != 'get_properties':
-            print(f"[{request_id}] No clientId provided in request")
+            logger.warning('No clientId provided in request')
             return create_response(400, {'message': 'Client ID is required'})
 
         try:
-            print(f"[{request_id}] Executing {action} for client: {client_id}")
+            logger.debug('Executing %s for client: %s', action, client_id)
             
             if action == 'get_property_agent':
                 agent_id = event_body.get('agentId')
@@ -78,21 +92,21 @@ class ClientLambdaHandler:
                 return create_response(200, agent)
 
             if action == 'get_appointments':
-                print(f"[{request_id}] Fetching appointments for client {client_id}")
+                logger.debug('Fetching appointments for client %s', client_id)
                 appointments = self.client_service.get_appointments(client_id)
-                print(f"[{request_id}] Retrieved {len(appointments)} appointments")
+                logger.debug('Retrieved %s appointments', len(appointments))
                 return create_response(200, appointments)
 
             elif action == 'get_agents':
-                print(f"[{request_id}] Fetching agents for client {client_id}")
+                logger.debug('Fetching agents for client %s', client_id)
                 agents = self.client_service.get_agents(client_id)
-                print(f"[{request_id}] Retrieved {len(agents)} agents")
+                logger.debug('Retrieved %s agents', len(agents))
                 return create_response(200, agents)
 
             elif action == 'get_transactions':
-                print(f"[{request_id}] Fetching transactions for client {client_id}")
+                logger.debug('Fetching transactions for client %s', client_id)
                 transactions = self.client_service.get_transactions(client_id)
-                print(f"[{request_id}] Retrieved {len(transactions)} transactions")
+                logger.debug('Retrieved %s transactions', len(transactions))
                 return create_response(200, transactions)
 
             elif action == 'get_client':
@@ -129,33 +143,51 @@ class ClientLambdaHandler:
                 'action': action,
                 'clientId': client_id
             }
-            print(f"[{request_id}] Error details: {json.dumps(error_details)}")
-            print(f"[{request_id}] Stack trace: {traceback.format_exc()}")
+            logger.exception('Error processing request', extra={'fields': error_details})
             return create_response(500, error_details)
 
+# Reused across warm invocations; built on the first request
+_client_handler = None
+
+def get_client_handler() -> ClientLambdaHandler:
+    global _client_handler
+    if _client_handler is None:
+        _client_handler = ClientLambdaHandler()
+    return _client_handler
+
+def reset_client_handler() -> None:
+    """Forget the cached handler (for tests)"""
+    global _client_handler
+    _client_handler = None
+
+@flush_dynamo_metrics
 def handler(event, context):
-    print(f"Received event: {json.dumps(event)}")
-    
+    start_request(request_id_from(context))
+    start_response(event)
+    # The full event (headers, body) is only written for sampled/DEBUG requests
+    logger.debug('Received event', extra={'fields': {'event': event}})
+
     # Handle OPTIONS requests for CORS preflight
     if event.get('httpMethod') == 'OPTIONS':
-        print("Handling OPTIONS preflight request")
+        logger.debug('Handling OPTIONS preflight request')
         return create_response(200, 'OK')
 
     try:
-        if not event.get('body'):
-            print("No request body provided")
+        raw_body = read_body(event)
+        if not raw_body:
+            logger.warning('No request body provided')
             return create_response(400, {'message': 'Request body is required'})
             
-        body = json.loads(event['body'])
-        print(f"Parsed request body: {json.dumps(body)}")
-        
-        client_handler = ClientLambdaHandler()
+        body = json.loads(raw_body)
+
+        client_handler = get_client_handler()
         response = client_handler.handle_client_request(body)
-        print(f"Handler response: {json.dumps(response)}")
+        logger.info('Responded %s', response['statusCode'],
+                    extra={'fields': {'bodyChars': len(response['body'])}})
         return response
         
     except json.JSONDecodeError as e:
-        print(f"JSON decode error: {str(e)}")
+        logger.warning('JSON decode error: %s', e)
         return create_response(400, {'message': 'Invalid JSON in request body'})
     except Exception as e:
         error_details = {
@@ -164,5 +196,5 @@ def handler(event, context):
             'type': e.__class__.__name__,
             'stackTrace': traceback.format_exc()
         }
-        print(f"Error processing request: {json.dumps(error_details)}")
+        logger.error('Error processing request', extra={'fields': error_details})
         return create_response(500, error_details)
\ No newline at end of file
@@ -1,97 +1,205 @@
 # client_service.py
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+import logging
 import uuid
 from datetime import datetime
 from boto3.dynamodb.conditions import Key
+from aws_resources import get_dynamodb_resource
+from dynamo_metrics import instrument
+from change_events import get_change_publisher
 from client_models import Client, ClientAgent, Appointment
+from entity_cache import EntityCache
+from dynamo_utils import fetch_page, parallel_scan, batch_get_items, utc_timestamp, SCAN_SEGMENTS
+from property_catalog import PropertyCatalog
+from property_search import PropertySearch, SearchUnavailable, search_properties
+from structured_logging import get_logger
+from table_metadata import TableMetadataCache
+
+logger = get_logger('client_service')
+
+# Upper bound on the per-container set of known client-agent links
+KNOWN_LINKS_MAX = 10000
 
 class ClientService:
-    def __init__(self, dynamodb_resource):
-        self.dynamodb = dynamodb_resource
+    def __init__(self, dynamodb_resource=None, change_publisher=None, table_metadata=None, entity_cache=None):
+        self.dynamodb = instrument(dynamodb_resource or get_dynamodb_resource())
+        self.change_publisher = change_publisher or get_change_publisher()
+        self.table_metadata = table_metadata or TableMetadataCache(self.dynamodb)
+        # Client and Agent point lookups, kept across warm invocations
+        self.entity_cache = entity_cache or EntityCache()
         self.table_prefix = 'dev-'
+        self._tables = {}
+        # ClientAgent ids known to exist, so repeat bookings skip the link write
+        self._known_links = set()
+        self._catalog = None
 
     def _get_table(self, table_name: str):
-        return self.dynamodb.Table(f"{self.table_prefix}{table_name}")
+        name = f"{self.table_prefix}{table_name}"
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = self.dynamodb.Table(name)
+        return table
+
+    @property
+    def catalog(self) -> PropertyCatalog:
+        """Property replica kept for the life of the container"""
+        if self._catalog is None:
+            self._catalog = PropertyCatalog(self._get_table('Property'))
+        return self._catalog
+
+    def _publish_change(self, agent_id: str, entity: str, action: str,
+                        entity_id: str, updated_at: str) -> None:
+        try:
+            self.change_publisher.publish(agent_id, entity, action, entity_id, updated_at)
+        except Exception as e:
+            logger.error('Error publishing %s change: %s', entity, e)
 
     def get_client(self, client_id: str) -> Optional[Dict[str, Any]]:
         try:
             table = self._get_table('Client')
-            response = table.get_item(Key={'clientId': client_id})
-            return response.get('Item')
+            return self.entity_cache.get(
+                'Client', client_id, lambda: table.get_item(Key={'clientId': client_id}).get('Item'))
         except Exception as e:
-            print(f"Error getting client: {str(e)}")
+            logger.error('Error getting client: %s', e)
             raise
 
+    def iter_properties(self, segments: Optional[int] = None,
+                        max_workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        table = self._get_table('Property')
+        return parallel_scan(table.scan, segments or SCAN_SEGMENTS, max_workers)
+
     def get_properties(self) -> List[Dict[str, Any]]:
         try:
-            print("[DEBUG] Attempting to get properties")
+            return self.catalog.items()
+        except Exception as e:
+            logger.error('Error getting properties: %s', e, extra={'fields': {'errorType': type(e).__name__}})
+            raise
+
+    def get_properties_body(self) -> Tuple[str, str]:
+        try:
+            return self.catalog.body()
+        except Exception as e:
+            logger.error('Error getting properties: %s', e, extra={'fields': {'errorType': type(e).__name__}})
+            raise
+
+    def get_properties_page(self, limit: int, next_token: Optional[str] = None) -> Dict[str, Any]:
+        try:
             table = self._get_table('Property')
-            print(f"[DEBUG] Accessing table: {self.table_prefix}Property")
-            response = table.scan()
-            print(f"[DEBUG] Scan response: {response}")
-            return response.get('Items', [])
+            items, next_token = fetch_page(table.scan, limit, next_token)
+            logger.debug('Page returned %s items, more: %s', len(items), next_token is not None)
+            return {'items': items, 'nextToken': next_token}
+        except Exception as e:
+            logger.error('Error getting properties page: %s', e)
+            raise
+
+    def search_properties(self, search: PropertySearch) -> Dict[str, Any]:
+        """One page of properties matching a search, read through a price GSI where possible"""
+        try:
+            return search_properties(self._get_table('Property'), search)
+        except (ValueError, SearchUnavailable):
+            # A bad cursor or an index still being deployed; the handler answers 400/503
+            raise
         except Exception as e:
-            print(f"[DEBUG] Error getting properties: {str(e)}")
-            print(f"[DEBUG] Error type: {type(e)}")
+            logger.error('Error searching properties: %s', e)
             raise
 
     def get_property_agent(self, agent_id: str) -> Optional[Dict[str, Any]]:
         try:
             table = self._get_table('Agent')
-            response = table.get_item(Key={'agentId': agent_id})
-            return response.get('Item')
+            return self.entity_cache.get(
+                'Agent', agent_id, lambda: table.get_item(Key={'agentId': agent_id}).get('Item'))
         except Exception as e:
-            print(f"Error getting agent: {str(e)}")
+            logger.error('Error getting agent: %s', e)
             raise
 
     def add_appointment(self, appointment_data: Dict[str, Any]) -> str:
+        """Book an appointment and link the client to the agent in one transactional write"""
         try:
-            # Create appointment
             appointment_id = str(uuid.uuid4())
             appointment_data['appointmentId'] = appointment_id
-            
-            appointments_table = self._get_table('Appointment')
-            appointments_table.put_item(Item=appointment_data)
-            
-            # Create client-agent relationship
-            client_agent_data = {
-                'id': ClientAgent.generate_id(
-                    appointment_data['clientId'],
-                    appointment_data['agentId']
-                ),
-                'clientId': appointment_data['clientId'],
-                'agentId': appointment_data['agentId'],
-                'relationshipDate': datetime.now().isoformat(),
-                'status': 'ACTIVE'
-            }
-            
-            client_agent_table = self._get_table('ClientAgent')
-            client_agent_table.put_item(Item=client_agent_data)
-            
+            updated_at = utc_timestamp()
+            appointment_data['updatedAt'] = updated_at
+            client_id = appointment_data['clientId']
+            agent_id = appointment_data['agentId']
+            link_id = ClientAgent.generate_id(client_id, agent_id)
+
+            if link_id in self._known_links:
+                # The relationship already exists, so only the appointment is written
+                self._get_table('Appointment').put_item(Item=appointment_data)
+                linked = False
+            else:
+                linked = self._book_and_link(appointment_data, {
+                    'id': link_id,
+                    'clientId': client_id,
+                    'agentId': agent_id,
+                    'relationshipDate': datetime.now().isoformat(),
+                    'status': 'ACTIVE',
+                    'updatedAt': updated_at
+                })
+                self._remember_link(link_id)
+
+            self._publish_change(agent_id, 'appointment', 'created', appointment_id, updated_at)
+            if linked:
+                self._publish_change(agent_id, 'client', 'linked', client_id, updated_at)
+
             return appointment_id
         except Exception as e:
-            print(f"Error adding appointment: {str(e)}")
+            logger.error('Error adding appointment: %s', e)
             raise
 
+    def _book_and_link(self, appointment_data: Dict[str, Any],
+                       client_agent_data: Dict[str, Any]) -> bool:
+        """Put the appointment and, only if absent, the ClientAgent row atomically.
+
+        Returns False when the relationship already existed; the appointment is
+        then written on its own, since a failed condition cancels the whole
+        transaction.
+        """
+        client = self.dynamodb.meta.client
+        try:
+            client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': f"{self.table_prefix}Appointment",
+                    'Item': appointment_data
+                }},
+                {'Put': {
+                    'TableName': f"{self.table_prefix}ClientAgent",
+                    'Item': client_agent_data,
+                    'ConditionExpression': 'attribute_not_exists(id)'
+                }}
+            ])
+            return True
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            link_exists = (
+                len(reasons) == 2
+                and reasons[0].get('Code') in (None, 'None')
+                and reasons[1].get('Code') == 'ConditionalCheckFailed'
+            )
+            if not link_exists:
+                raise
+        self._get_table('Appointment').put_item(Item=appointment_data)
+        return False
+
+    def _remember_link(self, link_id: str) -> None:
+        if len(self._known_links) >= KNOWN_LINKS_MAX:
+            self._known_links.clear()
+        self._known_links.add(link_id)
+
     def query_with_index(self, table_name: str, index_name: str, 
                     key_name: str, key_value: str) -> List[Dict[str, Any]]:
-        print(f"[QUERY DEBUG] Starting query with parameters:")
-        print(f"[QUERY DEBUG] Table: {table_name}")
-        print(f"[QUERY DEBUG] Index: {index_name}")
-        print(f"[QUERY DEBUG] Key: {key_name}={key_value}")
+        logger.debug('Querying %s.%s where %s=%s', table_name, index_name, key_name, key_value)
         
         table = self._get_table(table_name)
         try:
-            # First, verify the table exists
+            # Checked against cached metadata, not a DescribeTable per query
             try:
-                table.table_status
-                print(f"[QUERY DEBUG] Table {table_name} exists and is accessible")
+                self.table_metadata.check_query(f"{self.table_prefix}{table_name}", index_name, key_name)
             except Exception as e:
-                print(f"[QUERY DEBUG] Error accessing table: {str(e)}")
+                logger.error('Error accessing table %s: %s', table_name, e)
                 raise
 
             # Attempt the query
-            print(f"[QUERY DEBUG] Executing query on table")
             response = table.query(
                 IndexName=index_name,
                 KeyConditionExpression=f"{key_name} = :value",
@@ -101,82 +209,87 @@ class ClientService:
             )
             
             items = response.get('Items', [])
-            print(f"[QUERY DEBUG] Query successful. Found {len(items)} items")
-            if len(items) > 0:
-                print(f"[QUERY DEBUG] Sample item keys: {list(items[0].keys())}")
+            if items and logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Query found %s items', len(items),
+                             extra={'fields': {'sampleKeys': list(items[0].keys())}})
             return items
         
         except Exception as e:
-            print(f"[QUERY DEBUG] Error executing query: {str(e)}")
-            print(f"[QUERY DEBUG] Error type: {type(e).__name__}")
+            logger.error('Error executing query: %s', e, extra={'fields': {'errorType': type(e).__name__}})
             raise
 
     def get_appointments(self, client_id: str) -> List[Dict[str, Any]]:
-        print(f"[APPOINTMENT DEBUG] Getting appointments for client: {client_id}")
+        logger.debug('Getting appointments for client: %s', client_id)
         try:
-            # First, verify the client exists
-            client_table = self._get_table('Client')
-            client = client_table.get_item(Key={'clientId': client_id}).get('Item')
+            # First, verify the client exists (a cache hit on repeat polls)
+            client = self.get_client(client_id)
             if not client:
-                print(f"[APPOINTMENT DEBUG] Client {client_id} not found")
+                logger.debug('Client %s not found', client_id)
                 return []
             
-            print(f"[APPOINTMENT DEBUG] Client {client_id} exists, fetching appointments")
+            logger.debug('Client %s exists, fetching appointments', client_id)
             result = self.query_with_index('Appointment', 'client-index', 'clientId', client_id)
-            print(f"[APPOINTMENT DEBUG] Retrieved {len(result)} appointments")
+            logger.debug('Retrieved %s appointments', len(result))
             
             # Log the structure of each appointment for debugging
-            for idx, appt in enumerate(result):
-                print(f"[APPOINTMENT DEBUG] Appointment {idx + 1} structure:")
-                print(f"[APPOINTMENT DEBUG] Keys: {list(appt.keys())}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for idx, appt in enumerate(result):
+                    logger.debug('Appointment %s keys', idx + 1, extra={'fields': {'keys': list(appt.keys())}})
             
             return result
         except Exception as e:
-            print(f"[APPOINTMENT DEBUG] Error: {str(e)}")
-            print(f"[APPOINTMENT DEBUG] Error type: {type(e).__name__}")
+            logger.error('Error getting appointments: %s', e, extra={'fields': {'errorType': type(e).__name__}})
             raise
 
     def get_agents(self, client_id: str) -> List[Dict[str, Any]]:
-        print(f"[SERVICE] Getting agents for client: {client_id}")
+        logger.debug('Getting agents for client: %s', client_id)
         try:
             client_agents = self.query_with_index('ClientAgent', 'client-index', 'clientId', client_id)
-            print(f"[SERVICE] Found {len(client_agents)} client-agent relationships")
-            
-            agent_table = self._get_table('Agent')
-            agents = []
+            logger.debug('Found %s client-agent relationships', len(client_agents))
             
-            for ca in client_agents:
-                print(f"[SERVICE] Fetching agent {ca['agentId']}")
-                response = agent_table.get_item(Key={'agentId': ca['agentId']})
-                if 'Item' in response:
-                    agents.append(response['Item'])
-            
-            print(f"[SERVICE] Retrieved {len(agents)} agents")
+            # One agent per ID, in the order the relationships came back
+            agent_ids = list(dict.fromkeys(ca['agentId'] for ca in client_agents))
+            found = batch_get_items(
+                self.dynamodb,
+                f"{self.table_prefix}Agent",
+                [{'agentId': agent_id} for agent_id in agent_ids]
+            )
+            agents_by_id = {agent['agentId']: agent for agent in found}
+            agents = [agents_by_id[agent_id] for agent_id in agent_ids if agent_id in agents_by_id]
+
+            logger.debug('Retrieved %s agents', len(agents))
             return agents
         except Exception as e:
-            print(f"[ERROR] Failed to get agents: {str(e)}")
+            logger.error('Failed to get agents: %s', e)
             raise
 
     def get_transactions(self, client_id: str) -> List[Dict[str, Any]]:
-        print(f"[SERVICE] Getting transactions for client: {client_id}")
+        logger.debug('Getting transactions for client: %s', client_id)
         try:
             result = self.query_with_index('Transaction', 'client-index', 'clientId', client_id)
-            print(f"[SERVICE] Found {len(result)} transactions")
+            logger.debug('Found %s transactions', len(result))
             return result
         except Exception as e:
-            print(f"[ERROR] Failed to get transactions: {str(e)}")
+            logger.error('Failed to get transactions: %s', e)
             raise
 
     def pay_transaction(self, transaction_id: str) -> None:
         try:
             table = self._get_table('Transaction')
-            table.update_item(
+            updated_at = utc_timestamp()
+            response = table.update_item(
                 Key={'transactionId': transaction_id},
-                UpdateExpression='SET dateSent = :date',
+                UpdateExpression='SET dateSent = :date, updatedAt = :updatedAt',
                 ExpressionAttributeValues={
-                    ':date': datetime.now().isoformat()
-                }
+                    ':date': datetime.now().isoformat(),
+                    ':updatedAt': updated_at
+                },
+                # agentId is needed to route the change event
+                ReturnValues='ALL_NEW'
             )
+            agent_id = response.get('Attributes', {}).get('agentId')
+            if agent_id:
+                self._publish_change(agent_id, 'transaction', 'updated', transaction_id, updated_at)
         except Exception as e:
-            print(f"Error paying transaction: {str(e)}")
+            logger.error('Error paying transaction: %s', e)
             raise
\ No newline at end of file
@@ -0,0 +1,608 @@
+# dynamo_expressions.py
+# Parses and evaluates DynamoDB expression strings (key conditions,
+# condition/filter expressions, projections and update expressions) on the
+# plain Python values the resource layer uses: str, Decimal, Binary, bool,
+# None, list, dict and sets. Used by memory_dynamodb.
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from boto3.dynamodb.types import Binary
+
+
+class ExpressionError(ValueError):
+    """An expression DynamoDB would reject with a ValidationException"""
+
+
+# Returned by get_path when an attribute is absent
+MISSING = object()
+
+# The reserved words that could plausibly be attribute names in this data;
+# DynamoDB rejects them unless they are written as #placeholders
+RESERVED_WORDS = frozenset({
+    'ACTION', 'AGENT', 'ALL', 'COMMENT', 'COUNT', 'DATA', 'DATE', 'DAY', 'DURATION',
+    'EMPTY', 'END', 'FIRST', 'HOUR', 'INDEX', 'ITEM', 'KEY', 'LAST', 'LIMIT',
+    'LOCATION', 'MINUTE', 'MONTH', 'NAME', 'NUMBER', 'OWNER', 'PATH', 'PROPERTY',
+    'REGION', 'ROLE', 'SIZE', 'SOURCE', 'START', 'STATE', 'STATUS', 'TEXT',
+    'TIME', 'TIMESTAMP', 'TOTAL', 'TTL', 'TYPE', 'URL', 'USER', 'VALUE', 'YEAR', 'ZONE',
+})
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<number>\d+)
+   |(?P<value>:[A-Za-z0-9_]+)
+   |(?P<name>\#[A-Za-z0-9_]+|[A-Za-z_][A-Za-z0-9_]*)
+   |(?P<symbol><>|<=|>=|[=<>(),.\[\]+-])
+)""", re.VERBOSE)
+
+_COMPARATORS = ('=', '<>', '<', '<=', '>', '>=')
+_CONDITION_FUNCTIONS = ('attribute_exists', 'attribute_not_exists', 'attribute_type',
+                        'begins_with', 'contains')
+_UPDATE_CLAUSES = ('SET', 'REMOVE', 'ADD', 'DELETE')
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    text = text.strip()
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ExpressionError(f"Invalid syntax near: {text[pos:pos + 20]!r}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+    return tokens
+
+
+class Expression:
+    """A parsed expression plus the #name and :value placeholders it uses"""
+
+    def __init__(self, tree: Any, names: FrozenSet[str], values: FrozenSet[str]):
+        self.tree = tree
+        self.names = names
+        self.values = values
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.names = set()
+        self.values = set()
+
+    # --- token helpers ---------------------------------------------------
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self) -> Tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise ExpressionError(f"Unexpected end of expression: {self.text!r}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def at_symbol(self, symbol: str) -> bool:
+        return self.peek() == ('symbol', symbol)
+
+    def at_keyword(self, *words: str) -> bool:
+        kind, text = self.peek()
+        return kind == 'name' and text.upper() in words
+
+    def expect(self, symbol: str) -> None:
+        token = self.take()
+        if token != ('symbol', symbol):
+            raise ExpressionError(f"Expected {symbol!r} but found {token[1]!r} in {self.text!r}")
+
+    def finish(self, tree: Any) -> Expression:
+        if self.pos != len(self.tokens):
+            raise ExpressionError(f"Unexpected {self.peek()[1]!r} in {self.text!r}")
+        return Expression(tree, frozenset(self.names), frozenset(self.values))
+
+    # --- operands --------------------------------------------------------
+
+    def attribute_name(self) -> str:
+        kind, text = self.take()
+        if kind != 'name':
+            raise ExpressionError(f"Expected an attribute name but found {text!r} in {self.text!r}")
+        if text.startswith('#'):
+            self.names.add(text)
+        elif text.upper() in RESERVED_WORDS:
+            raise ExpressionError(f"Attribute name is a reserved keyword; reserved keyword: {text}")
+        return text
+
+    def path(self) -> Tuple[str, Tuple[Any, ...]]:
+        elements: List[Any] = [self.attribute_name()]
+        while True:
+            if self.at_symbol('.'):
+                self.take()
+                elements.append(self.attribute_name())
+            elif self.at_symbol('['):
+                self.take()
+                kind, text = self.take()
+                if kind != 'number':
+                    raise ExpressionError(f"List index must be a number in {self.text!r}")
+                elements.append(int(text))
+                self.expect(']')
+            else:
+                return ('path', tuple(elements))
+
+    def operand(self) -> Tuple[Any, ...]:
+        kind, text = self.peek()
+        if kind == 'value':
+            self.take()
+            self.values.add(text)
+            return ('value', text)
+        if kind == 'name' and text.lower() == 'size' and self.peek(1) == ('symbol', '('):
+            self.take()
+            self.expect('(')
+            target = self.path()
+            self.expect(')')
+            return ('size', target)
+        return self.path()
+
+    # --- conditions ------------------------------------------------------
+
+    def condition(self) -> Tuple[Any, ...]:
+        left = self.conjunction()
+        while self.at_keyword('OR'):
+            self.take()
+            left = ('or', left, self.conjunction())
+        return left
+
+    def conjunction(self) -> Tuple[Any, ...]:
+        left = self.negation()
+        while self.at_keyword('AND'):
+            self.take()
+            left = ('and', left, self.negation())
+        return left
+
+    def negation(self) -> Tuple[Any, ...]:
+        if self.at_keyword('NOT'):
+            self.take()
+            return ('not', self.negation())
+        return self.predicate()
+
+    def predicate(self) -> Tuple[Any, ...]:
+        if self.at_symbol('('):
+            self.take()
+            inner = self.condition()
+            self.expect(')')
+            return inner
+        kind, text = self.peek()
+        if kind == 'name' and text in _CONDITION_FUNCTIONS and self.peek(1) == ('symbol', '('):
+            self.take()
+            self.expect('(')
+            args = [self.operand()]
+            while self.at_symbol(','):
+                self.take()
+                args.append(self.operand())
+            self.expect(')')
+            return ('func', text, tuple(args))
+
+        left = self.operand()
+        if self.at_keyword('BETWEEN'):
+            self.take()
+            low = self.operand()
+            if not self.at_keyword('AND'):
+                raise ExpressionError(f"BETWEEN needs AND in {self.text!r}")
+            self.take()
+            return ('between', left, low, self.operand())
+        if self.at_keyword('IN'):
+            self.take()
+            self.expect('(')
+            options = [self.operand()]
+            while self.at_symbol(','):
+                self.take()
+                options.append(self.operand())
+            self.expect(')')
+            if len(options) > 100:
+                raise ExpressionError("IN accepts at most 100 operands")
+            return ('in', left, tuple(options))
+        kind, symbol = self.take()
+        if kind != 'symbol' or symbol not in _COMPARATORS:
+            raise ExpressionError(f"Expected a comparator but found {symbol!r} in {self.text!r}")
+        return ('cmp', symbol, left, self.operand())
+
+    # --- update expressions ----------------------------------------------
+
+    def update_value(self) -> Tuple[Any, ...]:
+        left = self.update_operand()
+        if self.at_symbol('+') or self.at_symbol('-'):
+            _, symbol = self.take()
+            return ('arith', symbol, left, self.update_operand())
+        return left
+
+    def update_operand(self) -> Tuple[Any, ...]:
+        kind, text = self.peek()
+        if kind == 'name' and text in ('if_not_exists', 'list_append') and self.peek(1) == ('symbol', '('):
+            self.take()
+            self.expect('(')
+            first = self.path() if text == 'if_not_exists' else self.update_operand()
+            self.expect(',')
+            second = self.update_operand()
+            self.expect(')')
+            return (text, first, second)
+        return self.operand()
+
+    def update(self) -> Tuple[Any, ...]:
+        actions = []
+        seen_clauses = set()
+        while self.pos < len(self.tokens):
+            if not self.at_keyword(*_UPDATE_CLAUSES):
+                raise ExpressionError(f"Expected SET, REMOVE, ADD or DELETE in {self.text!r}")
+            clause = self.take()[1].upper()
+            if clause in seen_clauses:
+                raise ExpressionError(f"The {clause} section can only be used once in an update expression")
+            seen_clauses.add(clause)
+            while True:
+                target = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append(('SET', target, self.update_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', target, None))
+                else:
+                    value = self.operand()
+                    if value[0] != 'value':
+                        raise ExpressionError(f"{clause} takes a :value in {self.text!r}")
+                    actions.append((clause, target, value))
+                if not self.at_symbol(','):
+                    break
+                self.take()
+        if not actions:
+            raise ExpressionError("The update expression is empty")
+        return tuple(actions)
+
+
+@lru_cache(maxsize=512)
+def parse_condition(text: str) -> Expression:
+    """Parse a ConditionExpression, FilterExpression or KeyConditionExpression"""
+    parser = _Parser(text)
+    return parser.finish(parser.condition())
+
+
+@lru_cache(maxsize=512)
+def parse_update(text: str) -> Expression:
+    parser = _Parser(text)
+    return parser.finish(parser.update())
+
+
+@lru_cache(maxsize=512)
+def parse_projection(text: str) -> Expression:
+    parser = _Parser(text)
+    paths = [parser.path()]
+    while parser.at_symbol(','):
+        parser.take()
+        paths.append(parser.path())
+    return parser.finish(tuple(paths))
+
+
+# --- evaluation ----------------------------------------------------------
+
+def type_code(value: Any) -> str:
+    """DynamoDB type descriptor of a resource-layer value"""
+    if isinstance(value, str):
+        return 'S'
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, Decimal):
+        return 'N'
+    if isinstance(value, Binary):
+        return 'B'
+    if value is None:
+        return 'NULL'
+    if isinstance(value, list):
+        return 'L'
+    if isinstance(value, dict):
+        return 'M'
+    if isinstance(value, (set, frozenset)):
+        member = next(iter(value))
+        return {'S': 'SS', 'N': 'NS', 'B': 'BS'}[type_code(member)]
+    raise ExpressionError(f"Unsupported type {type(value).__name__}")
+
+
+def resolve(elements: Tuple[Any, ...], names: Dict[str, str]) -> Tuple[Any, ...]:
+    """Replace #placeholders in a path with the attribute names they stand for"""
+    if not any(isinstance(element, str) and element.startswith('#') for element in elements):
+        return elements
+    try:
+        return tuple(names[element] if isinstance(element, str) and element.startswith('#') else element
+                     for element in elements)
+    except KeyError as e:
+        raise ExpressionError(f"An expression attribute name used in the document path is not defined; attribute name: {e.args[0]}")
+
+
+def get_path(item: Dict[str, Any], elements: Tuple[Any, ...]) -> Any:
+    value: Any = item
+    for element in elements:
+        if isinstance(element, int):
+            if not isinstance(value, list) or element >= len(value):
+                return MISSING
+        elif not isinstance(value, dict) or element not in value:
+            return MISSING
+        value = value[element]
+    return value
+
+
+def set_path(item: Dict[str, Any], elements: Tuple[Any, ...], value: Any) -> None:
+    parent = get_path(item, elements[:-1])
+    last = elements[-1]
+    if isinstance(last, int):
+        if not isinstance(parent, list):
+            raise ExpressionError("The document path provided in the update expression is invalid for update")
+        if last >= len(parent):
+            parent.append(value)
+        else:
+            parent[last] = value
+    else:
+        if not isinstance(parent, dict):
+            raise ExpressionError("The document path provided in the update expression is invalid for update")
+        parent[last] = value
+
+
+def remove_path(item: Dict[str, Any], elements: Tuple[Any, ...]) -> None:
+    parent = get_path(item, elements[:-1])
+    last = elements[-1]
+    if isinstance(last, int):
+        if isinstance(parent, list) and last < len(parent):
+            del parent[last]
+    elif isinstance(parent, dict):
+        parent.pop(last, None)
+
+
+def _value(node: Tuple[Any, ...], item: Dict[str, Any], names: Dict[str, str],
+           values: Dict[str, Any]) -> Any:
+    kind = node[0]
+    if kind == 'value':
+        try:
+            return values[node[1]]
+        except KeyError:
+            raise ExpressionError(f"An expression attribute value used in expression is not defined; attribute value: {node[1]}")
+    if kind == 'path':
+        return get_path(item, resolve(node[1], names))
+    if kind == 'size':
+        target = get_path(item, resolve(node[1][1], names))
+        if target is MISSING or isinstance(target, (bool, Decimal)) or target is None:
+            return MISSING
+        return Decimal(len(target.value if isinstance(target, Binary) else target))
+    raise ExpressionError(f"Unexpected operand {kind}")
+
+
+def _comparable(left: Any, right: Any) -> bool:
+    return (left is not MISSING and right is not MISSING
+            and type_code(left) == type_code(right) and type_code(left) in ('S', 'N', 'B'))
+
+
+def _sort_value(value: Any) -> Any:
+    return value.value if isinstance(value, Binary) else value
+
+
+def _equal(left: Any, right: Any) -> bool:
+    if left is MISSING or right is MISSING:
+        return False
+    return type_code(left) == type_code(right) and left == right
+
+
+def compare(op: str, left: Any, right: Any) -> bool:
+    if op == '=':
+        return _equal(left, right)
+    if op == '<>':
+        return not _equal(left, right)
+    if not _comparable(left, right):
+        return False
+    left, right = _sort_value(left), _sort_value(right)
+    if op == '<':
+        return left < right
+    if op == '<=':
+        return left <= right
+    if op == '>':
+        return left > right
+    return left >= right
+
+
+def evaluate(expression: Expression, item: Dict[str, Any], names: Dict[str, str],
+             values: Dict[str, Any]) -> bool:
+    """True when `item` satisfies a condition or filter expression"""
+    return _evaluate(expression.tree, item, names, values)
+
+
+def _evaluate(node: Tuple[Any, ...], item: Dict[str, Any], names: Dict[str, str],
+              values: Dict[str, Any]) -> bool:
+    kind = node[0]
+    if kind == 'and':
+        return _evaluate(node[1], item, names, values) and _evaluate(node[2], item, names, values)
+    if kind == 'or':
+        return _evaluate(node[1], item, names, values) or _evaluate(node[2], item, names, values)
+    if kind == 'not':
+        return not _evaluate(node[1], item, names, values)
+    if kind == 'cmp':
+        return compare(node[1], _value(node[2], item, names, values), _value(node[3], item, names, values))
+    if kind == 'between':
+        target = _value(node[1], item, names, values)
+        low = _value(node[2], item, names, values)
+        high = _value(node[3], item, names, values)
+        return compare('>=', target, low) and compare('<=', target, high)
+    if kind == 'in':
+        target = _value(node[1], item, names, values)
+        return any(_equal(target, _value(option, item, names, values)) for option in node[2])
+    if kind == 'func':
+        return _function(node[1], node[2], item, names, values)
+    raise ExpressionError(f"Unexpected condition {kind}")
+
+
+def _function(name: str, args: Tuple[Any, ...], item: Dict[str, Any], names: Dict[str, str],
+              values: Dict[str, Any]) -> bool:
+    if name in ('attribute_exists', 'attribute_not_exists'):
+        if len(args) != 1 or args[0][0] != 'path':
+            raise ExpressionError(f"{name} takes one attribute path")
+        exists = _value(args[0], item, names, values) is not MISSING
+        return exists if name == 'attribute_exists' else not exists
+    if len(args) != 2:
+        raise ExpressionError(f"{name} takes two operands")
+    target = _value(args[0], item, names, values)
+    operand = _value(args[1], item, names, values)
+    if target is MISSING or operand is MISSING:
+        return False
+    if name == 'attribute_type':
+        return type_code(target) == operand
+    if name == 'begins_with':
+        if isinstance(target, str) and isinstance(operand, str):
+            return target.startswith(operand)
+        if isinstance(target, Binary) and isinstance(operand, Binary):
+            return target.value.startswith(operand.value)
+        return False
+    # contains
+    if isinstance(target, str):
+        return isinstance(operand, str) and operand in target
+    if isinstance(target, Binary):
+        return isinstance(operand, Binary) and operand.value in target.value
+    if isinstance(target, (set, frozenset, list)):
+        return any(_equal(member, operand) for member in target)
+    return False
+
+
+def key_condition(expression: Expression, names: Dict[str, str], values: Dict[str, Any],
+                  hash_key: str, range_key: Optional[str]) -> Tuple[Any, Optional[Tuple[Any, ...]]]:
+    """Split a KeyConditionExpression into (partition value, sort-key condition).
+
+    The sort-key condition is None or (op, value[, value]) with op one of
+    = < <= > >= BETWEEN begins_with.
+    """
+    parts = []
+
+    def collect(node):
+        if node[0] == 'and':
+            collect(node[1])
+            collect(node[2])
+        else:
+            parts.append(node)
+
+    collect(expression.tree)
+    hash_value = MISSING
+    sort_condition = None
+    for node in parts:
+        if node[0] == 'cmp' and node[2][0] == 'path' and node[3][0] == 'value':
+            attribute, op, value = node[2], node[1], node[3]
+        elif node[0] == 'between' and node[1][0] == 'path':
+            attribute, op, value = node[1], 'BETWEEN', None
+        elif node[0] == 'func' and node[1] == 'begins_with' and node[2][0][0] == 'path':
+            attribute, op, value = node[2][0], 'begins_with', node[2][1]
+        else:
+            raise ExpressionError("Invalid operator used in KeyConditionExpression")
+        elements = resolve(attribute[1], names)
+        if len(elements) != 1:
+            raise ExpressionError("Key attributes must be top-level attributes")
+        name = elements[0]
+        if name == hash_key and op == '=' and hash_value is MISSING:
+            hash_value = _value(value, {}, names, values)
+        elif name == range_key and sort_condition is None and op != '<>':
+            if op == 'BETWEEN':
+                sort_condition = ('BETWEEN', _value(node[2], {}, names, values), _value(node[3], {}, names, values))
+            else:
+                sort_condition = (op, _value(value, {}, names, values))
+        else:
+            raise ExpressionError(f"Query key condition not supported on {name}")
+    if hash_value is MISSING:
+        raise ExpressionError("Query condition missed key schema element: " + hash_key)
+    return hash_value, sort_condition
+
+
+def apply_update(expression: Expression, item: Dict[str, Any], names: Dict[str, str],
+                 values: Dict[str, Any]) -> List[str]:
+    """Apply an update expression to `item` in place; returns the top-level attributes touched.
+
+    Right-hand sides are evaluated against the item as it was before the
+    update, as DynamoDB does.
+    """
+    before = dict(item)
+    planned = []
+    touched = []
+    for action, target, operand in expression.tree:
+        elements = resolve(target[1], names)
+        if elements in (entry[1] for entry in planned):
+            raise ExpressionError("Two document paths overlap with each other; must remove or rewrite one of these paths")
+        planned.append((action, elements, operand))
+        if elements[0] not in touched:
+            touched.append(elements[0])
+
+    for action, elements, operand in planned:
+        if action == 'SET':
+            set_path(item, elements, _update_value(operand, before, names, values))
+        elif action == 'REMOVE':
+            remove_path(item, elements)
+        else:
+            change = _value(operand, before, names, values)
+            current = get_path(item, elements)
+            if action == 'ADD':
+                if isinstance(change, Decimal) and (current is MISSING or isinstance(current, Decimal)):
+                    set_path(item, elements, (current if current is not MISSING else Decimal(0)) + change)
+                elif isinstance(change, (set, frozenset)) and (current is MISSING or isinstance(current, (set, frozenset))):
+                    set_path(item, elements, set(current if current is not MISSING else ()) | set(change))
+                else:
+                    raise ExpressionError("An operand in the update expression has an incorrect data type")
+            else:
+                if not isinstance(change, (set, frozenset)):
+                    raise ExpressionError("An operand in the update expression has an incorrect data type")
+                if current is not MISSING:
+                    remaining = set(current) - set(change)
+                    if remaining:
+                        set_path(item, elements, remaining)
+                    else:
+                        remove_path(item, elements)
+    return touched
+
+
+def _update_value(node: Tuple[Any, ...], item: Dict[str, Any], names: Dict[str, str],
+                  values: Dict[str, Any]) -> Any:
+    kind = node[0]
+    if kind == 'arith':
+        left = _update_value(node[2], item, names, values)
+        right = _update_value(node[3], item, names, values)
+        if not isinstance(left, Decimal) or not isinstance(right, Decimal):
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        return left + right if node[1] == '+' else left - right
+    if kind == 'if_not_exists':
+        current = get_path(item, resolve(node[1][1], names))
+        return current if current is not MISSING else _update_value(node[2], item, names, values)
+    if kind == 'list_append':
+        first = _update_value(node[1], item, names, values)
+        second = _update_value(node[2], item, names, values)
+        if not isinstance(first, list) or not isinstance(second, list):
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        return first + second
+    value = _value(node, item, names, values)
+    if value is MISSING:
+        raise ExpressionError("The provided expression refers to an attribute that does not exist in the item")
+    return value
+
+
+def project(expression: Expression, item: Dict[str, Any], names: Dict[str, str]) -> Dict[str, Any]:
+    """Copy only the attribute paths named by a ProjectionExpression"""
+    projected: Dict[str, Any] = {}
+    for path in expression.tree:
+        elements = resolve(path[1], names)
+        value = get_path(item, elements)
+        if value is not MISSING:
+            _merge_path(projected, elements, value)
+    return projected
+
+
+def _merge_path(target: Any, elements: Tuple[Any, ...], value: Any) -> None:
+    # Selected list elements come back in order, compacted, as DynamoDB does
+    head, rest = elements[0], elements[1:]
+    if not rest:
+        if isinstance(head, int):
+            target.append(value)
+        else:
+            target[head] = value
+        return
+    container: Any = [] if isinstance(rest[0], int) else {}
+    if isinstance(head, int):
+        target.append(container)
+        child = container
+    else:
+        child = target.setdefault(head, container)
+    _merge_path(child, rest, value)
@@ -0,0 +1,374 @@
+# dynamo_metrics.py
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Set on both Lambdas by template.yaml
+NAMESPACE = os.environ.get('POWERTOOLS_METRICS_NAMESPACE', 'RealEstate')
+SERVICE_NAME = os.environ.get('POWERTOOLS_SERVICE_NAME', 'real-estate')
+
+# 'off' leaves the DynamoDB resource unwrapped and writes no metric lines
+DYNAMODB_METRICS = os.environ.get('DYNAMODB_METRICS', 'on')
+
+# EMF accepts at most 100 values for one metric in one line
+_MAX_EMF_VALUES = 100
+
+_READ_OPERATIONS = frozenset({'get_item', 'query', 'scan', 'batch_get_item', 'transact_get_items'})
+_WRITE_ONE_ITEM = frozenset({'put_item', 'update_item', 'delete_item'})
+
+
+def _response_bytes(response: Dict[str, Any]) -> int:
+    headers = response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+    try:
+        return int(headers.get('content-length', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _capacity_units(response: Dict[str, Any]) -> float:
+    consumed = response.get('ConsumedCapacity')
+    if not consumed:
+        return 0.0
+    # One entry for single-table calls, a list for batch and transaction calls
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return float(sum(entry.get('CapacityUnits', 0) for entry in consumed))
+
+
+def _item_count(operation: str, request: Dict[str, Any], response: Dict[str, Any]) -> int:
+    if 'Count' in response:
+        return int(response['Count'])
+    if operation == 'get_item':
+        return 1 if 'Item' in response else 0
+    if 'Responses' in response:
+        responses = response['Responses']
+        if isinstance(responses, dict):
+            return sum(len(items) for items in responses.values())
+        return sum(1 for entry in responses if entry.get('Item'))
+    if operation in _WRITE_ONE_ITEM:
+        return 1
+    if operation == 'transact_write_items':
+        return len(request.get('TransactItems', ()))
+    if operation == 'batch_write_item':
+        return sum(len(requests) for requests in request.get('RequestItems', {}).values())
+    return 0
+
+
+def _request_tables(request: Dict[str, Any]) -> str:
+    if 'TableName' in request:
+        return request['TableName']
+    names = set(request.get('RequestItems', ()))
+    for entry in request.get('TransactItems', ()):
+        for action in entry.values():
+            names.add(action.get('TableName'))
+    return '+'.join(sorted(name for name in names if name)) or 'unknown'
+
+
+class _Buffer:
+    """What one invocation has recorded"""
+
+    def __init__(self, endpoint: Optional[str] = None):
+        self.endpoint = endpoint
+        self.calls: Dict[tuple, Dict[str, Any]] = {}
+
+
+class DynamoMetrics:
+    """DynamoDB call totals for the current invocation, by table, operation and index.
+
+    The totals live in a context variable, so invocations served side by side
+    (the load benchmarks call the handlers from several threads) each flush
+    only their own calls; worker threads share the buffer of the invocation
+    that started them through structured_logging.bind_request_context.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer: 'contextvars.ContextVar[Optional[_Buffer]]' = contextvars.ContextVar(
+            f"dynamo_metrics_{id(self)}", default=None)
+
+    def _current(self) -> _Buffer:
+        buffer = self._buffer.get()
+        if buffer is None:
+            buffer = _Buffer()
+            self._buffer.set(buffer)
+        return buffer
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        return self._current().endpoint
+
+    @endpoint.setter
+    def endpoint(self, endpoint: Optional[str]) -> None:
+        self._current().endpoint = endpoint
+
+    def reset(self, endpoint: Optional[str] = None) -> None:
+        self._buffer.set(_Buffer(endpoint))
+
+    def call(self, operation: str, table: str, index: Optional[str],
+             fn: Callable[..., Dict[str, Any]], request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one DynamoDB call, asking for its consumed capacity, and record it"""
+        request.setdefault('ReturnConsumedCapacity', 'TOTAL')
+        start = time.perf_counter()
+        try:
+            response = fn(**request)
+        except Exception:
+            self.record(operation, table, index, time.perf_counter() - start, request, None)
+            raise
+        self.record(operation, table, index, time.perf_counter() - start, request, response)
+        return response
+
+    def record(self, operation: str, table: str, index: Optional[str], seconds: float,
+               request: Dict[str, Any], response: Optional[Dict[str, Any]]) -> None:
+        key = (table, operation, index or 'base')
+        calls = self._current().calls
+        with self._lock:
+            totals = calls.get(key)
+            if totals is None:
+                totals = calls[key] = {
+                    'latencies': [], 'items': 0, 'bytes': 0, 'capacity': 0.0, 'errors': 0
+                }
+            totals['latencies'].append(round(seconds * 1000, 3))
+            if response is None:
+                totals['errors'] += 1
+                return
+            totals['items'] += _item_count(operation, request, response)
+            totals['bytes'] += _response_bytes(response)
+            totals['capacity'] += _capacity_units(response)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per (table, operation, index) seen since the last reset"""
+        buffer = self._current()
+        with self._lock:
+            calls = list(buffer.calls.items())
+        rows = []
+        for (table, operation, index), totals in calls:
+            is_read = operation in _READ_OPERATIONS
+            rows.append({
+                'table': table,
+                'operation': operation,
+                'index': index,
+                'calls': len(totals['latencies']),
+                'latencies': list(totals['latencies']),
+                'items': totals['items'],
+                'bytes': totals['bytes'],
+                'readCapacity': totals['capacity'] if is_read else 0.0,
+                'writeCapacity': 0.0 if is_read else totals['capacity'],
+                'errors': totals['errors'],
+            })
+        return rows
+
+    def emf_lines(self, timestamp_ms: Optional[int] = None) -> List[str]:
+        """CloudWatch Embedded Metric Format lines for everything recorded so far"""
+        rows = self.summary()
+        if not rows:
+            return []
+        timestamp_ms = timestamp_ms or int(time.time() * 1000)
+        endpoint = self.endpoint or 'unknown'
+        lines = [json.dumps({
+            '_aws': _emf_meta(timestamp_ms, [['service', 'endpoint']], (
+                ('DynamoDBCalls', 'Count'),
+                ('DynamoDBTime', 'Milliseconds'),
+                ('ConsumedReadCapacity', 'Count'),
+                ('ConsumedWriteCapacity', 'Count'),
+                ('ReturnedBytes', 'Bytes'),
+                ('DynamoDBErrors', 'Count'),
+            )),
+            'service': SERVICE_NAME,
+            'endpoint': endpoint,
+            'DynamoDBCalls': sum(row['calls'] for row in rows),
+            'DynamoDBTime': round(sum(sum(row['latencies']) for row in rows), 3),
+            'ConsumedReadCapacity': sum(row['readCapacity'] for row in rows),
+            'ConsumedWriteCapacity': sum(row['writeCapacity'] for row in rows),
+            'ReturnedBytes': sum(row['bytes'] for row in rows),
+            'DynamoDBErrors': sum(row['errors'] for row in rows),
+        })]
+
+        call_dimensions = [['service', 'table', 'operation'], ['service', 'table', 'index']]
+        for row in rows:
+            latencies = row['latencies']
+            for start in range(0, len(latencies), _MAX_EMF_VALUES):
+                line = {
+                    'service': SERVICE_NAME,
+                    'endpoint': endpoint,
+                    'table': row['table'],
+                    'operation': row['operation'],
+                    'index': row['index'],
+                    'DynamoDBLatency': latencies[start:start + _MAX_EMF_VALUES],
+                }
+                metrics = [('DynamoDBLatency', 'Milliseconds')]
+                # Counters go on the first line only so sums stay exact
+                if start == 0:
+                    metrics += [
+                        ('DynamoDBCalls', 'Count'),
+                        ('ItemCount', 'Count'),
+                        ('ReturnedBytes', 'Bytes'),
+                        ('ConsumedReadCapacity', 'Count'),
+                        ('ConsumedWriteCapacity', 'Count'),
+                        ('DynamoDBErrors', 'Count'),
+                    ]
+                    line.update({
+                        'DynamoDBCalls': row['calls'],
+                        'ItemCount': row['items'],
+                        'ReturnedBytes': row['bytes'],
+                        'ConsumedReadCapacity': row['readCapacity'],
+                        'ConsumedWriteCapacity': row['writeCapacity'],
+                        'DynamoDBErrors': row['errors'],
+                    })
+                line['_aws'] = _emf_meta(timestamp_ms, call_dimensions, metrics)
+                lines.append(json.dumps(line))
+        return lines
+
+    def flush(self, stream=None) -> int:
+        """Write the EMF lines to stdout (CloudWatch Logs) and start over; returns the line count"""
+        lines = self.emf_lines()
+        if lines:
+            stream = stream or sys.stdout
+            stream.write('\n'.join(lines) + '\n')
+            stream.flush()
+        self.reset()
+        return len(lines)
+
+
+def _emf_meta(timestamp_ms: int, dimensions: List[List[str]], metrics) -> Dict[str, Any]:
+    return {
+        'Timestamp': timestamp_ms,
+        'CloudWatchMetrics': [{
+            'Namespace': NAMESPACE,
+            'Dimensions': dimensions,
+            'Metrics': [{'Name': name, 'Unit': unit} for name, unit in metrics],
+        }],
+    }
+
+
+class InstrumentedTable:
+    """Table wrapper that records every item and query call"""
+
+    def __init__(self, table, name: str, metrics: DynamoMetrics):
+        self._table = table
+        self._metrics = metrics
+        self.name = name
+
+    def get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('get_item', self.name, None, self._table.get_item, kwargs)
+
+    def put_item(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('put_item', self.name, None, self._table.put_item, kwargs)
+
+    def update_item(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('update_item', self.name, None, self._table.update_item, kwargs)
+
+    def delete_item(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('delete_item', self.name, None, self._table.delete_item, kwargs)
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('query', self.name, kwargs.get('IndexName'), self._table.query, kwargs)
+
+    def scan(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('scan', self.name, kwargs.get('IndexName'), self._table.scan, kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._table, name)
+
+
+class InstrumentedClient:
+    """Low-level client wrapper for the multi-table calls the services make"""
+
+    def __init__(self, client, metrics: DynamoMetrics):
+        self._client = client
+        self._metrics = metrics
+
+    def _call(self, operation: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return self._metrics.call(operation, _request_tables(kwargs), kwargs.get('IndexName'),
+                                  getattr(self._client, operation), kwargs)
+
+    def transact_write_items(self, **kwargs) -> Dict[str, Any]:
+        return self._call('transact_write_items', kwargs)
+
+    def transact_get_items(self, **kwargs) -> Dict[str, Any]:
+        return self._call('transact_get_items', kwargs)
+
+    def batch_get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._call('batch_get_item', kwargs)
+
+    def batch_write_item(self, **kwargs) -> Dict[str, Any]:
+        return self._call('batch_write_item', kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class _InstrumentedMeta:
+    def __init__(self, meta, metrics: DynamoMetrics):
+        self._meta = meta
+        self.client = InstrumentedClient(meta.client, metrics)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._meta, name)
+
+
+class InstrumentedResource:
+    """DynamoDB resource wrapper whose tables and client record into a DynamoMetrics"""
+
+    def __init__(self, resource, metrics: DynamoMetrics):
+        self._resource = resource
+        self._metrics = metrics
+        self._meta = None
+
+    def Table(self, name: str) -> InstrumentedTable:
+        return InstrumentedTable(self._resource.Table(name), name, self._metrics)
+
+    def batch_get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('batch_get_item', _request_tables(kwargs), None,
+                                  self._resource.batch_get_item, kwargs)
+
+    def batch_write_item(self, **kwargs) -> Dict[str, Any]:
+        return self._metrics.call('batch_write_item', _request_tables(kwargs), None,
+                                  self._resource.batch_write_item, kwargs)
+
+    @property
+    def meta(self) -> _InstrumentedMeta:
+        if self._meta is None:
+            self._meta = _InstrumentedMeta(self._resource.meta, self._metrics)
+        return self._meta
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resource, name)
+
+
+# One recorder per Lambda container; each invocation's totals are kept apart
+_metrics = DynamoMetrics()
+
+
+def get_dynamo_metrics() -> DynamoMetrics:
+    """Return the container's recorder"""
+    return _metrics
+
+
+def instrument(dynamodb_resource, metrics: Optional[DynamoMetrics] = None):
+    """Wrap a DynamoDB resource so its calls are recorded; a wrapped resource is returned as is"""
+    if DYNAMODB_METRICS == 'off' or isinstance(dynamodb_resource, InstrumentedResource):
+        return dynamodb_resource
+    return InstrumentedResource(dynamodb_resource, metrics or _metrics)
+
+
+def set_metrics_endpoint(endpoint: Optional[str]) -> None:
+    """Name the API action the current invocation's calls are reported under"""
+    _metrics.endpoint = endpoint
+
+
+def flush_dynamo_metrics(handler: Callable) -> Callable:
+    """Decorate a Lambda handler so each invocation starts clean and ends with one EMF flush"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        _metrics.reset()
+        try:
+            return handler(event, context)
+        finally:
+            if DYNAMODB_METRICS != 'off':
+                _metrics.flush()
+    return wrapper
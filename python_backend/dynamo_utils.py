@@ -0,0 +1,319 @@
+# dynamo_utils.py
+import base64
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from structured_logging import bind_request_context
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Full-table reads are split into this many Segment/TotalSegments workers;
+# 1 keeps the plain sequential scan.
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '1'))
+SCAN_MAX_WORKERS = int(os.environ.get('SCAN_MAX_WORKERS', '8'))
+
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_GET_MAX_WORKERS = int(os.environ.get('BATCH_GET_MAX_WORKERS', '4'))
+BATCH_MAX_RETRIES = 8
+BATCH_BASE_DELAY = 0.05
+
+# GSIs are eventually consistent, so the watermark handed back to pollers
+# trails the read by this much; rows near the boundary may be sent twice.
+DELTA_SYNC_LAG_SECONDS = float(os.environ.get('DELTA_SYNC_LAG_SECONDS', '2'))
+
+_SEGMENT_DONE = object()
+
+
+def utc_timestamp(moment: Optional[datetime] = None) -> str:
+    """Fixed-width UTC ISO-8601 string, so timestamps compare correctly as text"""
+    moment = moment or datetime.now(timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def sync_watermark() -> str:
+    """Timestamp a poller should send as `since` on its next delta request"""
+    return utc_timestamp(datetime.now(timezone.utc) - timedelta(seconds=DELTA_SYNC_LAG_SECONDS))
+
+
+def parse_since(body: Dict[str, Any]) -> Optional[str]:
+    """Pull `since` out of a request body; None means a full read was requested"""
+    since = body.get('since')
+    if not since:
+        return None
+    try:
+        datetime.strptime(since, '%Y-%m-%dT%H:%M:%S.%fZ')
+    except (TypeError, ValueError):
+        raise ValueError("since must be a timestamp returned as a previous watermark")
+    return since
+
+
+def iter_pages(operation: Callable[..., Dict[str, Any]], **kwargs) -> Iterator[Dict[str, Any]]:
+    """Yield raw scan/query responses, following LastEvaluatedKey until exhausted"""
+    while True:
+        response = operation(**kwargs)
+        yield response
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def iter_items(operation: Callable[..., Dict[str, Any]], **kwargs) -> Iterator[Dict[str, Any]]:
+    """Yield items one at a time across every page of a scan/query"""
+    for page in iter_pages(operation, **kwargs):
+        yield from page.get('Items', [])
+
+
+def parallel_scan(scan: Callable[..., Dict[str, Any]], total_segments: int,
+                  max_workers: Optional[int] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+    """Scan all segments concurrently and yield their items as one stream.
+
+    Pages are handed over through a bounded queue, so a slow consumer stalls
+    the workers instead of buffering the whole table. Item order is not
+    preserved across segments.
+    """
+    if total_segments < 1:
+        raise ValueError("total_segments must be at least 1")
+    if total_segments == 1:
+        yield from iter_items(scan, **kwargs)
+        return
+
+    workers = min(total_segments, max_workers or SCAN_MAX_WORKERS)
+    pages: queue.Queue = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def hand_over(entry) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_segment(segment: int) -> None:
+        try:
+            for page in iter_pages(scan, Segment=segment, TotalSegments=total_segments, **kwargs):
+                if not hand_over(page.get('Items', [])):
+                    return
+            hand_over(_SEGMENT_DONE)
+        except Exception as e:
+            hand_over(e)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scan-segment')
+    try:
+        for segment in range(total_segments):
+            executor.submit(bind_request_context(scan_segment), segment)
+
+        remaining = total_segments
+        while remaining:
+            entry = pages.get()
+            if entry is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(entry, Exception):
+                raise entry
+            else:
+                yield from entry
+    finally:
+        # Also reached when the caller abandons the generator early; segments
+        # still queued are dropped instead of each running one more Scan
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _backoff(attempt: int) -> None:
+    """Sleep with capped exponential backoff and full jitter"""
+    time.sleep(random.uniform(0, min(2.0, BATCH_BASE_DELAY * (2 ** attempt))))
+
+
+def _batch_get_chunk(dynamodb, table_name: str, keys: List[Dict[str, Any]],
+                     extra: Dict[str, Any]) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    request = {table_name: dict(extra, Keys=keys)}
+    attempt = 0
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        items.extend(response.get('Responses', {}).get(table_name, []))
+        request = response.get('UnprocessedKeys') or {}
+        if request:
+            if attempt >= BATCH_MAX_RETRIES:
+                raise RuntimeError(f"Gave up on {len(request[table_name]['Keys'])} unprocessed keys in {table_name}")
+            _backoff(attempt)
+            attempt += 1
+    return items
+
+
+def batch_get_items(dynamodb, table_name: str, keys: List[Dict[str, Any]],
+                    max_workers: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+    """Fetch many items with BatchGetItem: 100-key chunks, run concurrently,
+    UnprocessedKeys retried with backoff. Duplicate keys are collapsed and the
+    result order is not guaranteed, so callers should index by key."""
+    unique_keys = []
+    seen = set()
+    for key in keys:
+        marker = tuple(sorted(key.items()))
+        if marker not in seen:
+            seen.add(marker)
+            unique_keys.append(key)
+    if not unique_keys:
+        return []
+
+    chunks = [unique_keys[i:i + BATCH_GET_MAX_KEYS]
+              for i in range(0, len(unique_keys), BATCH_GET_MAX_KEYS)]
+    if len(chunks) == 1:
+        return _batch_get_chunk(dynamodb, table_name, chunks[0], kwargs)
+
+    workers = min(len(chunks), max_workers or BATCH_GET_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-get') as executor:
+        results = executor.map(bind_request_context(lambda chunk: _batch_get_chunk(dynamodb, table_name, chunk, kwargs)),
+                               chunks)
+        return [item for chunk_items in results for item in chunk_items]
+
+
+def _batch_write_chunk(dynamodb, table_name: str, requests: List[Dict[str, Any]]) -> int:
+    request = {table_name: requests}
+    attempt = 0
+    while request:
+        response = dynamodb.batch_write_item(RequestItems=request)
+        request = response.get('UnprocessedItems') or {}
+        if request:
+            if attempt >= BATCH_MAX_RETRIES:
+                raise RuntimeError(f"Gave up on {len(request[table_name])} unprocessed items in {table_name}")
+            _backoff(attempt)
+            attempt += 1
+    return attempt
+
+
+def batch_write_items(dynamodb, table_name: str, items: List[Dict[str, Any]],
+                      key_names: Optional[Tuple[str, ...]] = None) -> int:
+    """Put many items with BatchWriteItem: 25-item chunks, UnprocessedItems
+    retried with backoff. With `key_names`, items sharing a key are collapsed
+    (the last one wins), since one request may not name a key twice. Returns
+    how many retries were needed."""
+    if key_names:
+        items = list({tuple(item[name] for name in key_names): item for item in items}.values())
+    retries = 0
+    for start in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+        chunk = items[start:start + BATCH_WRITE_MAX_ITEMS]
+        retries += _batch_write_chunk(dynamodb, table_name, [{'PutRequest': {'Item': item}} for item in chunk])
+    return retries
+
+
+def index_unavailable(error: Exception) -> bool:
+    """True for the ValidationException a GSI gives before it exists or while it is backfilling"""
+    if not isinstance(error, ClientError):
+        return False
+    details = error.response.get('Error', {})
+    message = details.get('Message', '')
+    return details.get('Code') == 'ValidationException' and (
+        'specified index' in message or 'backfilling' in message)
+
+
+def fetch_page(operation: Callable[..., Dict[str, Any]], limit: int,
+               next_token: Optional[str] = None, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Read up to `limit` items starting at `next_token`; returns (items, next_token)"""
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    if next_token:
+        kwargs['ExclusiveStartKey'] = decode_token(next_token)
+
+    items: List[Dict[str, Any]] = []
+    last_key = None
+    # A single call can come back short (1 MB cap, filters), so keep reading
+    # until the page is full or the table is exhausted.
+    while len(items) < limit:
+        response = operation(Limit=limit - len(items), **kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        kwargs['ExclusiveStartKey'] = last_key
+
+    return items, encode_token(last_key) if last_key else None
+
+
+def fetch_filtered_page(operation: Callable[..., Dict[str, Any]], limit: int, key_names: Tuple[str, ...],
+                        max_reads: int, next_token: Optional[str] = None,
+                        **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """fetch_page for a request with a FilterExpression.
+
+    Limit would cap the items evaluated, not the items matched, so a
+    selective filter took one round trip per handful of rows. Each read here
+    is a full 1 MB page instead, and at most `max_reads` are made; a page
+    that comes back short of `limit` still carries a cursor when the budget
+    ran out first. Extra matches are trimmed and the cursor is built from
+    the last returned item's `key_names` (table and index keys).
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    if next_token:
+        kwargs['ExclusiveStartKey'] = decode_token(next_token)
+
+    items: List[Dict[str, Any]] = []
+    for _ in range(max(1, max_reads)):
+        response = operation(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if len(items) > limit or (len(items) == limit and last_key):
+            items = items[:limit]
+            return items, encode_token({name: items[-1][name] for name in key_names})
+        if not last_key:
+            return items, None
+        kwargs['ExclusiveStartKey'] = last_key
+    return items, encode_token(last_key)
+
+
+def parse_page_request(body: Dict[str, Any]) -> Optional[Tuple[int, Optional[str]]]:
+    """Pull (limit, nextToken) out of a request body; None means no paging requested"""
+    limit = body.get('limit')
+    next_token = body.get('nextToken')
+    if limit is None and not next_token:
+        return None
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return limit, next_token
+
+
+def _encode_key_value(value: Any) -> Any:
+    # int/float come from callers that build keys by hand
+    if isinstance(value, (Decimal, int, float)) and not isinstance(value, bool):
+        return {'N': str(value)}
+    return {'S': value}
+
+
+def _decode_key_value(value: Dict[str, str]) -> Any:
+    if 'N' in value:
+        return Decimal(value['N'])
+    return value['S']
+
+
+def encode_token(last_key: Dict[str, Any]) -> str:
+    """Turn a LastEvaluatedKey into an opaque, URL-safe cursor"""
+    payload = {name: _encode_key_value(value) for name, value in last_key.items()}
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Inverse of encode_token; raises ValueError for anything malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return {name: _decode_key_value(value) for name, value in payload.items()}
+    except Exception:
+        raise ValueError("Invalid nextToken")
@@ -0,0 +1,37 @@
+# dynamodb_config.py
+import os
+
+from botocore.config import Config
+
+# Defaults are tuned for a 30 s Lambda: fail fast on a bad connection and let
+# the retry policy try again, rather than waiting out botocore's 60 s read.
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_READ_TIMEOUT = 5.0
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_RETRY_MODE = 'adaptive'
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def build_dynamodb_config() -> Config:
+    """botocore Config shared by every DynamoDB resource/client we create.
+
+    Each setting can be overridden with a DYNAMODB_* environment variable.
+    """
+    return Config(
+        # Parallel scans and batch gets each hold a connection per worker
+        max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS)),
+        connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+        tcp_keepalive=_env_bool('DYNAMODB_TCP_KEEPALIVE', True),
+        retries={
+            'mode': os.environ.get('DYNAMODB_RETRY_MODE', DEFAULT_RETRY_MODE),
+            'max_attempts': int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+        },
+    )
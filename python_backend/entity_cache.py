@@ -0,0 +1,111 @@
+# entity_cache.py
+# Read-through cache for the point lookups of rarely changing entities
+# (Agent, Office, Client). Found items live for their entity's TTL and misses
+# for a shorter negative TTL, so a bad id does not cost a GetItem per request.
+# EntityCache holds the read-through logic and counters; the storage behind it
+# is a backend with get/set/delete, so a shared cache can replace the
+# in-process LRU without touching the services.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Seconds a found item is served from the cache; 0 turns caching off for that entity
+ENTITY_CACHE_TTL_SECONDS = {
+    'Agent': float(os.environ.get('AGENT_CACHE_TTL_SECONDS', '300')),
+    'Office': float(os.environ.get('OFFICE_CACHE_TTL_SECONDS', '900')),
+    'Client': float(os.environ.get('CLIENT_CACHE_TTL_SECONDS', '60')),
+}
+# Seconds a "no such item" answer is remembered
+NEGATIVE_CACHE_TTL_SECONDS = float(os.environ.get('NEGATIVE_CACHE_TTL_SECONDS', '30'))
+ENTITY_CACHE_MAX_ITEMS = int(os.environ.get('ENTITY_CACHE_MAX_ITEMS', '10000'))
+
+
+class InMemoryCacheBackend:
+    """Size-bounded LRU with a deadline per entry, private to one container"""
+
+    def __init__(self, max_items: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_items = ENTITY_CACHE_MAX_ITEMS if max_items is None else max_items
+        self.evictions = 0
+        self._clock = clock
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(found, value); expired entries count as not found"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EntityCache:
+    """Read-through lookups by (entity, key) with per-entity TTLs and hit/miss counters"""
+
+    def __init__(self, backend=None, ttls: Optional[Dict[str, float]] = None,
+                 negative_ttl: Optional[float] = None):
+        self.backend = backend if backend is not None else InMemoryCacheBackend()
+        self.ttls = dict(ENTITY_CACHE_TTL_SECONDS, **(ttls or {}))
+        self.negative_ttl = NEGATIVE_CACHE_TTL_SECONDS if negative_ttl is None else negative_ttl
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, entity: str, counter: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(entity, {'hits': 0, 'negativeHits': 0, 'misses': 0})
+            counters[counter] += 1
+
+    def get(self, entity: str, key: str, load: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """The cached item, or `load()`'s result (None for no item), which is then cached.
+
+        Cached items are shared between callers and must not be modified.
+        """
+        ttl = self.ttls.get(entity, 0)
+        if ttl <= 0:
+            return load()
+        cache_key = f"{entity}#{key}"
+        found, item = self.backend.get(cache_key)
+        if found:
+            self._count(entity, 'hits' if item is not None else 'negativeHits')
+            return item
+        self._count(entity, 'misses')
+        item = load()
+        if item is not None:
+            self.backend.set(cache_key, item, ttl)
+        elif self.negative_ttl > 0:
+            self.backend.set(cache_key, None, min(self.negative_ttl, ttl))
+        return item
+
+    def invalidate(self, entity: str, key: str) -> None:
+        """Forget an entity after writing it, so the next read goes to the table"""
+        self.backend.delete(f"{entity}#{key}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {entity: dict(values) for entity, values in self._counters.items()}
+        return {
+            'entities': counters,
+            'size': len(self.backend) if hasattr(self.backend, '__len__') else None,
+            'evictions': getattr(self.backend, 'evictions', None),
+        }
@@ -0,0 +1,161 @@
+# fast_dynamodb.py
+from types import SimpleNamespace
+from typing import Any, Dict
+
+import boto3
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+
+from dynamodb_config import build_dynamodb_config
+from item_codec import decoder_for, encode_item, encode_value, build_decoder
+
+# Condition arguments that may be given as boto3 Key()/Attr() objects
+_CONDITION_ARGS = (
+    ('KeyConditionExpression', True),
+    ('FilterExpression', False),
+    ('ConditionExpression', False),
+)
+
+_decode_generic = build_decoder()
+
+
+def _encode_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Build condition strings and encode keys, items and values of one request, in place"""
+    builder = None
+    for arg, is_key_condition in _CONDITION_ARGS:
+        condition = request.get(arg)
+        if isinstance(condition, ConditionBase):
+            builder = builder or ConditionExpressionBuilder()
+            built = builder.build_expression(condition, is_key_condition=is_key_condition)
+            request[arg] = built.condition_expression
+            request['ExpressionAttributeNames'] = dict(
+                request.get('ExpressionAttributeNames', {}), **built.attribute_name_placeholders)
+            request['ExpressionAttributeValues'] = dict(
+                request.get('ExpressionAttributeValues', {}), **built.attribute_value_placeholders)
+    if 'ExpressionAttributeValues' in request:
+        request['ExpressionAttributeValues'] = {
+            name: encode_value(value) for name, value in request['ExpressionAttributeValues'].items()
+        }
+    for arg in ('Key', 'Item', 'ExclusiveStartKey'):
+        if arg in request:
+            request[arg] = encode_item(request[arg])
+    return request
+
+
+def _encode_write_request(entry: Dict[str, Any]) -> Dict[str, Any]:
+    if 'PutRequest' in entry:
+        return {'PutRequest': {'Item': encode_item(entry['PutRequest']['Item'])}}
+    return {'DeleteRequest': {'Key': encode_item(entry['DeleteRequest']['Key'])}}
+
+
+def _decode_write_request(entry: Dict[str, Any]) -> Dict[str, Any]:
+    if 'PutRequest' in entry:
+        return {'PutRequest': {'Item': _decode_generic(entry['PutRequest']['Item'])}}
+    return {'DeleteRequest': {'Key': _decode_generic(entry['DeleteRequest']['Key'])}}
+
+
+class FastTable:
+    """Drop-in for the boto3 Table calls the services make, on the low-level client.
+
+    Requests take and responses return plain Python values, like the resource
+    layer, but items are converted with item_codec instead of
+    TypeSerializer/TypeDeserializer.
+    """
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self._decode = decoder_for(name)
+
+    def _request(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return _encode_request(dict(kwargs, TableName=self.name))
+
+    def _response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        if 'Items' in response:
+            decode = self._decode
+            response['Items'] = [decode(item) for item in response['Items']]
+        if 'Item' in response:
+            response['Item'] = self._decode(response['Item'])
+        if 'Attributes' in response:
+            response['Attributes'] = self._decode(response['Attributes'])
+        if 'LastEvaluatedKey' in response:
+            response['LastEvaluatedKey'] = _decode_generic(response['LastEvaluatedKey'])
+        return response
+
+    def scan(self, **kwargs) -> Dict[str, Any]:
+        return self._response(self.client.scan(**self._request(kwargs)))
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        return self._response(self.client.query(**self._request(kwargs)))
+
+    def get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._response(self.client.get_item(**self._request(kwargs)))
+
+    def put_item(self, **kwargs) -> Dict[str, Any]:
+        return self._response(self.client.put_item(**self._request(kwargs)))
+
+    def update_item(self, **kwargs) -> Dict[str, Any]:
+        return self._response(self.client.update_item(**self._request(kwargs)))
+
+    def delete_item(self, **kwargs) -> Dict[str, Any]:
+        return self._response(self.client.delete_item(**self._request(kwargs)))
+
+
+class FastClient:
+    """meta.client of FastDynamoResource: like the resource layer's own client,
+    it takes plain Python values in transactions; everything else is passed
+    straight to the low-level client."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def transact_write_items(self, TransactItems, **kwargs) -> Dict[str, Any]:
+        encoded = [
+            {action: _encode_request(dict(request)) for action, request in entry.items()}
+            for entry in TransactItems
+        ]
+        return self._client.transact_write_items(TransactItems=encoded, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class FastDynamoResource:
+    """Stands in for boto3.resource('dynamodb') wherever the services take one"""
+
+    def __init__(self, client=None):
+        self.client = client or boto3.client('dynamodb', config=build_dynamodb_config())
+        # Services reach the client (exceptions, transactions) through meta.client
+        self.meta = SimpleNamespace(client=FastClient(self.client))
+
+    def Table(self, name: str) -> FastTable:
+        return FastTable(self.client, name)
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        request = {
+            table_name: dict(spec, Keys=[encode_item(key) for key in spec['Keys']])
+            for table_name, spec in RequestItems.items()
+        }
+        response = self.client.batch_get_item(RequestItems=request, **kwargs)
+        response['Responses'] = {
+            table_name: [decoder_for(table_name)(item) for item in items]
+            for table_name, items in response.get('Responses', {}).items()
+        }
+        # Decoded again so callers can pass them straight back in
+        response['UnprocessedKeys'] = {
+            table_name: dict(spec, Keys=[_decode_generic(key) for key in spec['Keys']])
+            for table_name, spec in (response.get('UnprocessedKeys') or {}).items()
+        }
+        return response
+
+    def batch_write_item(self, RequestItems: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        request = {
+            table_name: [_encode_write_request(entry) for entry in entries]
+            for table_name, entries in RequestItems.items()
+        }
+        response = self.client.batch_write_item(RequestItems=request, **kwargs)
+        # Decoded so callers can pass them straight back in
+        response['UnprocessedItems'] = {
+            table_name: [_decode_write_request(entry) for entry in entries]
+            for table_name, entries in (response.get('UnprocessedItems') or {}).items()
+        }
+        return response
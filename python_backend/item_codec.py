@@ -0,0 +1,173 @@
+# item_codec.py
+# Converts DynamoDB wire-format items to plain Python values and back. The
+# tables have a fixed shape, so attributes of a known type skip the generic
+# dispatch, and numbers come back as int or float instead of Decimal
+# whenever that keeps the stored text exactly (so '2' is 2 and '1.5' is 1.5,
+# but '180000.00' stays a Decimal). Whether numbers reach the API as JSON
+# strings or numbers is decided by responses.to_json, not here.
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+
+# Attribute types per table, from template.yaml and the models; unlisted
+# attributes are strings or are decoded generically
+_STRING = 'S'
+_NUMBER = 'N'
+
+TABLE_SHAPES: Dict[str, Dict[str, str]] = {
+    'Property': {
+        'propertyId': _STRING, 'agentId': _STRING, 'propertyType': _STRING,
+        'street': _STRING, 'city': _STRING, 'state': _STRING, 'zipcode': _STRING,
+        'listPrice': _NUMBER, 'numBedrooms': _NUMBER, 'numBathrooms': _NUMBER,
+        'squareFootage': _NUMBER, 'description': _STRING, 'listingDate': _STRING,
+        'status': _STRING, 'imageUrl': _STRING, 'updatedAt': _STRING,
+    },
+    'Agent': {
+        'agentId': _STRING, 'officeId': _STRING, 'firstName': _STRING,
+        'lastName': _STRING, 'email': _STRING, 'phone': _STRING,
+        'licenseNumber': _STRING, 'dateHired': _STRING,
+    },
+    'Client': {
+        'clientId': _STRING, 'firstName': _STRING, 'lastName': _STRING,
+        'email': _STRING, 'phone': _STRING, 'street': _STRING, 'city': _STRING,
+        'state': _STRING, 'zipcode': _STRING,
+    },
+    'Appointment': {
+        'appointmentId': _STRING, 'agentId': _STRING, 'clientId': _STRING,
+        'propertyId': _STRING, 'appointmentDate': _STRING, 'appointmentTime': _STRING,
+        'purpose': _STRING, 'updatedAt': _STRING,
+    },
+    'Transaction': {
+        'transactionId': _STRING, 'propertyId': _STRING, 'agentId': _STRING,
+        'clientId': _STRING, 'dateSent': _STRING, 'amount': _NUMBER,
+        'transactionType': _STRING, 'timestamp': _STRING, 'updatedAt': _STRING,
+    },
+    'ClientAgent': {
+        'id': _STRING, 'clientId': _STRING, 'agentId': _STRING,
+        'relationshipDate': _STRING, 'status': _STRING, 'updatedAt': _STRING,
+    },
+    'Office': {
+        'officeId': _STRING, 'street': _STRING, 'city': _STRING,
+        'zipcode': _STRING, 'phone': _STRING,
+    },
+}
+
+def decode_number(text: str) -> Any:
+    """int or float when str()/repr() gives back `text`, Decimal otherwise"""
+    if '.' not in text and 'e' not in text and 'E' not in text:
+        number = int(text)
+        # '007' and '-0' would not survive the round trip
+        if str(number) == text:
+            return number
+        return Decimal(text)
+    # A trailing zero after the point ('180000.10') never survives repr()
+    if text[-1] == '0':
+        return Decimal(text)
+    number = float(text)
+    if repr(number) == text:
+        return number
+    return Decimal(text)
+
+
+def _decode_string(value: Dict[str, Any]) -> Any:
+    return value['S']
+
+
+def _decode_number(value: Dict[str, Any]) -> Any:
+    return decode_number(value['N'])
+
+
+_FAST_DECODERS = {_STRING: _decode_string, _NUMBER: _decode_number}
+
+
+def decode_value(value: Dict[str, Any]) -> Any:
+    """Generic wire value -> Python value"""
+    (tag, raw), = value.items()
+    if tag == 'S':
+        return raw
+    if tag == 'N':
+        return decode_number(raw)
+    if tag == 'BOOL':
+        return raw
+    if tag == 'NULL':
+        return None
+    if tag == 'M':
+        return {name: decode_value(member) for name, member in raw.items()}
+    if tag == 'L':
+        return [decode_value(member) for member in raw]
+    if tag == 'SS':
+        return set(raw)
+    if tag == 'NS':
+        return {decode_number(member) for member in raw}
+    if tag == 'B':
+        return raw
+    if tag == 'BS':
+        return set(raw)
+    raise TypeError(f"Unsupported DynamoDB type: {tag}")
+
+
+def encode_value(value: Any) -> Dict[str, Any]:
+    """Python value -> wire value (accepts int, float and Decimal for numbers)"""
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        return {'N': repr(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': {name: encode_value(member) for name, member in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(member) for member in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(member, str) for member in value):
+            return {'SS': list(value)}
+        if all(isinstance(member, (bytes, bytearray)) for member in value):
+            return {'BS': [bytes(member) for member in value]}
+        return {'NS': [encode_value(member)['N'] for member in value]}
+    raise TypeError(f"Unsupported type for DynamoDB: {type(value).__name__}")
+
+
+def encode_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: encode_value(value) for name, value in item.items()}
+
+
+def table_shape_name(table_name: str) -> str:
+    """'dev-Property' -> 'Property'"""
+    return table_name.rsplit('-', 1)[-1]
+
+
+def build_decoder(shape: Optional[Dict[str, str]] = None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Item decoder specialised for one table shape"""
+    decoders = {name: _FAST_DECODERS[kind] for name, kind in (shape or {}).items()}
+
+    def decode_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        decoded = {}
+        for name, value in item.items():
+            fast = decoders.get(name)
+            if fast is not None:
+                try:
+                    decoded[name] = fast(value)
+                    continue
+                except KeyError:
+                    # Stored with another type than the shape expects
+                    pass
+            decoded[name] = decode_value(value)
+        return decoded
+
+    return decode_item
+
+
+_decoders: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+
+
+def decoder_for(table_name: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Cached decoder for a (prefixed) table name"""
+    decoder = _decoders.get(table_name)
+    if decoder is None:
+        decoder = _decoders[table_name] = build_decoder(TABLE_SHAPES.get(table_shape_name(table_name)))
+    return decoder
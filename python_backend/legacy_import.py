@@ -0,0 +1,502 @@
+# legacy_import.py
+# Moves the Spring Boot backend's H2 data (schema.sql + data.sql dumps) into
+# the DynamoDB tables. INSERT statements are parsed as a stream, each row is
+# mapped onto the item shape of models.py / client_models.py / agent.py, and
+# writer threads put the items with BatchWriteItem. A bounded queue between
+# the parser and the writers provides backpressure, and a checkpoint file
+# records how many rows are safely written so an interrupted run can resume.
+#
+#   cd python_backend && python -m legacy_import --schema ../backend4402/src/main/resources/schema.sql \
+#       --data ../backend4402/src/main/resources/data.sql [--workers 16] [--checkpoint import.ckpt]
+#
+# Tables come from get_dynamodb_resource(), so DYNAMODB_BACKEND=memory
+# imports into the local stand-in.
+import argparse
+import json
+import os
+import queue
+import re
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from agent import Agent
+from aws_resources import get_dynamodb_resource
+from client_models import Appointment, Client, ClientAgent
+from dynamo_utils import BATCH_WRITE_MAX_ITEMS, batch_write_items, utc_timestamp
+from models import Office, Property, Transaction
+from property_catalog import catalog_shard
+from structured_logging import get_logger
+
+logger = get_logger('legacy_import')
+
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', '16'))
+# Rows parsed ahead of the writers; the parser blocks once this many are waiting
+IMPORT_QUEUE_SIZE = int(os.environ.get('IMPORT_QUEUE_SIZE', '20000'))
+CHECKPOINT_SECONDS = 5.0
+# A writer with a part-filled batch flushes it after waiting this long for more
+_IDLE_FLUSH_SECONDS = 0.5
+_READ_CHUNK = 1 << 20
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+|--[^\n]*\n|/\*.*?\*/)
+  | (?P<string>'(?:''|[^'])*'(?!'))
+  | (?P<quoted>"(?:""|[^"])*"(?!"))
+  | (?P<number>[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<punct>[(),;.])
+""", re.S | re.X)
+
+_INTEGER_TYPES = frozenset({'INT', 'INTEGER', 'BIGINT', 'SMALLINT', 'TINYINT'})
+_DECIMAL_TYPES = frozenset({'DECIMAL', 'NUMERIC', 'NUMBER', 'DOUBLE', 'REAL', 'FLOAT'})
+# DATE '2024-01-01' and friends are read as their text
+_TYPED_LITERALS = frozenset({'DATE', 'TIME', 'TIMESTAMP'})
+
+
+def _tokens(stream: TextIO) -> Iterator[Tuple[str, str]]:
+    """(kind, text) tokens of SQL text, read in chunks so dumps of any size fit in memory"""
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        match = _TOKEN.match(buffer, position)
+        # A token that runs to the end of the buffer may continue in the next chunk
+        if (match is None or match.end() == len(buffer)) and not eof:
+            chunk = stream.read(_READ_CHUNK)
+            buffer = buffer[position:] + chunk
+            position = 0
+            eof = not chunk
+            continue
+        if match is None:
+            if position >= len(buffer):
+                return
+            if buffer[position:].startswith('--'):
+                return
+            raise ValueError(f"Unexpected SQL near: {buffer[position:position + 40]!r}")
+        position = match.end()
+        if match.lastgroup != 'space':
+            yield match.lastgroup, match.group()
+
+
+class _SqlReader:
+    def __init__(self, stream: TextIO):
+        self._tokens = _tokens(stream)
+        self._peeked: Optional[Tuple[str, str]] = None
+
+    def next(self) -> Optional[Tuple[str, str]]:
+        if self._peeked is not None:
+            token, self._peeked = self._peeked, None
+            return token
+        return next(self._tokens, None)
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        if self._peeked is None:
+            self._peeked = next(self._tokens, None)
+        return self._peeked
+
+    def expect(self, text: str) -> None:
+        token = self.next()
+        if token is None or token[1].upper() != text:
+            raise ValueError(f"Expected {text}, got {token[1] if token else 'end of file'}")
+
+    def skip_statement(self) -> None:
+        while True:
+            token = self.next()
+            if token is None or token[1] == ';':
+                return
+
+    def identifier(self) -> str:
+        """A possibly schema-qualified, possibly quoted name; only the last part is kept"""
+        kind, text = self.next()
+        name = text[1:-1].replace('""', '"') if kind == 'quoted' else text
+        while self.peek() == ('punct', '.'):
+            self.next()
+            name = self.identifier()
+        return name.upper()
+
+    def names(self) -> List[str]:
+        self.expect('(')
+        names = []
+        while True:
+            names.append(self.identifier())
+            token = self.next()
+            if token[1] == ')':
+                return names
+            if token[1] != ',':
+                raise ValueError(f"Expected , or ) in column list, got {token[1]}")
+
+    def value(self) -> Any:
+        kind, text = self.next()
+        if kind == 'string':
+            return text[1:-1].replace("''", "'")
+        if kind == 'number':
+            return Decimal(text)
+        if kind == 'word':
+            word = text.upper()
+            if word == 'NULL' or word == 'DEFAULT':
+                return None
+            if word in ('TRUE', 'FALSE'):
+                return word == 'TRUE'
+            if word in _TYPED_LITERALS and self.peek() and self.peek()[0] == 'string':
+                return self.value()
+        raise ValueError(f"Unsupported SQL value: {text}")
+
+    def row(self) -> List[Any]:
+        self.expect('(')
+        values = []
+        while True:
+            values.append(self.value())
+            token = self.next()
+            if token[1] == ')':
+                return values
+            if token[1] != ',':
+                raise ValueError(f"Expected , or ) in VALUES, got {token[1]}")
+
+
+def read_schema(stream: TextIO) -> Dict[str, Dict[str, Any]]:
+    """Columns, types and the AUTO_INCREMENT column of each CREATE TABLE"""
+    reader = _SqlReader(stream)
+    tables = {}
+    while reader.peek() is not None:
+        if reader.next()[1].upper() != 'CREATE' or (reader.peek() or ('', ''))[1].upper() != 'TABLE':
+            reader.skip_statement()
+            continue
+        reader.next()
+        if (reader.peek() or ('', ''))[1].upper() == 'IF':
+            for word in ('IF', 'NOT', 'EXISTS'):
+                reader.expect(word)
+        name = reader.identifier()
+        reader.expect('(')
+        columns: List[Tuple[str, str]] = []
+        auto_increment = None
+        definition: List[Tuple[str, str]] = []
+        depth = 0
+        while True:
+            token = reader.next()
+            if token is None:
+                raise ValueError(f"Unterminated CREATE TABLE {name}")
+            if token[1] == '(':
+                depth += 1
+            elif token[1] == ')' and depth:
+                depth -= 1
+            elif token[1] in (',', ')') and depth == 0:
+                words = [text.upper() for _, text in definition]
+                if words and words[0] not in ('CONSTRAINT', 'PRIMARY', 'FOREIGN', 'UNIQUE', 'CHECK', 'INDEX', 'KEY'):
+                    column = definition[0][1][1:-1] if definition[0][0] == 'quoted' else definition[0][1]
+                    columns.append((column.upper(), words[1] if len(words) > 1 else ''))
+                    if 'AUTO_INCREMENT' in words or 'IDENTITY' in words:
+                        auto_increment = column.upper()
+                definition = []
+                if token[1] == ')':
+                    break
+                continue
+            definition.append(token)
+        reader.skip_statement()
+        tables[name] = {'columns': columns, 'auto_increment': auto_increment}
+    return tables
+
+
+def read_rows(stream: TextIO, schema: Dict[str, Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(table, {COLUMN: value}) for every row of every INSERT, with AUTO_INCREMENT ids filled in as H2 would"""
+    reader = _SqlReader(stream)
+    next_ids: Dict[str, int] = {}
+    while reader.peek() is not None:
+        if reader.next()[1].upper() != 'INSERT':
+            reader.skip_statement()
+            continue
+        reader.expect('INTO')
+        table = reader.identifier()
+        spec = schema.get(table)
+        if spec is None:
+            raise ValueError(f"INSERT into {table}, which schema.sql does not define")
+        types = dict(spec['columns'])
+        columns = reader.names() if reader.peek() == ('punct', '(') else [name for name, _ in spec['columns']]
+        reader.expect('VALUES')
+        auto = spec['auto_increment']
+        while True:
+            values = reader.row()
+            if len(values) != len(columns):
+                raise ValueError(f"{table}: {len(values)} values for {len(columns)} columns")
+            row = {}
+            for column, value in zip(columns, values):
+                column_type = types.get(column, '')
+                if isinstance(value, Decimal) and column_type in _INTEGER_TYPES:
+                    value = int(value)
+                elif isinstance(value, str) and value and column_type in _INTEGER_TYPES:
+                    value = int(value)
+                elif isinstance(value, str) and value and column_type in _DECIMAL_TYPES:
+                    value = Decimal(value)
+                row[column] = value
+            if auto:
+                if row.get(auto) is None:
+                    row[auto] = next_ids.get(table, 1)
+                next_ids[table] = max(next_ids.get(table, 1), row[auto] + 1)
+            yield table, row
+            token = reader.next()
+            if token is None or token[1] == ';':
+                break
+            if token[1] != ',':
+                raise ValueError(f"Expected , or ; after a row of {table}, got {token[1]}")
+
+
+def _id(value: Any) -> Optional[str]:
+    # H2 ids are integers; every DynamoDB key in template.yaml is a string
+    return None if value is None else str(value)
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _client(row, updated_at):
+    return Client(
+        client_id=_id(row['CLIENT_ID']), first_name=row.get('FIRST_NAME'), last_name=row.get('LAST_NAME'),
+        email=row.get('EMAIL'), phone=row.get('PHONE'), street=row.get('STREET'), city=row.get('CITY'),
+        state=row.get('STATE'), zipcode=row.get('ZIPCODE'),
+    ).to_dict()
+
+
+def _office(row, updated_at):
+    return Office(
+        office_id=_id(row['OFFICE_ID']), office_name=row.get('OFFICE_NAME'), street=row.get('STREET'),
+        city=row.get('CITY'), state=row.get('STATE'), zipcode=row.get('ZIPCODE'), phone=row.get('PHONE'),
+    ).to_dict()
+
+
+def _agent(row, updated_at):
+    return Agent(
+        agent_id=_id(row['AGENT_ID']), office_id=_id(row.get('OFFICE_ID')), first_name=row.get('FIRST_NAME'),
+        last_name=row.get('LAST_NAME'), email=row.get('EMAIL'), phone=row.get('PHONE'),
+        license_number=row.get('LICENSE_NUMBER'), date_hired=_text(row.get('DATE_HIRED')),
+    ).to_dict()
+
+
+def _property(row, updated_at):
+    property_id = _id(row['PROPERTY_ID'])
+    return dict(Property(
+        property_id=property_id, agent_id=_id(row.get('AGENT_ID')),
+        property_type=row.get('PROPERTY_TYPE'), street=row.get('STREET'), city=row.get('CITY'),
+        state=row.get('STATE'), zipcode=row.get('ZIPCODE'), list_price=row.get('LIST_PRICE'),
+        num_bedrooms=row.get('NUM_BEDROOMS'), num_bathrooms=row.get('NUM_BATHROOMS'),
+        square_footage=row.get('SQUARE_FOOTAGE'), description=row.get('DESCRIPTION'),
+        listing_date=_text(row.get('LISTING_DATE')), status=row.get('STATUS'), image_url=row.get('IMAGE_URL'),
+    ).to_dict(), catalog=catalog_shard(property_id), updatedAt=updated_at)
+
+
+def _transaction(row, updated_at):
+    return dict(Transaction(
+        transaction_id=_id(row['TRANSACTION_ID']), property_id=_id(row.get('PROPERTY_ID')),
+        agent_id=_id(row.get('AGENT_ID')), client_id=_id(row.get('CLIENT_ID')),
+        date_sent=_text(row.get('DATE_SENT')), amount=row.get('AMOUNT'), transaction_type=row.get('TYPE'),
+    ).to_dict(), updatedAt=updated_at)
+
+
+def _appointment(row, updated_at):
+    return dict(Appointment(
+        appointment_id=_id(row['APPOINTMENT_ID']), client_id=_id(row.get('CLIENT_ID')),
+        agent_id=_id(row.get('AGENT_ID')), property_id=_id(row.get('PROPERTY_ID')),
+        appointment_date=_text(row.get('APPT_DATE')), appointment_time=_text(row.get('APPT_TIME')),
+        purpose=row.get('PURPOSE'),
+    ).to_dict(), updatedAt=updated_at)
+
+
+def _client_agent(row, updated_at):
+    client_id, agent_id = _id(row['CLIENT_ID']), _id(row['AGENT_ID'])
+    # H2 has no relationship date; the import time stands in for it
+    return dict(ClientAgent(
+        id=ClientAgent.generate_id(client_id, agent_id), client_id=client_id, agent_id=agent_id,
+        relationship_date=updated_at,
+    ).to_dict(), updatedAt=updated_at)
+
+
+# H2 table -> (DynamoDB table without prefix, its key attributes, row -> item)
+TABLE_MAPPINGS: Dict[str, Tuple[str, Tuple[str, ...], Callable[[Dict[str, Any], str], Dict[str, Any]]]] = {
+    'CLIENT': ('Client', ('clientId',), _client),
+    'OFFICE': ('Office', ('officeId',), _office),
+    'AGENT': ('Agent', ('agentId',), _agent),
+    'PROPERTY': ('Property', ('propertyId',), _property),
+    'TRANSACTION': ('Transaction', ('transactionId',), _transaction),
+    'APPOINTMENT': ('Appointment', ('appointmentId',), _appointment),
+    'CLIENT_AGENT': ('ClientAgent', ('id',), _client_agent),
+}
+
+
+def to_item(table: str, row: Dict[str, Any], updated_at: str) -> Tuple[str, Dict[str, Any]]:
+    """(DynamoDB table, item) for an H2 row; NULL columns are left out, as a GSI key may not be NULL"""
+    target, _, mapper = TABLE_MAPPINGS[table]
+    return target, {name: value for name, value in mapper(row, updated_at).items() if value is not None}
+
+
+class _Progress:
+    """Rows are numbered in file order; `rows` is how many leading rows are all written"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def mark(self, numbers: List[int]) -> None:
+        with self._lock:
+            self._done.update(numbers)
+            while self.rows in self._done:
+                self._done.remove(self.rows)
+                self.rows += 1
+
+
+class Checkpoint:
+    """How far an import got, in a JSON file replaced atomically"""
+
+    def __init__(self, path: Optional[str], data_path: str):
+        self.path = path
+        self.source = {'data': os.path.abspath(data_path), 'size': os.path.getsize(data_path)}
+
+    def load(self) -> int:
+        """Rows already written by an earlier run of the same dump, or 0"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as f:
+            saved = json.load(f)
+        if {name: saved.get(name) for name in self.source} != self.source:
+            raise ValueError(f"Checkpoint {self.path} belongs to another dump; remove it to start over")
+        return saved['rows']
+
+    def save(self, rows: int) -> None:
+        if not self.path:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(dict(self.source, rows=rows, savedAt=utc_timestamp()), f)
+        os.replace(temporary, self.path)
+
+
+class LegacyImporter:
+    """Parses an H2 dump and writes its rows with `workers` BatchWriteItem threads"""
+
+    def __init__(self, dynamodb_resource=None, table_prefix: str = 'dev-', workers: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        self.dynamodb = dynamodb_resource or get_dynamodb_resource()
+        self.table_prefix = table_prefix
+        self.workers = workers or IMPORT_WORKERS
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size or IMPORT_QUEUE_SIZE)
+        self._progress = _Progress(0)
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self.items: Dict[str, int] = {}
+        self.retries = 0
+
+    def _flush(self, table: str, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        key_names = next(keys for target, keys, _ in TABLE_MAPPINGS.values() if target == table)
+        retries = batch_write_items(self.dynamodb, f"{self.table_prefix}{table}",
+                                    [item for _, item in batch], key_names)
+        self._progress.mark([number for number, _ in batch])
+        with self._lock:
+            self.items[table] = self.items.get(table, 0) + len(batch)
+            self.retries += retries
+
+    def _writer(self) -> None:
+        batches: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        try:
+            while True:
+                try:
+                    entry = self._queue.get(timeout=_IDLE_FLUSH_SECONDS)
+                except queue.Empty:
+                    for table in list(batches):
+                        self._flush(table, batches.pop(table))
+                    continue
+                if entry is None:
+                    for table, batch in batches.items():
+                        self._flush(table, batch)
+                    return
+                table, number, item = entry
+                batch = batches.setdefault(table, [])
+                batch.append((number, item))
+                if len(batch) >= BATCH_WRITE_MAX_ITEMS:
+                    self._flush(table, batches.pop(table))
+        except BaseException as e:
+            self._error = self._error or e
+            # Keep draining so the parser never blocks on a full queue
+            while self._queue.get() is not None:
+                pass
+
+    def _put(self, entry) -> None:
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._queue.put(entry, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def run(self, schema_path: str, data_path: str, checkpoint_path: Optional[str] = None) -> Dict[str, Any]:
+        """Import the dump; resumes after the rows a checkpoint says are written"""
+        with open(schema_path, encoding='utf-8') as f:
+            schema = read_schema(f)
+        checkpoint = Checkpoint(checkpoint_path, data_path)
+        resume_from = checkpoint.load()
+        self._progress = _Progress(resume_from)
+        updated_at = utc_timestamp()
+        started = time.monotonic()
+        last_save = started
+        rows = 0
+
+        threads = [threading.Thread(target=self._writer, name=f"import-writer-{n}", daemon=True)
+                   for n in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            with open(data_path, encoding='utf-8') as f:
+                for number, (table, row) in enumerate(read_rows(f, schema)):
+                    rows = number + 1
+                    if number < resume_from:
+                        # Parsed anyway, so AUTO_INCREMENT ids come out the same
+                        continue
+                    if table not in TABLE_MAPPINGS:
+                        self._progress.mark([number])
+                        continue
+                    target, item = to_item(table, row, updated_at)
+                    self._put((target, number, item))
+                    now = time.monotonic()
+                    if now - last_save >= CHECKPOINT_SECONDS:
+                        checkpoint.save(self._progress.rows)
+                        last_save = now
+                        logger.info('Imported %s rows', self._progress.rows,
+                                    extra={'fields': {'parsed': rows, 'queued': self._queue.qsize()}})
+        finally:
+            for _ in threads:
+                self._queue.put(None)
+            for thread in threads:
+                thread.join()
+            checkpoint.save(self._progress.rows)
+        if self._error is not None:
+            raise self._error
+
+        elapsed = time.monotonic() - started
+        written = sum(self.items.values())
+        return {
+            'rows': rows,
+            'resumedAfter': resume_from,
+            'items': dict(self.items),
+            'retries': self.retries,
+            'seconds': round(elapsed, 3),
+            'rowsPerHour': round(written / elapsed * 3600) if elapsed else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import the H2 schema.sql/data.sql dump into DynamoDB')
+    parser.add_argument('--schema', required=True)
+    parser.add_argument('--data', required=True)
+    parser.add_argument('--table-prefix', default='dev-')
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS)
+    parser.add_argument('--queue-size', type=int, default=IMPORT_QUEUE_SIZE)
+    parser.add_argument('--checkpoint', help='resume from / record progress in this file')
+    args = parser.parse_args()
+
+    importer = LegacyImporter(table_prefix=args.table_prefix, workers=args.workers, queue_size=args.queue_size)
+    print(json.dumps(importer.run(args.schema, args.data, args.checkpoint), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1327 @@
+# memory_dynamodb.py
+# In-process stand-in for boto3.resource('dynamodb') for local runs, load
+# tests and benchmarks. It covers the calls the services make: item reads
+# and writes, Query on the GSIs declared in template.yaml, segmented Scan,
+# BatchGetItem, BatchWriteItem (and Table.batch_writer), TransactWriteItems
+# and DescribeTable. Reads page at 1 MB like DynamoDB. Items live in dicts,
+# or in a SQLite file when a path is given, which keeps multi-million-item
+# datasets out of the heap.
+import bisect
+import math
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections.abc import Mapping
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.table import BatchWriter
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError, ParamValidationError
+
+from dynamo_expressions import (MISSING, ExpressionError, apply_update, evaluate, key_condition,
+                                parse_condition, parse_projection, parse_update, project, type_code)
+
+# Key schemas, GSIs and projections from template.yaml, by table name
+# without the environment prefix
+TABLE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'Agent': {
+        'attributes': {'agentId': 'S', 'officeId': 'S'},
+        'key': ('agentId', None),
+        'indexes': {'office-index': ('officeId', None, 'ALL')},
+    },
+    'Property': {
+        'attributes': {'propertyId': 'S', 'agentId': 'S', 'status': 'S', 'city': 'S',
+                       'zipcode': 'S', 'propertyType': 'S', 'listPrice': 'N', 'catalog': 'S',
+                       'updatedAt': 'S'},
+        'key': ('propertyId', None),
+        'indexes': {
+            'agent-index': ('agentId', 'status', 'ALL'),
+            'status-price-index': ('status', 'listPrice', 'ALL'),
+            'city-price-index': ('city', 'listPrice', 'ALL'),
+            'zipcode-price-index': ('zipcode', 'listPrice', 'ALL'),
+            'type-price-index': ('propertyType', 'listPrice', 'ALL'),
+            'catalog-updated-index': ('catalog', 'updatedAt', 'ALL'),
+        },
+    },
+    'Appointment': {
+        'attributes': {'appointmentId': 'S', 'agentId': 'S', 'clientId': 'S',
+                       'appointmentDate': 'S', 'updatedAt': 'S'},
+        'key': ('appointmentId', None),
+        'indexes': {
+            'agent-date-index': ('agentId', 'appointmentDate', 'ALL'),
+            'client-date-index': ('clientId', 'appointmentDate', 'ALL'),
+            'client-index': ('clientId', None, 'ALL'),
+            'agent-updated-index': ('agentId', 'updatedAt', 'ALL'),
+        },
+    },
+    'ClientAgent': {
+        'attributes': {'id': 'S', 'clientId': 'S', 'agentId': 'S', 'updatedAt': 'S'},
+        'key': ('id', None),
+        'indexes': {
+            'client-index': ('clientId', None, 'ALL'),
+            'agent-index': ('agentId', None, 'ALL'),
+            'agent-updated-index': ('agentId', 'updatedAt', 'ALL'),
+        },
+    },
+    'Office': {
+        'attributes': {'officeId': 'S'},
+        'key': ('officeId', None),
+        'indexes': {},
+    },
+    'Transaction': {
+        'attributes': {'transactionId': 'S', 'agentId': 'S', 'clientId': 'S', 'updatedAt': 'S'},
+        'key': ('transactionId', None),
+        'indexes': {
+            'agent-index': ('agentId', None, 'ALL'),
+            'client-index': ('clientId', None, 'ALL'),
+            'agent-updated-index': ('agentId', 'updatedAt', 'ALL'),
+        },
+    },
+    'Client': {
+        'attributes': {'clientId': 'S'},
+        'key': ('clientId', None),
+        'indexes': {},
+    },
+    'DashboardConnection': {
+        'attributes': {'connectionId': 'S', 'agentId': 'S'},
+        'key': ('connectionId', None),
+        'indexes': {'agent-index': ('agentId', None, 'KEYS_ONLY')},
+    },
+}
+
+# DynamoDB service limits the fake enforces
+PAGE_BYTES = 1024 * 1024
+BATCH_GET_MAX_BYTES = 16 * 1024 * 1024
+ITEM_MAX_BYTES = 400 * 1024
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+TRANSACT_MAX_ITEMS = 100
+
+_SEGMENT_SPACE = 2 ** 32
+
+_PARAMS = {
+    'GetItem': {'TableName', 'Key', 'ConsistentRead', 'ReturnConsumedCapacity',
+                'ProjectionExpression', 'ExpressionAttributeNames'},
+    'PutItem': {'TableName', 'Item', 'ConditionExpression', 'ExpressionAttributeNames',
+                'ExpressionAttributeValues', 'ReturnValues', 'ReturnConsumedCapacity',
+                'ReturnItemCollectionMetrics', 'ReturnValuesOnConditionCheckFailure'},
+    'UpdateItem': {'TableName', 'Key', 'UpdateExpression', 'ConditionExpression',
+                   'ExpressionAttributeNames', 'ExpressionAttributeValues', 'ReturnValues',
+                   'ReturnConsumedCapacity', 'ReturnItemCollectionMetrics',
+                   'ReturnValuesOnConditionCheckFailure'},
+    'DeleteItem': {'TableName', 'Key', 'ConditionExpression', 'ExpressionAttributeNames',
+                   'ExpressionAttributeValues', 'ReturnValues', 'ReturnConsumedCapacity',
+                   'ReturnItemCollectionMetrics', 'ReturnValuesOnConditionCheckFailure'},
+    'Query': {'TableName', 'IndexName', 'Select', 'Limit', 'ConsistentRead', 'ScanIndexForward',
+              'ExclusiveStartKey', 'ReturnConsumedCapacity', 'ProjectionExpression',
+              'FilterExpression', 'KeyConditionExpression', 'ExpressionAttributeNames',
+              'ExpressionAttributeValues'},
+    'Scan': {'TableName', 'IndexName', 'Select', 'Limit', 'ConsistentRead', 'ExclusiveStartKey',
+             'ReturnConsumedCapacity', 'TotalSegments', 'Segment', 'ProjectionExpression',
+             'FilterExpression', 'ExpressionAttributeNames', 'ExpressionAttributeValues'},
+    'ConditionCheck': {'TableName', 'Key', 'ConditionExpression', 'ExpressionAttributeNames',
+                       'ExpressionAttributeValues', 'ReturnValuesOnConditionCheckFailure'},
+}
+_TRANSACT_ACTIONS = {'Put': 'PutItem', 'Update': 'UpdateItem', 'Delete': 'DeleteItem',
+                     'ConditionCheck': 'ConditionCheck'}
+
+# Error codes callers catch as client.exceptions.<Code>
+_MODELED_ERRORS = (
+    'ConditionalCheckFailedException', 'ResourceNotFoundException', 'TransactionCanceledException',
+    'TransactionConflictException', 'ProvisionedThroughputExceededException',
+    'ItemCollectionSizeLimitExceededException', 'ResourceInUseException',
+)
+_EXCEPTIONS = SimpleNamespace(ClientError=ClientError, **{
+    code: type(code, (ClientError,), {}) for code in _MODELED_ERRORS
+})
+
+
+def _error(code: str, message: str, operation: str, **extra) -> ClientError:
+    response = {
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': 400},
+    }
+    response.update(extra)
+    return getattr(_EXCEPTIONS, code, ClientError)(response, operation)
+
+
+def _validation(operation: str, message: str) -> ClientError:
+    return _error('ValidationException', message, operation)
+
+
+def _check_params(operation: str, request: Dict[str, Any]) -> None:
+    allowed = _PARAMS[operation]
+    for name in request:
+        if name not in allowed:
+            raise ParamValidationError(
+                report=f'Unknown parameter in input: "{name}", must be one of: {", ".join(sorted(allowed))}')
+
+
+# --- values ----------------------------------------------------------------
+
+def _normalize(value: Any) -> Any:
+    """Copy a value the way the resource layer would store it (int -> Decimal, bytes -> Binary)"""
+    if isinstance(value, str) or isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            raise TypeError(f"Infinity and NaN not supported: {value}")
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if isinstance(value, Binary):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return Binary(bytes(value))
+    if isinstance(value, (set, frozenset)):
+        return {_normalize(member) for member in value}
+    if isinstance(value, Mapping):
+        return {name: _normalize(member) for name, member in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(member) for member in value]
+    raise TypeError(f'Unsupported type "{type(value)}" for value "{value}"')
+
+
+def _clone(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {name: _clone(member) for name, member in value.items()}
+    if isinstance(value, list):
+        return [_clone(member) for member in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def _check_values(value: Any, operation: str) -> None:
+    """Reject empty sets, which DynamoDB refuses anywhere in an item"""
+    if isinstance(value, set):
+        if not value:
+            raise _validation(operation, "One or more parameter values were invalid: An string set  may not be empty")
+        type_code(value)
+    elif isinstance(value, dict):
+        for member in value.values():
+            _check_values(member, operation)
+    elif isinstance(value, list):
+        for member in value:
+            _check_values(member, operation)
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value) if value.isascii() else len(value.encode('utf-8'))
+    if isinstance(value, Decimal):
+        return (len(value.as_tuple().digits) + 1) // 2 + 1
+    if isinstance(value, Binary):
+        return len(value.value)
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (set, frozenset)):
+        return sum(_value_size(member) for member in value)
+    if isinstance(value, list):
+        return 3 + sum(1 + _value_size(member) for member in value)
+    if isinstance(value, dict):
+        return 3 + sum(1 + len(name) + _value_size(member) for name, member in value.items())
+    return 0
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    """Approximate stored size of an item, as DynamoDB counts it (names + values)"""
+    return sum(len(name) + _value_size(value) for name, value in item.items())
+
+
+def _key_value(value: Any) -> Any:
+    """Orderable form of a key attribute value"""
+    return value.value if isinstance(value, Binary) else value
+
+
+def _token(hash_value: Any) -> int:
+    """Stable 32-bit position of a partition key; Scan segments are ranges of it"""
+    if isinstance(hash_value, str):
+        data = b's' + hash_value.encode('utf-8')
+    elif isinstance(hash_value, Decimal):
+        data = b'n' + str(hash_value.normalize()).encode('ascii')
+    else:
+        data = b'b' + bytes(hash_value)
+    return zlib.crc32(data)
+
+
+def _read_units(size: int, consistent: bool) -> float:
+    units = max(1, math.ceil(size / 4096))
+    return float(units) if consistent else units / 2
+
+
+def _write_units(size: int) -> float:
+    return float(max(1, math.ceil(size / 1024)))
+
+
+# --- schemas ---------------------------------------------------------------
+
+class _IndexSchema:
+    def __init__(self, name: Optional[str], hash_key: str, range_key: Optional[str], projection: Any):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.projection = projection
+
+    def entry(self, item: Dict[str, Any], pk: Tuple[Any, ...]) -> Optional[Tuple[Any, Tuple[Any, Any]]]:
+        """(partition value, (sort value, table key)) or None when the item is not in the index"""
+        hash_value = item.get(self.hash_key, MISSING)
+        if hash_value is MISSING:
+            return None
+        sort_value = None
+        if self.range_key is not None:
+            sort_value = item.get(self.range_key, MISSING)
+            if sort_value is MISSING:
+                return None
+            sort_value = _key_value(sort_value)
+        return _key_value(hash_value), (sort_value, pk)
+
+
+class _Schema:
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.attributes = dict(spec['attributes'])
+        self.hash_key, self.range_key = spec['key']
+        self.key_names = tuple(key for key in spec['key'] if key)
+        self.indexes = {
+            index_name: _IndexSchema(index_name, hash_key, range_key, projection)
+            for index_name, (hash_key, range_key, projection) in spec.get('indexes', {}).items()
+        }
+        # Queries on the table itself go through the same code as GSI queries
+        self.table_index = _IndexSchema(None, self.hash_key, self.range_key, 'ALL')
+
+    def _check_key_value(self, name: str, value: Any, operation: str, index_name: Optional[str] = None) -> None:
+        expected = self.attributes[name]
+        actual = type_code(value) if value is not MISSING else None
+        if actual != expected:
+            where = f" IndexName: {index_name}" if index_name else ''
+            raise _validation(operation, f"One or more parameter values were invalid: Type mismatch for "
+                                         f"{'Index ' if index_name else ''}Key {name} expected: {expected} "
+                                         f"actual: {actual}{where}")
+        if expected in ('S', 'B') and len(_key_value(value)) == 0:
+            raise _validation(operation, "One or more parameter values are not valid. The AttributeValue for a "
+                                         f"key attribute cannot contain an empty string value. Key: {name}")
+
+    def key(self, source: Dict[str, Any], operation: str, exact: bool = False) -> Tuple[Any, ...]:
+        """Table key tuple of an item (or, with exact=True, of a Key argument)"""
+        if exact and len(source) != len(self.key_names):
+            raise _validation(operation, "The provided key element does not match the schema")
+        values = []
+        for name in self.key_names:
+            value = source.get(name, MISSING)
+            if value is MISSING:
+                raise _validation(operation, "One of the required keys was not given a value")
+            self._check_key_value(name, value, operation)
+            values.append(_key_value(value))
+        return tuple(values)
+
+    def check_index_keys(self, item: Dict[str, Any], operation: str) -> None:
+        for index in self.indexes.values():
+            for name in (index.hash_key, index.range_key):
+                if name is not None and name in item:
+                    self._check_key_value(name, item[name], operation, index.name)
+
+    def index(self, index_name: Optional[str], operation: str) -> _IndexSchema:
+        if index_name is None:
+            return self.table_index
+        index = self.indexes.get(index_name)
+        if index is None:
+            raise _validation(operation, "The table does not have the specified index: " + index_name)
+        return index
+
+    def key_attributes(self, item: Dict[str, Any], index: _IndexSchema) -> Dict[str, Any]:
+        names = list(self.key_names)
+        for name in (index.hash_key, index.range_key):
+            if name is not None and name not in names:
+                names.append(name)
+        return {name: item[name] for name in names if name in item}
+
+    def describe(self, item_count: int) -> Dict[str, Any]:
+        def key_schema(hash_key, range_key):
+            schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+            if range_key:
+                schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+            return schema
+
+        description = {
+            'TableName': self.name,
+            'TableStatus': 'ACTIVE',
+            'KeySchema': key_schema(self.hash_key, self.range_key),
+            'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': attribute_type}
+                                     for name, attribute_type in self.attributes.items()],
+            'ItemCount': item_count,
+            'BillingModeSummary': {'BillingMode': 'PAY_PER_REQUEST'},
+        }
+        if self.indexes:
+            description['GlobalSecondaryIndexes'] = [{
+                'IndexName': index.name,
+                'KeySchema': key_schema(index.hash_key, index.range_key),
+                'Projection': ({'ProjectionType': index.projection} if isinstance(index.projection, str)
+                               else {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': list(index.projection)}),
+                'IndexStatus': 'ACTIVE',
+            } for index in self.indexes.values()]
+        return description
+
+
+# --- stores ----------------------------------------------------------------
+
+class _Top:
+    """Sorts after every table key, to find the end of a run of equal sort values"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_TOP = _Top()
+
+
+def _prefix_end(prefix: Any) -> Any:
+    """Smallest value greater than every value starting with `prefix`, or None"""
+    while prefix:
+        last = prefix[-1]
+        if isinstance(prefix, str):
+            if ord(last) < 0x10FFFF:
+                return prefix[:-1] + chr(ord(last) + 1)
+        elif last < 255:
+            return prefix[:-1] + bytes([last + 1])
+        prefix = prefix[:-1]
+    return None
+
+
+def _sort_bounds(entries: List[Tuple[Any, Any]], condition: Optional[Tuple[Any, ...]]) -> Tuple[int, int]:
+    if condition is None:
+        return 0, len(entries)
+    op, value = condition[0], _key_value(condition[1])
+    if op == '=':
+        return bisect.bisect_left(entries, (value,)), bisect.bisect_left(entries, (value, _TOP))
+    if op == '<':
+        return 0, bisect.bisect_left(entries, (value,))
+    if op == '<=':
+        return 0, bisect.bisect_left(entries, (value, _TOP))
+    if op == '>':
+        return bisect.bisect_left(entries, (value, _TOP)), len(entries)
+    if op == '>=':
+        return bisect.bisect_left(entries, (value,)), len(entries)
+    if op == 'BETWEEN':
+        return bisect.bisect_left(entries, (value,)), bisect.bisect_left(entries, (_key_value(condition[2]), _TOP))
+    # begins_with
+    end = _prefix_end(value)
+    return (bisect.bisect_left(entries, (value,)),
+            len(entries) if end is None else bisect.bisect_left(entries, (end,)))
+
+
+class _SortedEntries:
+    """A sorted list kept lazily: additions are merged and removals dropped on the next read"""
+
+    __slots__ = ('_entries', '_pending', '_removed')
+
+    def __init__(self):
+        self._entries: List[Any] = []
+        self._pending: List[Any] = []
+        self._removed: set = set()
+
+    def add(self, entry: Any) -> None:
+        if entry in self._removed:
+            self._removed.discard(entry)
+        else:
+            self._pending.append(entry)
+
+    def remove(self, entry: Any) -> None:
+        self._removed.add(entry)
+
+    def view(self) -> List[Any]:
+        if self._pending:
+            # Two sorted runs, so this sort is linear
+            self._pending.sort()
+            self._entries.extend(self._pending)
+            self._pending = []
+            self._entries.sort()
+        if self._removed:
+            removed = self._removed
+            self._entries = [entry for entry in self._entries if entry not in removed]
+            self._removed = set()
+        return self._entries
+
+
+class _MemoryStore:
+    """Items in a dict, with a token-ordered key list for Scan and sorted partitions per index"""
+
+    returns_copies = False
+
+    def __init__(self, schema: _Schema):
+        self.schema = schema
+        self.items: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        self.sizes: Dict[Tuple[Any, ...], int] = {}
+        self.order = _SortedEntries()
+        self.indexed = list(schema.indexes.values())
+        if schema.range_key is not None:
+            self.indexed.append(schema.table_index)
+        self.partitions: Dict[Optional[str], Dict[Any, _SortedEntries]] = {
+            index.name: {} for index in self.indexed
+        }
+
+    def count(self) -> int:
+        return len(self.items)
+
+    def load(self, pk: Tuple[Any, ...]) -> Optional[Tuple[Dict[str, Any], int]]:
+        item = self.items.get(pk)
+        return None if item is None else (item, self.sizes[pk])
+
+    def _reindex(self, pk, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        for index in self.indexed:
+            before = index.entry(old, pk) if old is not None else None
+            after = index.entry(new, pk) if new is not None else None
+            if before == after:
+                continue
+            partitions = self.partitions[index.name]
+            if before is not None:
+                partitions[before[0]].remove(before[1])
+            if after is not None:
+                partition = partitions.get(after[0])
+                if partition is None:
+                    partition = partitions[after[0]] = _SortedEntries()
+                partition.add(after[1])
+
+    def put(self, pk, item: Dict[str, Any], size: int, old: Optional[Dict[str, Any]]) -> None:
+        self._reindex(pk, old, item)
+        if old is None:
+            self.order.add((_token(pk[0]), pk))
+        self.items[pk] = item
+        self.sizes[pk] = size
+
+    def put_many(self, rows: Iterable[Tuple[Tuple[Any, ...], Dict[str, Any], int]]) -> None:
+        for pk, item, size in rows:
+            previous = self.items.get(pk)
+            self.put(pk, item, size, previous)
+
+    def delete(self, pk, old: Dict[str, Any]) -> None:
+        self._reindex(pk, old, None)
+        self.order.remove((_token(pk[0]), pk))
+        del self.items[pk]
+        del self.sizes[pk]
+
+    def scan(self, low: int, high: int, start_after) -> Iterator[Tuple[Dict[str, Any], int]]:
+        entries = self.order.view()
+        start = bisect.bisect_left(entries, (low,))
+        if start_after is not None:
+            start = max(start, bisect.bisect_right(entries, start_after))
+        end = bisect.bisect_left(entries, (high,))
+        for position in range(start, end):
+            pk = entries[position][1]
+            yield self.items[pk], self.sizes[pk]
+
+    def query(self, index: _IndexSchema, hash_value: Any, condition, start_after,
+              forward: bool) -> Iterator[Tuple[Dict[str, Any], int]]:
+        if index.name is None and self.schema.range_key is None:
+            # A table without a sort key holds at most one item per partition
+            pk = (hash_value,)
+            if start_after is None and pk in self.items:
+                yield self.items[pk], self.sizes[pk]
+            return
+        partition = self.partitions[index.name].get(hash_value)
+        if partition is None:
+            return
+        entries = partition.view()
+        start, end = _sort_bounds(entries, condition)
+        if start_after is not None:
+            if forward:
+                start = max(start, bisect.bisect_right(entries, start_after))
+            else:
+                end = min(end, bisect.bisect_left(entries, start_after))
+        positions = range(start, end) if forward else range(end - 1, start - 1, -1)
+        for position in positions:
+            pk = entries[position][1]
+            yield self.items[pk], self.sizes[pk]
+
+
+def _sql_value(value: Any) -> Any:
+    """Key value as stored in a SQLite column; SQLite orders TEXT and BLOB like DynamoDB"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _SqliteStore:
+    """Items pickled into one SQLite table per DynamoDB table, with a SQL index per GSI"""
+
+    returns_copies = True
+
+    def __init__(self, db: sqlite3.Connection, schema: _Schema):
+        self.db = db
+        self.schema = schema
+        self.table = _quote(schema.name)
+        self.indexes = list(schema.indexes.values())
+        self._create()
+
+    def _columns(self, index: _IndexSchema) -> Tuple[str, str]:
+        return _quote(f"{index.name}:h"), _quote(f"{index.name}:r")
+
+    def _create(self) -> None:
+        self.db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "h NOT NULL, r NOT NULL, token INTEGER NOT NULL, size INTEGER NOT NULL, item BLOB NOT NULL)"
+        )
+        self.db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(self.schema.name + ':key')} "
+                        f"ON {self.table} (h, r)")
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS {_quote(self.schema.name + ':scan')} "
+                        f"ON {self.table} (token, h, r)")
+        existing = {row[1] for row in self.db.execute(f"PRAGMA table_info({self.table})")}
+        added = []
+        for index in self.indexes:
+            hash_column, range_column = self._columns(index)
+            if f"{index.name}:h" not in existing:
+                self.db.execute(f"ALTER TABLE {self.table} ADD COLUMN {hash_column}")
+                self.db.execute(f"ALTER TABLE {self.table} ADD COLUMN {range_column}")
+                added.append(index)
+            self.db.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(self.schema.name + ':' + index.name)} "
+                f"ON {self.table} ({hash_column}, {range_column}, h, r) WHERE {hash_column} IS NOT NULL")
+        if added:
+            # A GSI added to the schema later is backfilled, as DynamoDB does
+            rows = self.db.execute(f"SELECT rowid, item, h, r FROM {self.table}").fetchall()
+            for rowid, blob, hash_value, range_value in rows:
+                item = pickle.loads(blob)
+                values = self._index_values(item, (hash_value,) if range_value == '' else (hash_value, range_value),
+                                            added)
+                assignments = ', '.join(f"{column} = ?" for index in added for column in self._columns(index))
+                self.db.execute(f"UPDATE {self.table} SET {assignments} WHERE rowid = ?", (*values, rowid))
+        self.db.commit()
+
+    def _index_values(self, item: Dict[str, Any], pk, indexes: List[_IndexSchema]) -> List[Any]:
+        values = []
+        for index in indexes:
+            entry = index.entry(item, pk)
+            if entry is None:
+                values.extend((None, None))
+            else:
+                values.extend((_sql_value(entry[0]), '' if entry[1][0] is None else _sql_value(entry[1][0])))
+        return values
+
+    @staticmethod
+    def _pk_columns(pk: Tuple[Any, ...]) -> Tuple[Any, Any]:
+        return _sql_value(pk[0]), _sql_value(pk[1]) if len(pk) > 1 else ''
+
+    def count(self) -> int:
+        return self.db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def load(self, pk: Tuple[Any, ...]) -> Optional[Tuple[Dict[str, Any], int]]:
+        row = self.db.execute(f"SELECT item, size FROM {self.table} WHERE h = ? AND r = ?",
+                              self._pk_columns(pk)).fetchone()
+        return None if row is None else (pickle.loads(row[0]), row[1])
+
+    def _row(self, pk, item: Dict[str, Any], size: int) -> Tuple[Any, ...]:
+        return (*self._pk_columns(pk), _token(pk[0]), size, pickle.dumps(item, pickle.HIGHEST_PROTOCOL),
+                *self._index_values(item, pk, self.indexes))
+
+    def _insert_sql(self) -> str:
+        columns = ['h', 'r', 'token', 'size', 'item'] + [
+            column for index in self.indexes for column in self._columns(index)]
+        return (f"INSERT OR REPLACE INTO {self.table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})")
+
+    def put(self, pk, item: Dict[str, Any], size: int, old: Optional[Dict[str, Any]]) -> None:
+        self.db.execute(self._insert_sql(), self._row(pk, item, size))
+
+    def put_many(self, rows: Iterable[Tuple[Tuple[Any, ...], Dict[str, Any], int]]) -> None:
+        self.db.executemany(self._insert_sql(), (self._row(pk, item, size) for pk, item, size in rows))
+
+    def delete(self, pk, old: Dict[str, Any]) -> None:
+        self.db.execute(f"DELETE FROM {self.table} WHERE h = ? AND r = ?", self._pk_columns(pk))
+
+    def _rows(self, sql: str, params: List[Any]) -> Iterator[Tuple[Dict[str, Any], int]]:
+        cursor = self.db.execute(sql, params)
+        try:
+            for blob, size in cursor:
+                yield pickle.loads(blob), size
+        finally:
+            cursor.close()
+
+    def scan(self, low: int, high: int, start_after) -> Iterator[Tuple[Dict[str, Any], int]]:
+        sql = f"SELECT item, size FROM {self.table} WHERE token >= ? AND token < ?"
+        params: List[Any] = [low, high]
+        if start_after is not None:
+            token, pk = start_after
+            sql += " AND (token, h, r) > (?, ?, ?)"
+            params.extend((token, *self._pk_columns(pk)))
+        return self._rows(sql + " ORDER BY token, h, r", params)
+
+    def query(self, index: _IndexSchema, hash_value: Any, condition, start_after,
+              forward: bool) -> Iterator[Tuple[Dict[str, Any], int]]:
+        if index.name is None:
+            hash_column, range_column = 'h', 'r'
+        else:
+            hash_column, range_column = self._columns(index)
+        sql = f"SELECT item, size FROM {self.table} WHERE {hash_column} = ?"
+        params: List[Any] = [_sql_value(hash_value)]
+        if condition is not None:
+            op = condition[0]
+            value = _sql_value(_key_value(condition[1]))
+            if op == 'BETWEEN':
+                sql += f" AND {range_column} BETWEEN ? AND ?"
+                params.extend((value, _sql_value(_key_value(condition[2]))))
+            elif op == 'begins_with':
+                sql += f" AND {range_column} >= ? AND substr({range_column}, 1, ?) = ?"
+                params.extend((value, len(value), value))
+            else:
+                sql += f" AND {range_column} {op} ?"
+                params.append(value)
+        if start_after is not None:
+            sort_value, pk = start_after
+            sql += f" AND ({range_column}, h, r) {'>' if forward else '<'} (?, ?, ?)"
+            params.extend(('' if sort_value is None else _sql_value(sort_value), *self._pk_columns(pk)))
+        direction = '' if forward else ' DESC'
+        sql += f" ORDER BY {range_column}{direction}, h{direction}, r{direction}"
+        return self._rows(sql, params)
+
+
+class _TableState:
+    def __init__(self, schema: _Schema, store):
+        self.schema = schema
+        self.store = store
+
+
+class _Change:
+    """One planned write: the new item (None to delete) replacing `old`"""
+
+    def __init__(self, state: _TableState, pk, old: Optional[Tuple[Dict[str, Any], int]],
+                 new: Optional[Dict[str, Any]], touched: Optional[List[str]] = None):
+        self.state = state
+        self.pk = pk
+        self.old_item = old[0] if old else None
+        self.old_size = old[1] if old else 0
+        self.new = new
+        self.new_size = item_size(new) if new is not None else 0
+        self.touched = touched
+
+    def apply(self) -> None:
+        store = self.state.store
+        if self.new is None:
+            if self.old_item is not None:
+                store.delete(self.pk, self.old_item)
+        else:
+            store.put(self.pk, self.new, self.new_size, self.old_item)
+
+    def units(self) -> float:
+        return _write_units(max(self.old_size, self.new_size))
+
+
+# --- resource ----------------------------------------------------------------
+
+def _build_conditions(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn boto3 Key()/Attr() conditions into expression strings, as the resource layer does"""
+    builder = None
+    for arg, is_key_condition in (('KeyConditionExpression', True), ('FilterExpression', False),
+                                  ('ConditionExpression', False)):
+        condition = request.get(arg)
+        if isinstance(condition, ConditionBase):
+            builder = builder or ConditionExpressionBuilder()
+            built = builder.build_expression(condition, is_key_condition=is_key_condition)
+            request[arg] = built.condition_expression
+            request['ExpressionAttributeNames'] = dict(
+                request.get('ExpressionAttributeNames', {}), **built.attribute_name_placeholders)
+            request['ExpressionAttributeValues'] = dict(
+                request.get('ExpressionAttributeValues', {}), **built.attribute_value_placeholders)
+    return request
+
+
+class _Expressions:
+    """The parsed expressions of one request, checked against its placeholders"""
+
+    def __init__(self, request: Dict[str, Any], operation: str):
+        self.names = request.get('ExpressionAttributeNames') or {}
+        try:
+            self.values = {name: _normalize(value)
+                           for name, value in (request.get('ExpressionAttributeValues') or {}).items()}
+            parsed = {}
+            for arg, parse in (('KeyConditionExpression', parse_condition), ('FilterExpression', parse_condition),
+                               ('ConditionExpression', parse_condition), ('UpdateExpression', parse_update),
+                               ('ProjectionExpression', parse_projection)):
+                if request.get(arg):
+                    parsed[arg] = parse(request[arg])
+        except ExpressionError as e:
+            raise _validation(operation, f"Invalid expression: {e}")
+        self.key_condition = parsed.get('KeyConditionExpression')
+        self.filter = parsed.get('FilterExpression')
+        self.condition = parsed.get('ConditionExpression')
+        self.update = parsed.get('UpdateExpression')
+        self.projection = parsed.get('ProjectionExpression')
+
+        used_names = set().union(*(expression.names for expression in parsed.values()))
+        used_values = set().union(*(expression.values for expression in parsed.values()))
+        for used, provided, label in ((used_names, self.names, 'ExpressionAttributeNames'),
+                                      (used_values, self.values, 'ExpressionAttributeValues')):
+            unused = set(provided) - used
+            if unused:
+                raise _validation(operation, f"Value provided in {label} unused in expressions: "
+                                             f"keys: {{{', '.join(sorted(unused))}}}")
+            undefined = used - set(provided)
+            if undefined:
+                kind = 'name' if label == 'ExpressionAttributeNames' else 'value'
+                raise _validation(operation, f"An expression attribute {kind} used in expression is not defined; "
+                                             f"attribute {kind}: {sorted(undefined)[0]}")
+        for value in self.values.values():
+            _check_values(value, operation)
+
+    def holds(self, item: Optional[Dict[str, Any]], operation: str) -> bool:
+        if self.condition is None:
+            return True
+        try:
+            return evaluate(self.condition, item or {}, self.names, self.values)
+        except ExpressionError as e:
+            raise _validation(operation, f"Invalid ConditionExpression: {e}")
+
+
+def _metadata(size: int) -> Dict[str, Any]:
+    return {
+        'RequestId': uuid.uuid4().hex.upper(),
+        'HTTPStatusCode': 200,
+        'HTTPHeaders': {'content-type': 'application/x-amz-json-1.0', 'content-length': str(size)},
+        'RetryAttempts': 0,
+    }
+
+
+def _wants_capacity(request: Dict[str, Any]) -> bool:
+    return request.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES')
+
+
+class MemoryTable:
+    """Table handle with the boto3 Table methods the services call"""
+
+    def __init__(self, resource: 'MemoryDynamoResource', name: str):
+        self._resource = resource
+        self.name = name
+        self.table_name = name
+
+    @property
+    def table_status(self) -> str:
+        self._resource._state(self.name, 'DescribeTable')
+        return 'ACTIVE'
+
+    @property
+    def item_count(self) -> int:
+        return self._resource.meta.client.describe_table(TableName=self.name)['Table']['ItemCount']
+
+    def get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._get_item(dict(kwargs, TableName=self.name))
+
+    def put_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._put_item(dict(kwargs, TableName=self.name))
+
+    def update_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._update_item(dict(kwargs, TableName=self.name))
+
+    def delete_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._delete_item(dict(kwargs, TableName=self.name))
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._query(dict(kwargs, TableName=self.name))
+
+    def scan(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._scan(dict(kwargs, TableName=self.name))
+
+    def batch_writer(self, overwrite_by_pkeys: Optional[List[str]] = None) -> BatchWriter:
+        return BatchWriter(self.name, self._resource.meta.client, overwrite_by_pkeys=overwrite_by_pkeys)
+
+
+class MemoryClient:
+    """meta.client of MemoryDynamoResource; like the resource layer's client it takes plain Python values"""
+
+    exceptions = _EXCEPTIONS
+
+    def __init__(self, resource: 'MemoryDynamoResource'):
+        self._resource = resource
+
+    def get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._get_item(kwargs)
+
+    def put_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._put_item(kwargs)
+
+    def update_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._update_item(kwargs)
+
+    def delete_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._delete_item(kwargs)
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._query(kwargs)
+
+    def scan(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._scan(kwargs)
+
+    def batch_get_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource.batch_get_item(**kwargs)
+
+    def batch_write_item(self, **kwargs) -> Dict[str, Any]:
+        return self._resource.batch_write_item(**kwargs)
+
+    def transact_write_items(self, **kwargs) -> Dict[str, Any]:
+        return self._resource._transact_write_items(kwargs)
+
+    def describe_table(self, TableName: str) -> Dict[str, Any]:
+        self._resource._pause()
+        with self._resource._lock:
+            state = self._resource._state(TableName, 'DescribeTable')
+            return {'Table': state.schema.describe(state.store.count()), 'ResponseMetadata': _metadata(0)}
+
+
+class MemoryDynamoResource:
+    """Stands in for boto3.resource('dynamodb') wherever the services take one.
+
+    Tables come from TABLE_SCHEMAS under `table_prefix`; more can be added with
+    define_table. With `path`, items are stored in that SQLite file and
+    survive restarts. `latency` adds a fixed delay (seconds) to every call, to
+    stand in for the network round trip.
+    """
+
+    def __init__(self, path: Optional[str] = None, table_prefix: str = 'dev-',
+                 schemas: Optional[Dict[str, Dict[str, Any]]] = None, latency: float = 0.0):
+        self.path = path
+        self.table_prefix = table_prefix
+        self.latency = latency
+        # One lock for every table: writes and transactions are atomic, and
+        # the SQLite connection is used by one thread at a time
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=OFF')
+            self._db.execute('PRAGMA cache_size=-65536')
+        self._tables: Dict[str, _TableState] = {}
+        for base_name, spec in (TABLE_SCHEMAS if schemas is None else schemas).items():
+            self.define_table(f"{table_prefix}{base_name}", spec)
+        self.meta = SimpleNamespace(client=MemoryClient(self))
+
+    def define_table(self, name: str, spec: Dict[str, Any]) -> None:
+        """Add a table: spec has 'attributes', 'key' (hash, range) and 'indexes' like TABLE_SCHEMAS"""
+        schema = _Schema(name, spec)
+        with self._lock:
+            store = _SqliteStore(self._db, schema) if self._db is not None else _MemoryStore(schema)
+            self._tables[name] = _TableState(schema, store)
+
+    @property
+    def table_names(self) -> List[str]:
+        return sorted(self._tables)
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def Table(self, name: str) -> MemoryTable:
+        return MemoryTable(self, name)
+
+    # --- helpers -------------------------------------------------------
+
+    def _pause(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _state(self, table_name: str, operation: str) -> _TableState:
+        state = self._tables.get(table_name)
+        if state is None:
+            raise _error('ResourceNotFoundException', 'Requested resource not found', operation)
+        return state
+
+    def _commit(self) -> None:
+        if self._db is not None:
+            self._db.commit()
+
+    def _output(self, state: _TableState, item: Dict[str, Any], index: Optional[_IndexSchema],
+                expressions: _Expressions) -> Dict[str, Any]:
+        if index is not None and index.projection != 'ALL':
+            visible = state.schema.key_attributes(item, index)
+            if not isinstance(index.projection, str):
+                visible.update({name: item[name] for name in index.projection if name in item})
+            item = visible
+        if expressions.projection is not None:
+            item = project(expressions.projection, item, expressions.names)
+        return item if state.store.returns_copies else _clone(item)
+
+    @staticmethod
+    def _attach(response: Dict[str, Any], request: Dict[str, Any], table_name: str, units: float,
+                size: int) -> Dict[str, Any]:
+        if _wants_capacity(request):
+            response['ConsumedCapacity'] = {'TableName': table_name, 'CapacityUnits': units}
+        response['ResponseMetadata'] = _metadata(size)
+        return response
+
+    # --- single-item operations ---------------------------------------
+
+    def _get_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        _check_params('GetItem', request)
+        self._pause()
+        with self._lock:
+            state = self._state(request['TableName'], 'GetItem')
+            expressions = _Expressions(request, 'GetItem')
+            pk = state.schema.key(_normalize(request['Key']), 'GetItem', exact=True)
+            found = state.store.load(pk)
+            response: Dict[str, Any] = {}
+            size = 0
+            if found is not None:
+                response['Item'] = self._output(state, found[0], None, expressions)
+                size = found[1]
+            return self._attach(response, request, state.schema.name,
+                                _read_units(size, bool(request.get('ConsistentRead'))), size)
+
+    def _plan_put(self, request: Dict[str, Any], operation: str) -> Tuple[_Change, _Expressions]:
+        state = self._state(request['TableName'], operation)
+        expressions = _Expressions(_build_conditions(request), operation)
+        item = _normalize(request['Item'])
+        _check_values(item, operation)
+        pk = state.schema.key(item, operation)
+        state.schema.check_index_keys(item, operation)
+        change = _Change(state, pk, state.store.load(pk), item)
+        if change.new_size > ITEM_MAX_BYTES:
+            raise _validation(operation, "Item size has exceeded the maximum allowed size")
+        return change, expressions
+
+    def _plan_update(self, request: Dict[str, Any], operation: str) -> Tuple[_Change, _Expressions]:
+        state = self._state(request['TableName'], operation)
+        expressions = _Expressions(_build_conditions(request), operation)
+        key = _normalize(request['Key'])
+        pk = state.schema.key(key, operation, exact=True)
+        old = state.store.load(pk)
+        item = _clone(old[0]) if old else dict(key)
+        touched: List[str] = []
+        if expressions.update is not None:
+            try:
+                touched = apply_update(expressions.update, item, expressions.names, expressions.values)
+            except ExpressionError as e:
+                raise _validation(operation, f"Invalid UpdateExpression: {e}")
+            for name in touched:
+                if name in state.schema.key_names:
+                    raise _validation(operation, f"One or more parameter values were invalid: Cannot update "
+                                                 f"attribute {name}. This attribute is part of the key")
+        _check_values(item, operation)
+        state.schema.check_index_keys(item, operation)
+        change = _Change(state, pk, old, item, touched)
+        if change.new_size > ITEM_MAX_BYTES:
+            raise _validation(operation, "Item size to update has exceeded the maximum allowed size")
+        return change, expressions
+
+    def _plan_delete(self, request: Dict[str, Any], operation: str) -> Tuple[_Change, _Expressions]:
+        state = self._state(request['TableName'], operation)
+        expressions = _Expressions(_build_conditions(request), operation)
+        pk = state.schema.key(_normalize(request['Key']), operation, exact=True)
+        return _Change(state, pk, state.store.load(pk), None), expressions
+
+    def _plan_check(self, request: Dict[str, Any], operation: str) -> Tuple[_Change, _Expressions]:
+        change, expressions = self._plan_delete(request, operation)
+        # A condition check writes nothing
+        change.new = change.old_item
+        return change, expressions
+
+    def _write(self, operation: str, request: Dict[str, Any], plan) -> Dict[str, Any]:
+        _check_params(operation, request)
+        self._pause()
+        with self._lock:
+            change, expressions = plan(request, operation)
+            if not expressions.holds(change.old_item, operation):
+                extra = {}
+                if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and change.old_item is not None:
+                    extra['Item'] = _clone(change.old_item)
+                raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation, **extra)
+            change.apply()
+            self._commit()
+            response = self._return_values(operation, request.get('ReturnValues', 'NONE'), change)
+            returned = item_size(response['Attributes']) if 'Attributes' in response else 0
+            return self._attach(response, request, change.state.schema.name, change.units(), returned)
+
+    @staticmethod
+    def _return_values(operation: str, mode: str, change: _Change) -> Dict[str, Any]:
+        allowed = {'PutItem': ('NONE', 'ALL_OLD'), 'DeleteItem': ('NONE', 'ALL_OLD'),
+                   'UpdateItem': ('NONE', 'ALL_OLD', 'ALL_NEW', 'UPDATED_OLD', 'UPDATED_NEW')}[operation]
+        if mode not in allowed:
+            raise _validation(operation, f"ReturnValues can only be one of {', '.join(allowed)}")
+        old, new = change.old_item, change.new
+        if mode == 'ALL_OLD':
+            attributes = old
+        elif mode == 'ALL_NEW':
+            attributes = new
+        elif mode == 'UPDATED_OLD':
+            attributes = {name: old[name] for name in change.touched if old and name in old}
+        elif mode == 'UPDATED_NEW':
+            attributes = {name: new[name] for name in change.touched if name in new}
+        else:
+            attributes = None
+        return {'Attributes': _clone(attributes)} if attributes else {}
+
+    def _put_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self._write('PutItem', request, self._plan_put)
+
+    def _update_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self._write('UpdateItem', request, self._plan_update)
+
+    def _delete_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self._write('DeleteItem', request, self._plan_delete)
+
+    # --- query and scan -------------------------------------------------
+
+    def _page(self, state: _TableState, rows: Iterator[Tuple[Dict[str, Any], int]], request: Dict[str, Any],
+              index: Optional[_IndexSchema], expressions: _Expressions, operation: str) -> Dict[str, Any]:
+        limit = request.get('Limit')
+        if limit is not None and limit < 1:
+            raise _validation(operation, "Limit must be greater than or equal to 1")
+        count_only = request.get('Select') == 'COUNT'
+        items: List[Dict[str, Any]] = []
+        matched = scanned = read_bytes = returned_bytes = 0
+        last = None
+        more = False
+        try:
+            for item, size in rows:
+                # Reading stops at Limit items or 1 MB, whichever comes first
+                if scanned and ((limit and scanned >= limit) or read_bytes >= PAGE_BYTES):
+                    more = True
+                    break
+                if index is not None and index.name is not None and operation == 'Scan' \
+                        and index.entry(item, ()) is None:
+                    continue
+                scanned += 1
+                read_bytes += size
+                last = item
+                if expressions.filter is not None and not evaluate(expressions.filter, item, expressions.names,
+                                                                   expressions.values):
+                    continue
+                matched += 1
+                if not count_only:
+                    items.append(self._output(state, item, index, expressions))
+                    returned_bytes += size
+        except ExpressionError as e:
+            raise _validation(operation, f"Invalid FilterExpression: {e}")
+        finally:
+            close = getattr(rows, 'close', None)
+            if close is not None:
+                close()
+        response: Dict[str, Any] = {'Count': matched, 'ScannedCount': scanned}
+        if not count_only:
+            response['Items'] = items
+        if more and last is not None:
+            response['LastEvaluatedKey'] = _clone(
+                state.schema.key_attributes(last, index or state.schema.table_index))
+        units = _read_units(read_bytes, bool(request.get('ConsistentRead')))
+        return self._attach(response, request, state.schema.name, units, returned_bytes)
+
+    def _query(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        _check_params('Query', request)
+        self._pause()
+        with self._lock:
+            state = self._state(request['TableName'], 'Query')
+            _build_conditions(request)
+            if not request.get('KeyConditionExpression'):
+                raise _validation('Query', "Either the KeyConditions or KeyConditionExpression parameter must be specified in the request.")
+            expressions = _Expressions(request, 'Query')
+            index = state.schema.index(request.get('IndexName'), 'Query')
+            if index.name is not None and request.get('ConsistentRead'):
+                raise _validation('Query', "Consistent reads are not supported on global secondary indexes")
+            try:
+                hash_value, condition = key_condition(expressions.key_condition, expressions.names,
+                                                      expressions.values, index.hash_key, index.range_key)
+            except ExpressionError as e:
+                raise _validation('Query', str(e))
+            state.schema._check_key_value(index.hash_key, hash_value, 'Query', index.name)
+            if condition is not None:
+                for value in condition[1:]:
+                    if type_code(value) != state.schema.attributes[index.range_key]:
+                        raise _validation('Query', "One or more parameter values were invalid: "
+                                                   "Condition parameter type does not match schema type")
+            start_after = None
+            start_key = request.get('ExclusiveStartKey')
+            if start_key:
+                start_key = _normalize(start_key)
+                pk = state.schema.key(start_key, 'Query')
+                sort_value = None
+                if index.range_key is not None:
+                    if index.range_key not in start_key:
+                        raise _validation('Query', "The provided starting key is invalid")
+                    sort_value = _key_value(start_key[index.range_key])
+                start_after = (sort_value, pk)
+            forward = request.get('ScanIndexForward', True)
+            rows = state.store.query(index, _key_value(hash_value), condition, start_after, forward)
+            return self._page(state, rows, request, index if index.name else None, expressions, 'Query')
+
+    def _scan(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        _check_params('Scan', request)
+        self._pause()
+        with self._lock:
+            state = self._state(request['TableName'], 'Scan')
+            expressions = _Expressions(_build_conditions(request), 'Scan')
+            index = state.schema.index(request['IndexName'], 'Scan') if request.get('IndexName') else None
+            segment, total = request.get('Segment'), request.get('TotalSegments')
+            if (segment is None) != (total is None):
+                raise _validation('Scan', "Segment and TotalSegments must be specified together")
+            if total is None:
+                low, high = 0, _SEGMENT_SPACE
+            else:
+                if not 1 <= total <= 1000000 or not 0 <= segment < total:
+                    raise _validation('Scan', "The Segment parameter must be less than TotalSegments")
+                low = segment * _SEGMENT_SPACE // total
+                high = (segment + 1) * _SEGMENT_SPACE // total
+            start_after = None
+            if request.get('ExclusiveStartKey'):
+                pk = state.schema.key(_normalize(request['ExclusiveStartKey']), 'Scan')
+                start_after = (_token(pk[0]), pk)
+            rows = state.store.scan(low, high, start_after)
+            return self._page(state, rows, request, index, expressions, 'Scan')
+
+    # --- batch and transactional operations ----------------------------
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], ReturnConsumedCapacity: Optional[str] = None) -> Dict[str, Any]:
+        """BatchGetItem: at most 100 keys, 16 MB per response; the rest comes back as UnprocessedKeys"""
+        total = sum(len(spec.get('Keys', ())) for spec in RequestItems.values())
+        if total == 0:
+            raise _validation('BatchGetItem', "The list of keys to fetch must not be empty")
+        if total > BATCH_GET_MAX_KEYS:
+            raise _validation('BatchGetItem', "Too many items requested for the BatchGetItem call")
+        self._pause()
+        with self._lock:
+            responses: Dict[str, List[Dict[str, Any]]] = {}
+            unprocessed: Dict[str, Any] = {}
+            capacity = []
+            returned = 0
+            for table_name, spec in RequestItems.items():
+                state = self._state(table_name, 'BatchGetItem')
+                request = {name: value for name, value in spec.items() if name != 'Keys'}
+                expressions = _Expressions(request, 'BatchGetItem')
+                consistent = bool(spec.get('ConsistentRead'))
+                found_items = responses.setdefault(table_name, [])
+                seen = set()
+                units = 0.0
+                for key in spec['Keys']:
+                    pk = state.schema.key(_normalize(key), 'BatchGetItem', exact=True)
+                    if pk in seen:
+                        raise _validation('BatchGetItem', "Provided list of item keys contains duplicates")
+                    seen.add(pk)
+                    if returned >= BATCH_GET_MAX_BYTES:
+                        unprocessed.setdefault(table_name, dict(request, Keys=[]))['Keys'].append(key)
+                        continue
+                    found = state.store.load(pk)
+                    units += _read_units(found[1] if found else 0, consistent)
+                    if found is not None:
+                        found_items.append(self._output(state, found[0], None, expressions))
+                        returned += found[1]
+                capacity.append({'TableName': table_name, 'CapacityUnits': units})
+            response = {'Responses': responses, 'UnprocessedKeys': unprocessed,
+                        'ResponseMetadata': _metadata(returned)}
+            if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+                response['ConsumedCapacity'] = capacity
+            return response
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]],
+                         ReturnConsumedCapacity: Optional[str] = None,
+                         ReturnItemCollectionMetrics: Optional[str] = None) -> Dict[str, Any]:
+        """BatchWriteItem: at most 25 puts/deletes, no two on the same key"""
+        total = sum(len(requests) for requests in RequestItems.values())
+        if total == 0:
+            raise _validation('BatchWriteItem', "The batch write request list must not be empty")
+        if total > BATCH_WRITE_MAX_ITEMS:
+            raise _validation('BatchWriteItem', "Too many items requested for the BatchWriteItem call")
+        self._pause()
+        with self._lock:
+            changes: List[_Change] = []
+            for table_name, requests in RequestItems.items():
+                seen = set()
+                for entry in requests:
+                    if 'PutRequest' in entry:
+                        change, _ = self._plan_put(dict(entry['PutRequest'], TableName=table_name), 'BatchWriteItem')
+                    elif 'DeleteRequest' in entry:
+                        change, _ = self._plan_delete(dict(entry['DeleteRequest'], TableName=table_name),
+                                                      'BatchWriteItem')
+                    else:
+                        raise _validation('BatchWriteItem', "Each request needs a PutRequest or DeleteRequest")
+                    if change.pk in seen:
+                        raise _validation('BatchWriteItem', "Provided list of item keys contains duplicates")
+                    seen.add(change.pk)
+                    changes.append(change)
+            for change in changes:
+                change.apply()
+            self._commit()
+            response = {'UnprocessedItems': {}, 'ResponseMetadata': _metadata(0)}
+            if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+                response['ConsumedCapacity'] = _capacity_by_table(changes, 1.0)
+            return response
+
+    def _transact_write_items(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        items = request.get('TransactItems') or []
+        if not items or len(items) > TRANSACT_MAX_ITEMS:
+            raise _validation('TransactWriteItems', f"Member must have length between 1 and {TRANSACT_MAX_ITEMS}")
+        self._pause()
+        with self._lock:
+            planned: List[Tuple[_Change, _Expressions, Dict[str, Any]]] = []
+            targets = set()
+            for entry in items:
+                if len(entry) != 1 or next(iter(entry)) not in _TRANSACT_ACTIONS:
+                    raise _validation('TransactWriteItems', "Each item needs exactly one of Put, Update, Delete or ConditionCheck")
+                action, action_request = next(iter(entry.items()))
+                operation = _TRANSACT_ACTIONS[action]
+                _check_params(operation, action_request)
+                plan = {'Put': self._plan_put, 'Update': self._plan_update,
+                        'Delete': self._plan_delete, 'ConditionCheck': self._plan_check}[action]
+                change, expressions = plan(dict(action_request), 'TransactWriteItems')
+                target = (change.state.schema.name, change.pk)
+                if target in targets:
+                    raise _validation('TransactWriteItems', "Transaction request cannot include multiple operations on one item")
+                targets.add(target)
+                planned.append((change, expressions, action_request))
+
+            reasons = []
+            for change, expressions, action_request in planned:
+                if expressions.holds(change.old_item, 'TransactWriteItems'):
+                    reasons.append({'Code': 'None'})
+                else:
+                    reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                    if action_request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and change.old_item:
+                        reason['Item'] = _clone(change.old_item)
+                    reasons.append(reason)
+            if any(reason['Code'] != 'None' for reason in reasons):
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise _error('TransactionCanceledException',
+                             f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]",
+                             'TransactWriteItems', CancellationReasons=reasons)
+
+            for change, _, _ in planned:
+                change.apply()
+            self._commit()
+            response = {'ResponseMetadata': _metadata(0)}
+            if _wants_capacity(request):
+                # Transactional writes cost twice a standard write
+                response['ConsumedCapacity'] = _capacity_by_table([change for change, _, _ in planned], 2.0)
+            return response
+
+    def bulk_load(self, table_name: str, items: Iterable[Dict[str, Any]]) -> int:
+        """Write items straight into a table, skipping the per-call API checks; returns the count"""
+        with self._lock:
+            state = self._state(table_name, 'BulkLoad')
+            rows = []
+            for item in items:
+                item = _normalize(item)
+                rows.append((state.schema.key(item, 'BulkLoad'), item, item_size(item)))
+            state.store.put_many(rows)
+            self._commit()
+            return len(rows)
+
+
+def _capacity_by_table(changes: List[_Change], factor: float) -> List[Dict[str, Any]]:
+    totals: Dict[str, float] = {}
+    for change in changes:
+        name = change.state.schema.name
+        totals[name] = totals.get(name, 0.0) + change.units() * factor
+    return [{'TableName': name, 'CapacityUnits': units} for name, units in totals.items()]
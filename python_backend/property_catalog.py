@@ -0,0 +1,157 @@
+# property_catalog.py
+# In-container replica of the Property table for getProperties/get_properties.
+# The first read scans the table; after that a read older than the staleness
+# window asks catalog-updated-index for rows written since the last sync and
+# merges them in, so a warm call is a memory read plus, at most, one small
+# Query. The serialized JSON body is kept next to the items and only rebuilt
+# when something changed.
+#
+# Writers put catalog_shard(propertyId) in the `catalog` attribute and stamp
+# updatedAt; rows written without them (and deletes) are picked up by the
+# periodic full reload. The key is spread over CATALOG_SHARDS values so bulk
+# loads do not all land on one GSI partition, and a sync queries every shard.
+# Writers and readers must agree on CATALOG_SHARDS; after changing it, rows
+# keep their old shard until rewritten and only full reloads see them.
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dynamo_utils import SCAN_SEGMENTS, index_unavailable, iter_items, parallel_scan, sync_watermark
+from responses import etag_for, to_json
+from structured_logging import bind_request_context, get_logger
+
+logger = get_logger('property_catalog')
+
+# Oldest a served catalog may be; 0 checks for changes on every read
+CATALOG_MAX_STALENESS_SECONDS = float(os.environ.get('CATALOG_MAX_STALENESS_SECONDS', '5'))
+# Full reloads catch deletes and rows written without catalog/updatedAt
+CATALOG_FULL_REFRESH_SECONDS = float(os.environ.get('CATALOG_FULL_REFRESH_SECONDS', '900'))
+# While catalog-updated-index is missing or backfilling (a staged deploy), full
+# reloads stand in for the deltas, at most this often
+CATALOG_FALLBACK_RELOAD_SECONDS = float(os.environ.get('CATALOG_FALLBACK_RELOAD_SECONDS', '60'))
+
+CATALOG_SHARDS = int(os.environ.get('CATALOG_SHARDS', '8'))
+
+CATALOG_INDEX = 'catalog-updated-index'
+CATALOG_PARTITION = 'Property'
+
+
+def catalog_shard(property_id: str) -> str:
+    """The `catalog` value for a property: 'Property#0' .. 'Property#<CATALOG_SHARDS - 1>'"""
+    return f"{CATALOG_PARTITION}#{zlib.crc32(property_id.encode('utf-8')) % CATALOG_SHARDS}"
+
+
+class PropertyCatalog:
+    """Property items and their JSON body, refreshed incrementally"""
+
+    def __init__(self, table, max_staleness: Optional[float] = None, full_refresh: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.table = table
+        self.max_staleness = CATALOG_MAX_STALENESS_SECONDS if max_staleness is None else max_staleness
+        self.full_refresh = CATALOG_FULL_REFRESH_SECONDS if full_refresh is None else full_refresh
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._list: Optional[List[Dict[str, Any]]] = None
+        self._body: Optional[str] = None
+        self._etag: Optional[str] = None
+        self._watermark: Optional[str] = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _load(self, now: float) -> None:
+        # Taken before the scan so rows written during it are in the next delta
+        watermark = sync_watermark()
+        items = {item['propertyId']: item for item in parallel_scan(self.table.scan, SCAN_SEGMENTS)}
+        self._items, self._list, self._body = items, None, None
+        self._watermark = watermark
+        self._loaded_at = self._checked_at = now
+        logger.info('Loaded property catalog', extra={'fields': {'items': len(items)}})
+
+    def _changed_in(self, shard: int) -> List[Dict[str, Any]]:
+        return list(iter_items(
+            self.table.query,
+            IndexName=CATALOG_INDEX,
+            KeyConditionExpression='#catalog = :catalog AND updatedAt > :since',
+            ExpressionAttributeNames={'#catalog': 'catalog'},
+            ExpressionAttributeValues={':catalog': f"{CATALOG_PARTITION}#{shard}", ':since': self._watermark}
+        ))
+
+    def _sync(self, now: float) -> None:
+        watermark = sync_watermark()
+        if CATALOG_SHARDS == 1:
+            changed = self._changed_in(0)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=min(CATALOG_SHARDS, 8),
+                                                    thread_name_prefix='catalog-sync')
+            shards = self._executor.map(bind_request_context(self._changed_in), range(CATALOG_SHARDS))
+            changed = [item for items in shards for item in items]
+        # Items the GSI has not caught up on yet come back on the next sync,
+        # since the watermark trails the clock
+        for item in changed:
+            self._items[item['propertyId']] = item
+        if changed:
+            self._list, self._body = None, None
+            logger.debug('Merged property changes', extra={'fields': {'changed': len(changed)}})
+        self._watermark = watermark
+        self._checked_at = now
+
+    def _refresh(self) -> None:
+        now = self._clock()
+        if self._watermark is None:
+            self._load(now)
+            return
+        try:
+            if now - self._loaded_at >= self.full_refresh:
+                self._load(now)
+            elif now - self._checked_at >= self.max_staleness:
+                self._sync_or_reload(now)
+        except Exception as e:
+            # A failed refresh must not fail the read: serve the replica we
+            # have and try again once max_staleness has passed
+            logger.warning('Property catalog refresh failed; serving the previous replica',
+                           extra={'fields': {'error': str(e), 'errorType': type(e).__name__}})
+            self._checked_at = now
+
+    def _sync_or_reload(self, now: float) -> None:
+        try:
+            self._sync(now)
+        except Exception as e:
+            if not index_unavailable(e) or now - self._loaded_at < CATALOG_FALLBACK_RELOAD_SECONDS:
+                raise
+            logger.warning('Catalog index unavailable; reloading the catalog with a scan',
+                           extra={'fields': {'index': CATALOG_INDEX, 'error': str(e)}})
+            self._load(now)
+
+    def items(self) -> List[Dict[str, Any]]:
+        """Every property; the list is shared, so callers must not modify it"""
+        with self._lock:
+            self._refresh()
+            if self._list is None:
+                self._list = list(self._items.values())
+            return self._list
+
+    def body(self) -> Tuple[str, str]:
+        """`items()` serialized as a response body, and its ETag"""
+        with self._lock:
+            self._refresh()
+            if self._body is None:
+                if self._list is None:
+                    self._list = list(self._items.values())
+                self._body = to_json(self._list)
+                self._etag = etag_for(self._body)
+            return self._body, self._etag
+
+    def invalidate(self, item: Optional[Dict[str, Any]] = None) -> None:
+        """Merge a row this container just wrote, or force a full reload when given none"""
+        with self._lock:
+            if item is None:
+                self._watermark = None
+            elif self._watermark is not None:
+                self._items[item['propertyId']] = item
+                self._list, self._body = None, None
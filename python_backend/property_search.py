@@ -0,0 +1,206 @@
+# property_search.py
+# Filtered, paged property listings for searchProperties (agent API) and
+# search_properties (client API). A search with a status, city, zipcode or
+# property-type filter is a Query on that attribute's price GSI, so it reads
+# only the listings it could return; a price range narrows the key condition
+# and the other filters are applied as a FilterExpression on the matching
+# rows. Only a search with none of those filters falls back to a filtered Scan.
+# Filtered reads are budgeted (SEARCH_MAX_READS pages of up to 1 MB), so a
+# search that matches little returns a short page and a cursor rather than
+# walking the whole index in one request. While the GSI a search needs is not
+# deployed yet or still backfilling (see PropertyIndexStage in template.yaml),
+# the search falls back to the filtered Scan, or raises SearchUnavailable when
+# only the index can answer it (price order, an index cursor).
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from dynamo_utils import DEFAULT_PAGE_SIZE, decode_token, fetch_filtered_page, fetch_page, index_unavailable
+from structured_logging import get_logger
+
+logger = get_logger('property_search')
+
+# Most 1 MB pages one filtered search request reads before returning what it has
+SEARCH_MAX_READS = int(os.environ.get('SEARCH_MAX_READS', '4'))
+
+# Base table key of Property; cursors into a GSI also need the index key
+_TABLE_KEY = ('propertyId',)
+
+# Equality filters with a GSI keyed (attribute, listPrice), most selective first;
+# the first one present in a search picks the index
+SEARCH_INDEXES = (
+    ('zipcode', 'zipcode-price-index'),
+    ('city', 'city-price-index'),
+    ('propertyType', 'type-price-index'),
+    ('status', 'status-price-index'),
+)
+
+# Request prefix (minPrice/maxPrice, ...) -> item attribute
+RANGE_FILTERS = {
+    'Price': 'listPrice',
+    'Bedrooms': 'numBedrooms',
+    'Bathrooms': 'numBathrooms',
+    'SquareFootage': 'squareFootage',
+}
+
+SORT_ORDERS = ('price_asc', 'price_desc')
+
+
+class SearchUnavailable(Exception):
+    """The GSI a search needs is not available yet; worth retrying later"""
+
+
+def _number(body: Dict[str, Any], name: str) -> Optional[Decimal]:
+    value = body.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a number")
+    if not number.is_finite():
+        raise ValueError(f"{name} must be a number")
+    return number
+
+
+@dataclass
+class PropertySearch:
+    """Criteria of one search request"""
+    equals: Dict[str, str] = field(default_factory=dict)
+    ranges: Dict[str, Tuple[Optional[Decimal], Optional[Decimal]]] = field(default_factory=dict)
+    sort: Optional[str] = None
+    limit: int = DEFAULT_PAGE_SIZE
+    next_token: Optional[str] = None
+
+    @classmethod
+    def from_request(cls, body: Dict[str, Any]) -> 'PropertySearch':
+        """Read filters from a request body; raises ValueError for bad input"""
+        search = cls()
+        for name, _ in SEARCH_INDEXES:
+            value = body.get(name)
+            if value is None or value == '':
+                continue
+            if not isinstance(value, str):
+                raise ValueError(f"{name} must be a string")
+            search.equals[name] = value
+
+        for suffix, attribute in RANGE_FILTERS.items():
+            low, high = _number(body, f"min{suffix}"), _number(body, f"max{suffix}")
+            if low is not None and high is not None and low > high:
+                raise ValueError(f"min{suffix} cannot be greater than max{suffix}")
+            if low is not None or high is not None:
+                search.ranges[attribute] = (low, high)
+
+        search.sort = body.get('sort') or None
+        if search.sort is not None and search.sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_ORDERS)}")
+        if search.sort is not None and search.index() is None:
+            # A scan cannot return listings in price order without reading them all
+            raise ValueError("sort requires a status, city, zipcode or propertyType filter")
+
+        limit = body.get('limit')
+        try:
+            search.limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            raise ValueError("limit must be an integer")
+        search.next_token = body.get('nextToken') or None
+        return search
+
+    def index(self) -> Optional[Tuple[str, str]]:
+        """(attribute, index name) of the GSI this search queries, or None for a scan"""
+        return next(((name, index) for name, index in SEARCH_INDEXES if name in self.equals), None)
+
+
+class _Expression:
+    """Collects conditions with #name/:value placeholders, so reserved words like status are safe"""
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+        self.values: Dict[str, Any] = {}
+
+    def _name(self, attribute: str) -> str:
+        placeholder = f"#{attribute}"
+        self.names[placeholder] = attribute
+        return placeholder
+
+    def _value(self, value: Any) -> str:
+        placeholder = f":v{len(self.values)}"
+        self.values[placeholder] = value
+        return placeholder
+
+    def equals(self, attribute: str, value: Any) -> str:
+        return f"{self._name(attribute)} = {self._value(value)}"
+
+    def between(self, attribute: str, low: Optional[Decimal], high: Optional[Decimal]) -> str:
+        name = self._name(attribute)
+        if low is not None and high is not None:
+            return f"{name} BETWEEN {self._value(low)} AND {self._value(high)}"
+        if low is not None:
+            return f"{name} >= {self._value(low)}"
+        return f"{name} <= {self._value(high)}"
+
+
+def search_request(search: PropertySearch, use_index: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """('query' or 'scan', request parameters) for a search; without `use_index`, always a scan"""
+    expression = _Expression()
+    ranges = dict(search.ranges)
+    equals = dict(search.equals)
+    params: Dict[str, Any] = {}
+
+    index = search.index() if use_index else None
+    if index is not None:
+        attribute, params['IndexName'] = index
+        key_condition = [expression.equals(attribute, equals.pop(attribute))]
+        if 'listPrice' in ranges:
+            key_condition.append(expression.between('listPrice', *ranges.pop('listPrice')))
+        params['KeyConditionExpression'] = ' AND '.join(key_condition)
+        params['ScanIndexForward'] = search.sort != 'price_desc'
+
+    conditions = [expression.equals(name, value) for name, value in equals.items()]
+    conditions += [expression.between(name, low, high) for name, (low, high) in ranges.items()]
+    if conditions:
+        params['FilterExpression'] = ' AND '.join(conditions)
+    if expression.names:
+        params['ExpressionAttributeNames'] = expression.names
+    if expression.values:
+        params['ExpressionAttributeValues'] = expression.values
+    return ('query' if index is not None else 'scan'), params
+
+
+def _read_page(table, search: PropertySearch, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    if 'FilterExpression' not in params:
+        items, next_token = fetch_page(getattr(table, operation), search.limit, search.next_token, **params)
+        return {'items': items, 'nextToken': next_token}
+    index = search.index() if 'IndexName' in params else None
+    key_names = _TABLE_KEY + ((index[0], 'listPrice') if index is not None else ())
+    items, next_token = fetch_filtered_page(getattr(table, operation), search.limit, key_names,
+                                            SEARCH_MAX_READS, search.next_token, **params)
+    return {'items': items, 'nextToken': next_token}
+
+
+def search_properties(table, search: PropertySearch) -> Dict[str, Any]:
+    """One page of matching properties plus the cursor for the next page"""
+    index = search.index()
+    # A cursor handed out by the scan fallback keeps paging by scan
+    use_index = index is None or not search.next_token or index[0] in decode_token(search.next_token)
+    if not use_index and search.sort is not None:
+        raise ValueError("nextToken does not belong to a sorted search")
+    operation, params = search_request(search, use_index)
+    if operation == 'scan':
+        logger.info('Property search has no indexed filter; scanning',
+                    extra={'fields': {'ranges': sorted(search.ranges)}})
+    try:
+        return _read_page(table, search, operation, params)
+    except ClientError as e:
+        if operation != 'query' or not index_unavailable(e):
+            raise
+        index_name = params['IndexName']
+        # A price order or an index cursor cannot be served by a scan
+        if search.sort is not None or search.next_token:
+            raise SearchUnavailable(f"{index_name} is not available yet; try again later")
+        logger.warning('Search index unavailable; scanning instead',
+                       extra={'fields': {'index': index_name, 'error': str(e)}})
+        return _read_page(table, search, *search_request(search, use_index=False))
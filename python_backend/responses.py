@@ -0,0 +1,306 @@
+# responses.py
+import base64
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    # Not in the default layer; without it only gzip is offered
+    brotli = None
+
+# How Decimals from DynamoDB are written: 'string' keeps the original "123.45"
+# text, 'number' writes a JSON number (an int when the value is integral)
+JSON_DECIMALS = os.environ.get('JSON_DECIMALS', 'string')
+
+# The client backend (see item_codec) reads numbers as int/float when that
+# keeps their stored text; in 'string' mode they are written as that text, so
+# the API sends the same JSON whatever backend read the items. The extra walk
+# is only needed, and only done, on that backend.
+_NATIVE_NUMBERS = os.environ.get('DYNAMODB_BACKEND', 'resource') == 'client'
+
+# Floats are exact integers only up to 2**53
+_MAX_SAFE_FLOAT_INT = 2 ** 53
+
+# Same for every response, so built once per container
+RESPONSE_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
+    'Access-Control-Expose-Headers': 'ETag',
+    'Content-Type': 'application/json'
+}
+
+# Cache-Control for successful reads, by endpoint (agent path or client action).
+# These responses carry an ETag and answer a matching If-None-Match with 304;
+# the catalog and entity lookups may be a few seconds stale anyway, while the
+# per-agent and per-client lists are always revalidated.
+CACHE_POLICIES = {
+    'getProperties': 'private, max-age=5',
+    'get_properties': 'private, max-age=5',
+    'searchProperties': 'private, max-age=5',
+    'search_properties': 'private, max-age=5',
+    'getAgent': 'private, max-age=60',
+    'getOffice': 'private, max-age=60',
+    'get_client': 'private, max-age=60',
+    'get_property_agent': 'private, max-age=60',
+    'getAppointments': 'no-cache',
+    'getClients': 'no-cache',
+    'getTransactions': 'no-cache',
+    'getAgentDashboard': 'no-cache',
+    'get_appointments': 'no-cache',
+    'get_agents': 'no-cache',
+    'get_transactions': 'no-cache',
+}
+
+# Bodies at least this long are compressed when the request's Accept-Encoding
+# allows it; API Gateway's own MinimumCompressionSize covers the smaller ones,
+# but only after the response has passed Lambda's 6 MB limit.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', str(64 * 1024)))
+# Encodings we may answer with, in order of preference; empty turns compression off
+RESPONSE_ENCODINGS = [name.strip() for name in os.environ.get('RESPONSE_ENCODINGS', 'br,gzip').split(',')
+                      if name.strip() and (name.strip() != 'br' or brotli is not None)]
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '6'))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '5'))
+# Compressed bodies kept by (ETag, encoding), so an unchanged catalog is compressed once
+_COMPRESSED_CACHE_ENTRIES = 8
+
+# Request being answered, per context: Lambda runs one invocation at a time,
+# but the load benchmarks call both handlers from several threads at once
+_request: 'contextvars.ContextVar[Optional[Dict[str, Any]]]' = contextvars.ContextVar('response_request', default=None)
+_NO_REQUEST: Dict[str, Any] = {'headers': {}, 'endpoint': None}
+
+
+def _decimal_to_string(value: Any) -> Any:
+    if type(value) is Decimal:
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decimal_to_number(value: Any) -> Any:
+    if type(value) is Decimal:
+        text = str(value)
+        if '.' not in text and 'E' not in text:
+            return int(text)
+        number = float(text)
+        # '2.0' and '1E+3' are still integral
+        if number.is_integer() and -_MAX_SAFE_FLOAT_INT < number < _MAX_SAFE_FLOAT_INT:
+            return int(number)
+        return number
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# The C encoder calls `default` only for the Decimals it meets while it
+# writes the body, so each payload is walked once. Our payloads are trees
+# built per request, so the circular-reference check is skipped.
+_ENCODERS = {
+    'string': json.JSONEncoder(default=_decimal_to_string, check_circular=False),
+    'number': json.JSONEncoder(default=_decimal_to_number, check_circular=False),
+}
+
+
+def _numbers_to_strings(value: Any) -> Any:
+    kind = type(value)
+    if kind is dict:
+        return {name: _numbers_to_strings(member) for name, member in value.items()}
+    if kind is list or kind is tuple:
+        return [_numbers_to_strings(member) for member in value]
+    if kind is int:
+        return str(value)
+    if kind is float:
+        return repr(value)
+    return value
+
+
+def to_json(body: Any, decimals: Optional[str] = None, native_numbers: Optional[bool] = None) -> str:
+    """Serialize a response body, writing Decimals as strings or numbers.
+
+    With `native_numbers` (default: on for the client backend), 'string' mode
+    also writes int/float values as strings, the way their Decimals would be.
+    """
+    decimals = decimals or JSON_DECIMALS
+    try:
+        encoder = _ENCODERS[decimals]
+    except KeyError:
+        raise ValueError(f"decimals must be one of: {', '.join(_ENCODERS)}")
+    if decimals == 'string' and (_NATIVE_NUMBERS if native_numbers is None else native_numbers):
+        body = _numbers_to_strings(body)
+    return encoder.encode(body)
+
+
+def read_body(event: Dict[str, Any]) -> Optional[str]:
+    """The request body as text; application/json is a binary media type, so it may arrive base64-encoded"""
+    body = event.get('body')
+    if body and event.get('isBase64Encoded'):
+        return base64.b64decode(body).decode('utf-8')
+    return body
+
+
+def start_response(event: Dict[str, Any]) -> None:
+    """Remember the headers of the request being handled, for conditional and compressed responses"""
+    headers = event.get('headers') or {}
+    _request.set({
+        'headers': {name.lower(): value for name, value in headers.items() if value is not None},
+        'endpoint': None,
+    })
+
+
+def set_response_endpoint(endpoint: Optional[str]) -> None:
+    """Name the endpoint whose CACHE_POLICIES entry applies to the current request"""
+    request = _request.get()
+    if request is None:
+        _request.set({'headers': {}, 'endpoint': endpoint})
+    else:
+        request['endpoint'] = endpoint
+
+
+def _current_request() -> Dict[str, Any]:
+    return _request.get() or _NO_REQUEST
+
+
+def etag_for(body: str) -> str:
+    """Strong ETag of a serialized body"""
+    return '"' + hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest() + '"'
+
+
+def _etag_variant(etag: str, encoding: str) -> str:
+    # Each encoding is a different representation, so it gets its own strong ETag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _matching_etag(etag: str, if_none_match: str) -> Optional[str]:
+    """The tag in If-None-Match that names `etag` (in any encoding), or None"""
+    if if_none_match.strip() == '*':
+        return etag
+    variants = {etag: etag}
+    variants.update((_etag_variant(etag, encoding), _etag_variant(etag, encoding)) for encoding in ('br', 'gzip'))
+    # If-None-Match compares weakly, so W/"x" matches "x"
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        match = variants.get(tag[2:] if tag.startswith('W/') else tag)
+        if match is not None:
+            return match
+    return None
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Our preferred encoding among those Accept-Encoding allows (q > 0), or None"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in RESPONSE_ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+_compressed: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def compress(body: str, encoding: str) -> bytes:
+    """`body` as UTF-8, compressed with 'br' or 'gzip' at the configured level"""
+    data = body.encode('utf-8')
+    if encoding == 'br':
+        return brotli.compress(data, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=RESPONSE_GZIP_LEVEL)
+
+
+def _compressed_body(body: str, encoding: str, etag: Optional[str]) -> str:
+    """`body` compressed and base64-encoded, reused while its ETag is unchanged"""
+    if etag is None:
+        return base64.b64encode(compress(body, encoding)).decode('ascii')
+    key = (etag, encoding)
+    with _compressed_lock:
+        cached = _compressed.get(key)
+        if cached is not None:
+            _compressed.move_to_end(key)
+            return cached
+    encoded = base64.b64encode(compress(body, encoding)).decode('ascii')
+    with _compressed_lock:
+        _compressed[key] = encoded
+        while len(_compressed) > _COMPRESSED_CACHE_ENTRIES:
+            _compressed.popitem(last=False)
+    return encoded
+
+
+def _compressible(body: Any) -> bool:
+    """Whether `body` is sent compressed when Accept-Encoding allows; a body not
+    serialized yet is assumed to be, rather than serialized just to check"""
+    if not RESPONSE_ENCODINGS:
+        return False
+    return not isinstance(body, str) or len(body) >= RESPONSE_COMPRESSION_MIN_BYTES
+
+
+def _body_response(status_code: int, headers: Dict[str, str], body: Any,
+                   etag: Optional[str]) -> Dict[str, Any]:
+    body = body if isinstance(body, str) else to_json(body)
+    if not _compressible(body):
+        return {'statusCode': status_code, 'headers': headers, 'body': body}
+    headers['Vary'] = 'Accept-Encoding'
+    encoding = _accepted_encoding(_current_request()['headers'].get('accept-encoding', ''))
+    if encoding is None:
+        return {'statusCode': status_code, 'headers': headers, 'body': body}
+    headers['Content-Encoding'] = encoding
+    if 'ETag' in headers:
+        headers['ETag'] = _etag_variant(headers['ETag'], encoding)
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': _compressed_body(body, encoding, etag),
+        'isBase64Encoded': True
+    }
+
+
+def create_response(status_code: int, body: Any, etag: Optional[str] = None,
+                    cache_control: Optional[str] = None) -> Dict[str, Any]:
+    """Create a response with CORS headers.
+
+    A successful read from an endpoint in CACHE_POLICIES (or with an explicit
+    cache_control/etag) gets Cache-Control and an ETag, and becomes a bodiless
+    304 when the request's If-None-Match already names that ETag. Pass `etag`
+    for a body whose version is known, so a 304 skips serializing it.
+    Bodies of RESPONSE_COMPRESSION_MIN_BYTES or more are sent compressed
+    (base64, isBase64Encoded) when Accept-Encoding allows.
+    """
+    headers = dict(RESPONSE_HEADERS)
+    request = _current_request()
+    if status_code == 200 and cache_control is None:
+        cache_control = CACHE_POLICIES.get(request['endpoint'])
+    if status_code != 200 or (cache_control is None and etag is None):
+        return _body_response(status_code, headers, body, None)
+
+    if cache_control is not None:
+        headers['Cache-Control'] = cache_control
+    if etag is None:
+        body = body if isinstance(body, str) else to_json(body)
+        etag = etag_for(body)
+    headers['ETag'] = etag
+    if_none_match = request['headers'].get('if-none-match')
+    matched = _matching_etag(etag, if_none_match) if if_none_match else None
+    if matched is not None:
+        headers['ETag'] = matched
+        # A 304 carries the Vary the full response would have, so caches keep
+        # the encodings apart
+        if _compressible(body):
+            headers['Vary'] = 'Accept-Encoding'
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    return _body_response(status_code, headers, body, etag)
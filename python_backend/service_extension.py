@@ -2,15 +2,23 @@ from typing import Optional, List, Dict, Any
 import uuid
 from datetime import datetime
 from boto3.dynamodb.conditions import Key
+from aws_resources import get_dynamodb_resource
+from dynamo_metrics import instrument
+from dynamo_utils import utc_timestamp
+from property_catalog import catalog_shard
 
 class PropertyService:
-    def __init__(self, dynamodb_resource):
-        self.dynamodb = dynamodb_resource
+    def __init__(self, dynamodb_resource=None):
+        self.dynamodb = instrument(dynamodb_resource or get_dynamodb_resource())
         self.table = self.dynamodb.Table('dev-Property')
 
     def add_property(self, property_data: Dict[str, Any]) -> str:
         property_data['propertyId'] = str(uuid.uuid4())
         property_data['listingDate'] = datetime.now().isoformat()
+        # Same stamps as AgentService.add_property, so since-reads and the
+        # catalog replicas see the row without waiting for a full reload
+        property_data['updatedAt'] = utc_timestamp()
+        property_data['catalog'] = catalog_shard(property_data['propertyId'])
         self.table.put_item(Item=property_data)
         return property_data['propertyId']
 
@@ -19,12 +27,13 @@ class PropertyService:
         return response.get('Item')
 
 class TransactionService:
-    def __init__(self, dynamodb_resource):
-        self.dynamodb = dynamodb_resource
+    def __init__(self, dynamodb_resource=None):
+        self.dynamodb = instrument(dynamodb_resource or get_dynamodb_resource())
         self.table = self.dynamodb.Table('dev-Transaction')
 
     def add_transaction(self, transaction_data: Dict[str, Any]) -> str:
         transaction_data['transactionId'] = str(uuid.uuid4())
+        transaction_data['updatedAt'] = utc_timestamp()
         self.table.put_item(Item=transaction_data)
         return transaction_data['transactionId']
 
@@ -0,0 +1,124 @@
+# structured_logging.py
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Base level for every invocation; a sampled invocation logs at DEBUG instead
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Fraction of invocations (0..1) that log at DEBUG
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0'))
+# Caps applied to structured fields when a line is written
+LOG_MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', '1024'))
+LOG_MAX_FIELD_ITEMS = int(os.environ.get('LOG_MAX_FIELD_ITEMS', '5'))
+
+SERVICE_NAME = os.environ.get('POWERTOOLS_SERVICE_NAME', 'real-estate')
+
+_ROOT = 'realestate'
+
+# Invocation being served; worker threads see it through bind_request_context
+_request: 'contextvars.ContextVar[Dict[str, Any]]' = contextvars.ContextVar(
+    'log_request', default={'id': None, 'sampled': False})
+
+
+def cap(value: Any, max_chars: Optional[int] = None, max_items: Optional[int] = None) -> Any:
+    """Shrink a value for logging without serializing it in full.
+
+    Long strings are cut, long lists become a count plus their first items,
+    and nested values are capped the same way.
+    """
+    max_chars = max_chars or LOG_MAX_FIELD_CHARS
+    max_items = max_items or LOG_MAX_FIELD_ITEMS
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    if isinstance(value, (list, tuple)):
+        if len(value) <= max_items:
+            return [cap(member, max_chars, max_items) for member in value]
+        return {'count': len(value), 'head': [cap(member, max_chars, max_items) for member in value[:max_items]]}
+    if isinstance(value, dict):
+        capped = {}
+        for index, (name, member) in enumerate(value.items()):
+            if index >= max_items * 4:
+                capped['...'] = f"+{len(value) - index} keys"
+                break
+            capped[str(name)] = cap(member, max_chars, max_items)
+        return capped
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, so CloudWatch Logs Insights can query fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'service': SERVICE_NAME,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request = _request.get()
+        if request['id']:
+            entry['requestId'] = request['id']
+        if request['sampled']:
+            entry['sampled'] = True
+        fields = getattr(record, 'fields', None)
+        if fields:
+            # Only reached for lines that are actually written
+            for name, value in fields.items():
+                # Never let a field replace timestamp/level/message
+                entry[f"{name}_field" if name in entry else name] = cap(value)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _configure_root() -> logging.Logger:
+    root = logging.getLogger(_ROOT)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        # The Lambda runtime's own root handler would print every line twice
+        root.propagate = False
+        root.setLevel(LOG_LEVEL)
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger that writes structured lines; pass fields with extra={'fields': {...}}"""
+    _configure_root()
+    return logging.getLogger(f"{_ROOT}.{name}")
+
+
+def start_request(request_id: Optional[str] = None) -> bool:
+    """Mark the start of an invocation and decide whether it is sampled at DEBUG"""
+    sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+    _request.set({'id': request_id, 'sampled': sampled})
+    _configure_root().setLevel(logging.DEBUG if sampled else LOG_LEVEL)
+    return sampled
+
+
+def request_id_from(context: Any) -> Optional[str]:
+    """aws_request_id of a Lambda context, if there is one"""
+    return getattr(context, 'aws_request_id', None)
+
+
+def bind_request_context(fn: Callable) -> Callable:
+    """Wrap `fn` so a worker thread runs it in the calling invocation's context:
+    its request id, DynamoDB metrics buffer and response state"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A Context can be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
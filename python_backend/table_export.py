@@ -0,0 +1,121 @@
+# table_export.py
+# Dumps tables to gzip-compressed NDJSON for analytics and backups. Each scan
+# segment is streamed page by page into its own file, so memory stays at a
+# page per segment however large the table is; items go through the model's
+# from_dynamodb/to_dict so the files carry the API shape.
+#
+#   cd python_backend && python -m table_export --output export/ [--tables Property Transaction] [--segments 8]
+#
+# Files land in <output>/<Table>/segment-<n>-of-<total>.ndjson.gz; a file only
+# appears once its segment is complete.
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from typing import Any, Dict, Optional, Sequence
+
+from agent_service import AgentService
+from client_models import Appointment
+from models import Property, Transaction
+from responses import to_json
+from structured_logging import get_logger
+
+logger = get_logger('table_export')
+
+EXPORT_SEGMENTS = int(os.environ.get('EXPORT_SEGMENTS', '4'))
+PROGRESS_SECONDS = 5.0
+
+# Table (without prefix) -> the model its items are converted through
+EXPORT_MODELS = {
+    'Property': Property,
+    'Transaction': Transaction,
+    'Appointment': Appointment,
+}
+
+
+def segment_path(directory: str, table_name: str, segment: int, total_segments: int) -> str:
+    return os.path.join(directory, table_name, f"segment-{segment:04d}-of-{total_segments:04d}.ndjson.gz")
+
+
+class TableExporter:
+    """Writes each scan segment of a table to its own NDJSON file"""
+
+    def __init__(self, service: Optional[AgentService] = None, compresslevel: int = 6):
+        self.service = service or AgentService()
+        self.compresslevel = compresslevel
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, table_name: str, items: int) -> None:
+        with self._lock:
+            self._counts[table_name] = self._counts.get(table_name, 0) + items
+
+    def export_segment(self, table_name: str, directory: str, segment: int = 0,
+                       total_segments: int = 1) -> int:
+        """Write one segment; returns the number of items"""
+        model = EXPORT_MODELS[table_name]
+        path = segment_path(directory, table_name, segment, total_segments)
+        temporary = f"{path}.tmp"
+        written = 0
+        with gzip.open(temporary, 'wt', encoding='utf-8', compresslevel=self.compresslevel) as f:
+            for item in self.service.iter_segment(table_name, segment, total_segments):
+                f.write(to_json(model.from_dynamodb(item).to_dict(), 'number'))
+                f.write('\n')
+                written += 1
+                if written % 1000 == 0:
+                    self._count(table_name, 1000)
+        self._count(table_name, written % 1000)
+        os.replace(temporary, path)
+        return written
+
+    def export(self, directory: str, tables: Sequence[str] = tuple(EXPORT_MODELS),
+               segments: Optional[int] = None) -> Dict[str, Any]:
+        """Export every segment of `tables` concurrently, logging progress as it goes"""
+        unknown = [name for name in tables if name not in EXPORT_MODELS]
+        if unknown:
+            raise ValueError(f"No export mapping for: {', '.join(unknown)}")
+        segments = segments or EXPORT_SEGMENTS
+        if segments < 1:
+            raise ValueError("segments must be at least 1")
+        for table_name in tables:
+            os.makedirs(os.path.join(directory, table_name), exist_ok=True)
+
+        self._counts = {}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(tables) * segments, thread_name_prefix='export') as executor:
+            pending = {executor.submit(self.export_segment, table_name, directory, segment, segments)
+                       for table_name in tables for segment in range(segments)}
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_SECONDS, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    # Re-raises the first segment that failed
+                    future.result()
+                if pending:
+                    with self._lock:
+                        counts = dict(self._counts)
+                    logger.info('Exported %s items', sum(counts.values()),
+                                extra={'fields': {'tables': counts, 'segmentsLeft': len(pending)}})
+
+        elapsed = time.monotonic() - started
+        return {
+            'directory': directory,
+            'segments': segments,
+            'items': {name: self._counts.get(name, 0) for name in tables},
+            'seconds': round(elapsed, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export tables to gzip-compressed NDJSON')
+    parser.add_argument('--output', required=True, help='directory to write into')
+    parser.add_argument('--tables', nargs='+', choices=sorted(EXPORT_MODELS), default=list(EXPORT_MODELS))
+    parser.add_argument('--segments', type=int, default=EXPORT_SEGMENTS, help='parallel scan segments per table')
+    args = parser.parse_args()
+    print(json.dumps(TableExporter().export(args.output, args.tables, args.segments), indent=2))
+
+
+if __name__ == '__main__':
+    main()
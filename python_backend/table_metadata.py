@@ -0,0 +1,92 @@
+# table_metadata.py
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from structured_logging import get_logger
+
+logger = get_logger('table_metadata')
+
+# How long a DescribeTable result is trusted before it is fetched again
+TABLE_METADATA_TTL_SECONDS = float(os.environ.get('TABLE_METADATA_TTL_SECONDS', '300'))
+# After a failed refresh the stale entry is kept this long before trying again
+_STALE_RETRY_SECONDS = 5.0
+
+
+def _key_schema(key_schema) -> Dict[str, Optional[str]]:
+    keys = {'hash': None, 'range': None}
+    for element in key_schema:
+        keys['hash' if element['KeyType'] == 'HASH' else 'range'] = element['AttributeName']
+    return keys
+
+
+def _metadata_from(description: Dict[str, Any]) -> Dict[str, Any]:
+    indexes = {}
+    for index in (description.get('GlobalSecondaryIndexes', [])
+                  + description.get('LocalSecondaryIndexes', [])):
+        indexes[index['IndexName']] = _key_schema(index['KeySchema'])
+    return {
+        'name': description['TableName'],
+        'status': description.get('TableStatus'),
+        'keys': _key_schema(description['KeySchema']),
+        'indexes': indexes,
+    }
+
+
+class TableMetadataCache:
+    """DescribeTable results (status, key schema, index key schemas) kept for a TTL.
+
+    One DescribeTable per table per TTL at most; if a refresh fails (e.g. it is
+    throttled) the expired entry keeps being served until a refresh succeeds.
+    """
+
+    def __init__(self, dynamodb_resource, ttl_seconds: Optional[float] = None, clock=time.monotonic):
+        self.dynamodb = dynamodb_resource
+        self.ttl_seconds = TABLE_METADATA_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._clock = clock
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_name: str) -> Dict[str, Any]:
+        """Metadata for `table_name`, calling DescribeTable only when the entry is missing or expired"""
+        entry = self._entries.get(table_name)
+        if entry is not None and entry[0] > self._clock():
+            return entry[1]
+        with self._lock:
+            # Another thread may have refreshed it while we waited
+            entry = self._entries.get(table_name)
+            if entry is not None and entry[0] > self._clock():
+                return entry[1]
+            try:
+                description = self.dynamodb.meta.client.describe_table(TableName=table_name)['Table']
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning('Serving stale metadata for %s: %s', table_name, e)
+                self._entries[table_name] = (self._clock() + min(self.ttl_seconds, _STALE_RETRY_SECONDS), entry[1])
+                return entry[1]
+            metadata = _metadata_from(description)
+            self._entries[table_name] = (self._clock() + self.ttl_seconds, metadata)
+            return metadata
+
+    def check_query(self, table_name: str, index_name: Optional[str], key_name: str) -> None:
+        """Raise ValueError unless `key_name` is the partition key of the table or `index_name`"""
+        metadata = self.get(table_name)
+        if index_name is None:
+            keys = metadata['keys']
+        else:
+            keys = metadata['indexes'].get(index_name)
+            if keys is None:
+                raise ValueError(f"Table {table_name} has no index {index_name}")
+        if keys['hash'] != key_name:
+            target = index_name or table_name
+            raise ValueError(f"{target} is partitioned on {keys['hash']}, not {key_name}")
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Forget one table, or every table"""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(table_name, None)
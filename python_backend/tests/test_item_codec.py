@@ -0,0 +1,55 @@
+# tests/test_item_codec.py
+#   cd python_backend && python -m pytest tests
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from item_codec import decode_number, decode_value, decoder_for
+from responses import to_json
+
+WIRE_PROPERTY = {
+    'propertyId': {'S': 'p-1'},
+    'listPrice': {'N': '180000.00'},
+    'numBedrooms': {'N': '2'},
+    'numBathrooms': {'N': '1.5'},
+    'squareFootage': {'N': '1450'},
+}
+
+
+def test_decode_number_types():
+    assert type(decode_number('2')) is int
+    assert type(decode_number('-17')) is int
+    assert type(decode_number('1.5')) is float
+    assert type(decode_number('0.1')) is float
+    # Anything that would not print back as stored stays a Decimal
+    assert decode_number('180000.00') == Decimal('180000.00')
+    assert type(decode_number('180000.00')) is Decimal
+    assert type(decode_number('007')) is Decimal
+    assert type(decode_number('1E+3')) is Decimal
+    assert type(decode_number('3.14159265358979323846')) is Decimal
+
+
+def test_decoded_item_types():
+    item = decoder_for('dev-Property')(WIRE_PROPERTY)
+    assert item == {'propertyId': 'p-1', 'listPrice': Decimal('180000.00'), 'numBedrooms': 2,
+                    'numBathrooms': 1.5, 'squareFootage': 1450}
+    assert type(item['numBedrooms']) is int
+    assert type(item['numBathrooms']) is float
+    assert type(decode_value({'NS': ['1', '2.5']}).pop()) in (int, float)
+
+
+def test_string_mode_json_matches_resource_backend():
+    deserializer = TypeDeserializer()
+    resource_item = {name: deserializer.deserialize(value) for name, value in WIRE_PROPERTY.items()}
+    client_item = decoder_for('dev-Property')(WIRE_PROPERTY)
+    expected = to_json([resource_item], 'string', native_numbers=False)
+    assert to_json([client_item], 'string', native_numbers=True) == expected
+    assert '"listPrice": "180000.00"' in expected
+    assert '"numBedrooms": "2"' in expected
+
+
+def test_number_mode_json_matches_resource_backend():
+    deserializer = TypeDeserializer()
+    resource_item = {name: deserializer.deserialize(value) for name, value in WIRE_PROPERTY.items()}
+    client_item = decoder_for('dev-Property')(WIRE_PROPERTY)
+    assert to_json(client_item, 'number') == to_json(resource_item, 'number')
@@ -0,0 +1,54 @@
+# tests/test_property_catalog.py
+#   cd python_backend && python -m pytest tests
+from botocore.exceptions import ClientError
+
+from benchmarks import dataset
+from dynamo_utils import utc_timestamp
+from memory_dynamodb import MemoryDynamoResource
+from property_catalog import CATALOG_FALLBACK_RELOAD_SECONDS, CATALOG_INDEX, PropertyCatalog, catalog_shard
+
+
+class BackfillingIndex:
+    """Property table whose catalog-updated-index is not queryable yet"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def scan(self, **kwargs):
+        return self.table.scan(**kwargs)
+
+    def query(self, **kwargs):
+        if kwargs.get('IndexName') == CATALOG_INDEX:
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message':
+                               f"Cannot read from backfilling global secondary index: {CATALOG_INDEX}"}}, 'Query')
+        return self.table.query(**kwargs)
+
+
+def _catalog():
+    dynamodb = MemoryDynamoResource()
+    dataset.populate(dynamodb, dataset.DatasetSpec(agents=5))
+    table = dynamodb.Table('dev-Property')
+    clock = [0.0]
+    catalog = PropertyCatalog(BackfillingIndex(table), max_staleness=5, clock=lambda: clock[0])
+    return table, catalog, clock
+
+
+def _add(table, property_id):
+    table.put_item(Item={'propertyId': property_id, 'updatedAt': utc_timestamp(),
+                         'catalog': catalog_shard(property_id)})
+
+
+def test_unavailable_index_serves_the_replica():
+    table, catalog, clock = _catalog()
+    count = len(catalog.items())
+    _add(table, 'p-new')
+    clock[0] = 10
+    assert len(catalog.items()) == count
+
+
+def test_unavailable_index_falls_back_to_a_full_reload():
+    table, catalog, clock = _catalog()
+    count = len(catalog.items())
+    _add(table, 'p-new')
+    clock[0] = CATALOG_FALLBACK_RELOAD_SECONDS + 1
+    assert len(catalog.items()) == count + 1
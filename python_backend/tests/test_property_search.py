@@ -0,0 +1,52 @@
+# tests/test_property_search.py
+#   cd python_backend && python -m pytest tests
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks import dataset
+from memory_dynamodb import MemoryDynamoResource
+from property_search import PropertySearch, SearchUnavailable, search_properties
+
+
+class UnstagedIndexes:
+    """Property table whose price GSIs have not been deployed yet"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def scan(self, **kwargs):
+        return self.table.scan(**kwargs)
+
+    def query(self, **kwargs):
+        raise ClientError({'Error': {'Code': 'ValidationException', 'Message':
+                           'The table does not have the specified index: status-price-index'}}, 'Query')
+
+
+@pytest.fixture(scope='module')
+def table():
+    dynamodb = MemoryDynamoResource()
+    dataset.populate(dynamodb, dataset.DatasetSpec(agents=10))
+    return dynamodb.Table('dev-Property')
+
+
+def _ids(page):
+    return [item['propertyId'] for item in page['items']]
+
+
+def test_unsorted_search_falls_back_to_a_scan(table):
+    search = {'status': 'AVAILABLE', 'limit': 3}
+    first = search_properties(UnstagedIndexes(table), PropertySearch.from_request(search))
+    second = search_properties(UnstagedIndexes(table), PropertySearch.from_request(
+        dict(search, nextToken=first['nextToken'])))
+    assert len(first['items']) == len(second['items']) == 3
+    assert not set(_ids(first)) & set(_ids(second))
+    assert all(item['status'] == 'AVAILABLE' for item in first['items'] + second['items'])
+    # A scan cursor keeps paging by scan once the index is live
+    resumed = search_properties(table, PropertySearch.from_request(dict(search, nextToken=first['nextToken'])))
+    assert _ids(resumed) == _ids(second)
+
+
+def test_sorted_search_is_unavailable(table):
+    with pytest.raises(SearchUnavailable):
+        search_properties(UnstagedIndexes(table), PropertySearch.from_request(
+            {'status': 'AVAILABLE', 'sort': 'price_asc'}))
@@ -0,0 +1,26 @@
+# tests/test_responses.py
+#   cd python_backend && python -m pytest tests
+import responses
+from responses import create_response, etag_for, start_response
+
+
+def _revalidate(body, etag, if_none_match, accept_encoding='gzip'):
+    start_response({'headers': {'If-None-Match': if_none_match, 'Accept-Encoding': accept_encoding}})
+    return create_response(200, body, etag=etag)
+
+
+def test_not_modified_varies_when_the_body_would_be_compressed():
+    body = 'x' * responses.RESPONSE_COMPRESSION_MIN_BYTES
+    etag = etag_for(body)
+    full = _revalidate(body, etag, '"stale"')
+    assert full['headers']['Content-Encoding'] == 'gzip'
+    response = _revalidate(body, etag, full['headers']['ETag'])
+    assert response['statusCode'] == 304
+    assert response['headers']['Vary'] == 'Accept-Encoding'
+
+
+def test_not_modified_small_body_has_no_vary():
+    body = '[]'
+    response = _revalidate(body, etag_for(body), etag_for(body))
+    assert response['statusCode'] == 304
+    assert 'Vary' not in response['headers']
@@ -0,0 +1,48 @@
+# websocket_handler.py
+import json
+
+from change_events import get_change_publisher
+from structured_logging import get_logger, start_request, request_id_from
+
+logger = get_logger('websocket_handler')
+
+
+def handler(event, context):
+    """$connect / $disconnect / subscribe routes of the dashboard WebSocket API"""
+    request_context = event.get('requestContext', {})
+    route = request_context.get('routeKey')
+    connection_id = request_context.get('connectionId')
+    start_request(request_id_from(context))
+    logger.info('WebSocket %s for connection %s', route, connection_id)
+
+    if not connection_id:
+        return {'statusCode': 400, 'body': 'connectionId is required'}
+
+    registry = get_change_publisher().registry
+    try:
+        if route == '$connect':
+            # Dashboards may subscribe straight away with ?agentId=...
+            params = event.get('queryStringParameters') or {}
+            registry.connect(connection_id, params.get('agentId'))
+            return {'statusCode': 200, 'body': 'Connected'}
+
+        if route == '$disconnect':
+            registry.disconnect(connection_id)
+            return {'statusCode': 200, 'body': 'Disconnected'}
+
+        if route == 'subscribe':
+            try:
+                body = json.loads(event.get('body') or '{}')
+            except json.JSONDecodeError:
+                return {'statusCode': 400, 'body': 'Invalid JSON in message'}
+            agent_id = body.get('agentId')
+            if not agent_id:
+                return {'statusCode': 400, 'body': 'agentId is required'}
+            registry.subscribe(connection_id, agent_id)
+            return {'statusCode': 200, 'body': 'Subscribed'}
+
+        return {'statusCode': 400, 'body': f'Unknown route: {route}'}
+
+    except Exception as e:
+        logger.exception('Error: %s', e)
+        return {'statusCode': 500, 'body': 'Internal server error'}